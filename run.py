@@ -2,6 +2,7 @@
 """
 Main orchestrator. Usage (from project root):
     python run.py "Analyze ROAS drop"
+    python run.py "Analyze ROAS drop" --data "exports/*.csv"   # one run per ad account, in parallel
 
 This script:
 - loads config
@@ -12,36 +13,69 @@ This script:
 """
 import sys
 import os
+import glob
 import json
-from datetime import datetime
+import time
+import argparse
+import tempfile
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 
 # ensure project root is on path when run from project root
 PROJECT_ROOT = os.path.abspath(os.path.dirname(__file__))
 sys.path.append(PROJECT_ROOT)
 
-from src.utils.loader import load_config, load_data
+from src.utils.loader import load_config, load_data, lookup_first_value, dataset_date_bounds
+from src.agents.data_agent import DataAgent
 from src.agents.planner_agent import PlannerAgent
 from src.agents.insight_agent import InsightAgent
 from src.agents.evaluator_agent import EvaluatorAgent
 from src.agents.creative_agent import CreativeAgent
+from src.agents.forecast_agent import ForecastAgent
+from src.agents.budget_agent import BudgetAgent
+from src.agents.fatigue_agent import FatigueAgent
+from src.agents.anomaly_agent import AnomalyAgent
+from src.utils.data_quality import scanner_from_config
+from src.utils.dim_dictionary import load_or_build_dictionary
+from src.utils.profiler import profiler_from_config
+from src.utils.metrics import metrics_from_config
+from src.utils.memory_budget import partition_csv, peak_rss_mb, plan_memory
+from src.utils.retry import RetryStats, configure_retry, retry_stats
+from src.utils.anomaly import KPIS
+from src.utils.charts import render_campaign_charts
+from src.utils.run_history import RunHistory
+from src.utils.helpers import account_output_path, available_cores
+from src.utils.shared_frame import iter_segments
+from src.utils.ndjson import iter_ndjson, write_ndjson, top_n as top_n_records
 
 def write_json(path, obj):
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
+    # temp file + rename: readers never see a half-written file
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
         json.dump(obj, f, indent=2, default=str)
+    os.replace(tmp, path)
+
+ROLLUP_VALUE_KEYS = ("recent_roas", "previous_roas", "roas_change_pct", "ctr_change_pct", "spend_change_pct", "recent_spend")
 
-def write_report_md(path, insights_validated, creatives, config, summary_text=None):
+def write_report_md(path, insights_validated, creatives, config, summary_text=None, horizons=None, charts=None,
+                    segments=None, rollups=None, forecasts=None, budget=None, data_quality=None, funnel=None,
+                    creative_fatigue=None, anomalies=None, data_profile=None, top_n=10):
     os.makedirs(os.path.dirname(path), exist_ok=True)
     now = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
     lines = []
     lines.append(f"# Facebook Ads Agentic Analysis Report\n")
     lines.append(f"Generated: {now}\n")
     lines.append(f"## Quick summary\n")
+    # insights (and segments) may be lazy iterators, e.g. iter_ndjson(...): only the top-N are kept
+    insights_top = top_n_records(insights_validated, top_n, key=lambda h: (not h.get("validated"), -h.get("confidence", 0.0)))
     if summary_text:
         lines.append(summary_text + "\n")
     else:
         # build quick summary from top validated hypotheses
-        top = [h for h in insights_validated if h.get("validated")]
+        top = [h for h in insights_top if h.get("validated")]
         if top:
             lines.append("Top validated insights:\n")
             for t in top:
@@ -49,13 +83,175 @@ def write_report_md(path, insights_validated, creatives, config, summary_text=No
         else:
             lines.append("No high-confidence validated hypotheses found. See details below.\n")
 
-    lines.append("\n## Validated Insights (full)\n")
-    for h in insights_validated:
+    if data_quality:
+        lines.append("\n## Data Quality\n")
+        lines.append(
+            f"{data_quality['rows_scanned']} rows scanned, {data_quality['rows_quarantined']} quarantined"
+            + (f" (see `{data_quality['quarantine_file']}`)" if data_quality.get("quarantine_file") else "") + ".\n"
+        )
+        table = ["| Rule | Rows | Action |", "|---|---|---|"]
+        for rule, count in data_quality["violations"].items():
+            action = "skipped (columns not loaded)" if rule in data_quality["skipped_rules"] else data_quality["actions"][rule]
+            table.append(f"| {rule} | {count} | {action} |")
+        lines.append("\n".join(table) + "\n")
+
+    lines.append(f"\n## Validated Insights (top {top_n} by confidence)\n")
+    for h in insights_top:
         lines.append(f"### {h['hypothesis']}\n")
         lines.append(f"- Evidence: {h['evidence']}\n")
         lines.append(f"- Confidence: {h['confidence']}\n")
         lines.append(f"- Validated: {h['validated']}\n\n")
 
+    if horizons:
+        lines.append("\n## Multi-horizon Comparison\n")
+        # table rows must not be separated by blank lines, so build the table as one block
+        table = [
+            "| Horizon | Recent days | Previous days | ROAS (recent) | ROAS (previous) | ROAS change % | CTR change % | Spend change % |",
+            "|---|---|---|---|---|---|---|---|",
+        ]
+
+        def span(days, dates):
+            return f"{days} ({dates[0]} to {dates[1]})" if dates else "0"
+
+        for label, h in horizons.items():
+            pc = h["percent_changes"]
+            table.append(
+                f"| {label} | {span(h['days'], h['recent_dates'])} | {span(h['previous_days'], h['previous_dates'])} "
+                f"| {h['recent_window']['roas']:.3f} | {h['previous_window']['roas']:.3f} "
+                f"| {pc['roas']:.2f} | {pc['ctr']:.2f} | {pc['spend']:.2f} |"
+            )
+        lines.append("\n".join(table) + "\n")
+        for label, h in horizons.items():
+            lines.append(f"- {label}: {h['hypotheses'][0]}\n")
+
+    worst = top_n_records(segments, top_n, key=lambda r: r["roas_change_pct"]) if segments is not None else []
+    if worst:
+        lines.append(f"\n## Segment Analysis (largest ROAS drops by {worst[0]['segment_col']})\n")
+        table = [
+            "| Segment | ROAS (recent) | ROAS (previous) | ROAS change % | CTR change % | Validated hypotheses |",
+            "|---|---|---|---|---|---|",
+        ]
+        for r in worst:
+            table.append(
+                f"| {r['segment']} | {r['recent_roas']:.3f} | {r['previous_roas']:.3f} | {r['roas_change_pct']:.2f} "
+                f"| {r['ctr_change_pct']:.2f} | {len(r['validated'])} |"
+            )
+        lines.append("\n".join(table) + "\n")
+
+    if rollups:
+        lines.append("\n## KPI Rollups (largest ROAS drops per grain)\n")
+        for grain, rows in rollups.items():
+            if not rows:
+                continue
+            dims = [k for k in rows[0] if k not in ROLLUP_VALUE_KEYS]
+            lines.append(f"### {grain}\n")
+            table = [
+                "| " + " | ".join(dims + ["ROAS (recent)", "ROAS (previous)", "ROAS change %", "CTR change %", "Spend (recent)"]) + " |",
+                "|" + "---|" * (len(dims) + 5),
+            ]
+            for r in rows[:top_n]:
+                table.append(
+                    "| " + " | ".join(str(r[d]) for d in dims)
+                    + (" | " if dims else "")
+                    + f"{r['recent_roas']:.3f} | {r['previous_roas']:.3f} | {r['roas_change_pct']:.2f} "
+                    f"| {r['ctr_change_pct']:.2f} | {r['recent_spend']:.2f} |"
+                )
+            lines.append("\n".join(table) + "\n")
+
+    high_spend = (data_profile or {}).get("high_spend_campaigns")
+    if high_spend and high_spend.get("segments"):
+        lines.append(f"\n## High-Spend Campaigns (above p{high_spend['pctile'] * 100:.0f} of campaign spend, "
+                     f"{high_spend['threshold']:.2f})\n")
+        table = ["| Campaign | Spend |", "|---|---|"]
+        for campaign, spend in list(high_spend["segments"].items())[:top_n]:
+            label = str(campaign).replace("|", "\\|")
+            table.append(f"| {label} | {spend:.2f} |")
+        lines.append("\n".join(table) + "\n")
+
+    if anomalies:
+        lines.append(f"\n## Anomaly Alerts ({anomalies['date']}, most severe first)\n")
+        if anomalies["alerts"]:
+            table = ["| Segment | Metric | Value | Baseline median | Robust z | Adverse |", "|---|---|---|---|---|---|"]
+            for a in anomalies["alerts"][:top_n]:
+                label = " / ".join(str(a[d]) for d in a["grain"].split(" x ")).replace("|", "\\|")
+                table.append(
+                    f"| {label} | {a['metric']} | {a['value']:.4g} | {a['baseline_median']:.4g} | {a['z']:+.1f} "
+                    f"| {'yes' if a['adverse'] else 'no'} |"
+                )
+            lines.append("\n".join(table) + "\n")
+            if anomalies["alerts_total"] > len(anomalies["alerts"]):
+                lines.append(f"{anomalies['alerts_total'] - len(anomalies['alerts'])} less severe alerts not shown.\n")
+        else:
+            lines.append("No anomalies on the latest day.\n")
+
+    if funnel and funnel.get("hypotheses"):
+        lines.append("\n## ROAS Funnel Decomposition (largest ROAS drops)\n")
+        lines.append(
+            "ROAS = CTR x CVR x AOV / CPM; each column is the factor's contribution to the ROAS change "
+            "in log-points (they add up to the total).\n"
+        )
+        factors = funnel["factors"]
+        table = [
+            "| Segment | ROAS (recent) | ROAS (previous) | ROAS change % | " + " | ".join(f.upper() for f in factors) + " | Driver |",
+            "|" + "---|" * (len(factors) + 5),
+        ]
+        account = [h for h in funnel["hypotheses"] if not h["segment"]]
+        worst = top_n_records((h for h in funnel["hypotheses"] if h["segment"]), top_n, key=lambda h: h["roas_change_pct"])
+        for h in account + worst:
+            label = " / ".join(str(v) for v in h["segment"].values()) or "account"
+            table.append(
+                f"| {label} | {h['recent_roas']:.3f} | {h['previous_roas']:.3f} | {h['roas_change_pct']:.2f} | "
+                + " | ".join(f"{h['contributions'][f]:+.1f}" for f in factors)
+                + f" | {h['metric'].upper()} ({h['driver_share']:.0%}) |"
+            )
+        lines.append("\n".join(table) + "\n")
+
+    if forecasts and forecasts.get("grains"):
+        n = forecasts["horizon_days"]
+        lines.append(f"\n## Forecast: next {n} days ({forecasts['method']}, {forecasts['interval']:.0%} interval)\n")
+        for grain, g in forecasts["grains"].items():
+            lines.append(f"### {grain} ({g['falling']} of {g['series']} series with falling ROAS)\n")
+            if not g["top"]:
+                continue
+            dims = grain.split(" x ")
+            table = [
+                "| " + " | ".join(dims + ["ROAS (last %dd)" % n, "ROAS forecast", "ROAS interval", "Spend forecast", "Revenue forecast"]) + " |",
+                "|" + "---|" * (len(dims) + 5),
+            ]
+            for r in g["top"][:top_n]:
+                upper = "n/a" if r["roas_upper"] != r["roas_upper"] else f"{r['roas_upper']:.3f}"
+                table.append(
+                    "| " + " | ".join(str(r[d]) for d in dims)
+                    + f" | {r['recent_roas']:.3f} | {r['roas_forecast']:.3f} | {r['roas_lower']:.3f} – {upper} "
+                    f"| {r['spend_forecast']:.2f} | {r['revenue_forecast']:.2f} |"
+                )
+            lines.append("\n".join(table) + "\n")
+
+    if budget and budget.get("moves"):
+        lines.append(f"\n## Recommended Budget Reallocation (by {budget['segment']})\n")
+        lines.append(
+            f"Daily budget {budget['daily_budget']:.2f} across {budget['segments']} segments: expected daily revenue "
+            f"{budget['expected_revenue_current']:.2f} -> {budget['expected_revenue_recommended']:.2f} "
+            f"({budget['expected_lift_pct']:+.2f}%, from fitted response curves).\n"
+        )
+        if budget.get("unallocated"):
+            lines.append(
+                f"{budget['unallocated']:.2f} of the daily budget is unallocated: every segment is at its maximum "
+                f"({budget['allocated']:.2f} allocated).\n"
+            )
+        dims = budget["segment"].split(" x ")
+        table = [
+            "| " + " | ".join(dims + ["Current daily spend", "Recommended", "Change", "Elasticity", "Marginal ROAS"]) + " |",
+            "|" + "---|" * (len(dims) + 5),
+        ]
+        for r in budget["moves"]:
+            table.append(
+                "| " + " | ".join(str(r[d]) for d in dims)
+                + f" | {r['current_daily_spend']:.2f} | {r['recommended_daily_spend']:.2f} | {r['change']:+.2f} "
+                f"| {r['elasticity']:.2f} | {r['marginal_roas']:.3f} |"
+            )
+        lines.append("\n".join(table) + "\n")
+
     lines.append("\n## Creative Recommendations\n")
     if creatives and "ideas" in creatives:
         for i, idea in enumerate(creatives["ideas"], 1):
@@ -65,6 +261,38 @@ def write_report_md(path, insights_validated, creatives, config, summary_text=No
     else:
         lines.append("No creative recommendations generated.\n")
 
+    if creative_fatigue:
+        lines.append(f"\n## Creative Fatigue (CTR decay vs cumulative impressions)\n")
+        lines.append(
+            f"{creative_fatigue['flagged']} of {creative_fatigue['fitted']} creatives (per {creative_fatigue['series_dims']}) "
+            f"lose at least {creative_fatigue['decay_threshold_pct']:.0f}% of their CTR over their exposure.\n"
+        )
+        if creative_fatigue["targets"]:
+            table = [
+                "| Campaign | Adset | Type | Message | Impressions (M) | CTR first -> last | Fitted decay % | t |",
+                "|---|---|---|---|---|---|---|---|",
+            ]
+            for t in creative_fatigue["targets"][:top_n]:
+                table.append(
+                    f"| {t.get('campaign_name', '')} | {t.get('adset_name', '')} | {t.get('creative_type', '')} "
+                    f"| {str(t.get('creative_message', ''))[:60]} | {t['exposure_m']:.2f} "
+                    f"| {t['first_ctr']:.4f} -> {t['last_ctr']:.4f} | {t['decay_pct']:.1f} | {t['t_stat']:.1f} |"
+                )
+            lines.append("\n".join(table) + "\n")
+        for r in (creatives or {}).get("refresh", []):
+            lines.append(f"### Refresh: {r['campaign_name']} / {r.get('adset_name')} ({r.get('creative_type')})\n")
+            for i, idea in enumerate(r["ideas"], 1):
+                lines.append(f"{i}. {idea}\n")
+            lines.append(f"\nRationale: {r['rationale']}\n")
+
+    if charts:
+        lines.append("\n## Campaign Trend Charts (ROAS / CTR)\n")
+        report_dir = os.path.dirname(path) or "."
+        for c in charts:
+            rel = os.path.relpath(c["path"], report_dir).replace(os.sep, "/")
+            lines.append(f"### {c['campaign']}\n")
+            lines.append(f"![{c['campaign']} ROAS/CTR trend]({rel})\n")
+
     lines.append("\n## Config snapshot\n")
     lines.append("```json\n")
     lines.append(json.dumps(config, indent=2))
@@ -73,84 +301,518 @@ def write_report_md(path, insights_validated, creatives, config, summary_text=No
     with open(path, "w", encoding="utf-8") as f:
         f.write("\n".join(lines))
 
-def orchestrate(query: str):
-    cfg = load_config("config/config.yaml")
+def run_pipeline(query: str, cfg: dict, dataset_path: str = None, out_dir: str = "reports") -> dict:
+    """
+    Run the full pipeline for one dataset and write its outputs under `out_dir`.
+    Returns a small run summary (used for the cross-account comparison).
+    A failed run is still counted in the metrics (runs_total{status="error"}) before the error propagates.
+    """
+    # cumulative stage histograms / counters under outputs.logs_dir (Prometheus textfile)
+    metrics = metrics_from_config(cfg)
+    try:
+        return _run_pipeline(query, cfg, dataset_path, out_dir, metrics)
+    except BaseException:
+        metrics.finish(peak_rss_mb=peak_rss_mb(), status="error")
+        try:
+            metrics.flush()
+        except Exception as e:
+            # never mask the run's own error
+            print(f"Could not flush metrics of the failed run: {e}", file=sys.stderr)
+        raise
 
+
+def _run_pipeline(query: str, cfg: dict, dataset_path: str, out_dir: str, metrics) -> dict:
     # load dataset (respect sample mode)
-    dataset_path = cfg["data"].get("dataset_path") or cfg["data"].get("path") or "data/synthetic_fb_ads_undergarments.csv"
+    dataset_path = dataset_path or cfg["data"].get("dataset_path") or cfg["data"].get("path") or "data/synthetic_fb_ads_undergarments.csv"
     sample_mode = cfg["data"].get("sample", False)
     sample_n = cfg["data"].get("sample_n", 500)
-    print("Loading data:", dataset_path, "sample_mode:", sample_mode)
-    df = load_data(dataset_path, sample=sample_mode, sample_n=sample_n)
+    # per-stage profiles (off unless selected by config, KASPARRO_PROFILE or --profile)
+    profiler = profiler_from_config(cfg, out_dir)
+
+    @contextmanager
+    def stage(name):
+        with profiler.stage(name), metrics.stage(name) as rec:
+            yield rec
 
-    # Planner (optional - used to describe steps; safe fallback)
-    planner = PlannerAgent(cfg)
-    plan = planner.plan(query)
+    # Planner runs first: its column projection decides what the loader parses
+    planner_cfg = cfg.get("planner", {})
+    with stage("plan"):
+        dimensions = None
+        if planner_cfg.get("compile_filters", False):
+            # known dimension values (sidecar dictionary) turn names in the query into row filters
+            dimensions = load_or_build_dictionary(dataset_path, planner_cfg.get("filter_dims"))
+        planner = PlannerAgent(cfg, dimensions=dimensions)
+        plan = planner.plan(query)
     print("Plan steps:", plan.get("steps", []))
+    if plan.get("filters") or plan.get("horizon_days") or plan.get("metrics"):
+        print("Compiled query:", {"filters": {d: len(v) for d, v in plan.get("filters", {}).items()},
+                                  "horizon_days": plan.get("horizon_days"), "metrics": plan.get("metrics")})
+    # the compiled horizon and metrics narrow this run's windows and alert metrics
+    if plan.get("horizon_days"):
+        cfg = {**cfg, "analysis": {**cfg["analysis"], "lookback_days": plan["horizon_days"]}}
+    kpi_metrics = [m for m in plan.get("metrics", []) if m in KPIS]
+    if kpi_metrics and "anomaly" in cfg.get("analysis", {}):
+        cfg = {**cfg, "analysis": {**cfg["analysis"], "anomaly": {**cfg["analysis"]["anomaly"], "metrics": kpi_metrics}}}
 
-    # Insight
+    # Date-range pushdown: only the history the insight windows need is read
     insight_agent = InsightAgent(cfg)
-    insight_result = insight_agent.analyze(df)
+    _, max_date = dataset_date_bounds(dataset_path)
+    needed_days = insight_agent.required_days()
+    if cfg.get("analysis", {}).get("forecast", {}).get("enabled", False):
+        needed_days = max(needed_days, ForecastAgent(cfg).history_days)
+    if cfg.get("analysis", {}).get("budget_optimizer", {}).get("enabled", False):
+        needed_days = max(needed_days, BudgetAgent(cfg).history_days)
+    if cfg.get("analysis", {}).get("anomaly", {}).get("enabled", False):
+        needed_days = max(needed_days, AnomalyAgent(cfg).window_days + 1)
+    start_date = (datetime.strptime(max_date, "%Y-%m-%d") - timedelta(days=needed_days)).strftime("%Y-%m-%d")
+
+    # memory governor: in-memory load, streaming aggregation or out-of-core partitions
+    memory = plan_memory(cfg, dataset_path, columns=plan.get("columns") or None, date_range=(start_date, max_date))
+    estimate = memory["estimate"]
+    print(f"Memory governor: {memory['mode']} (estimated {estimate['frame_mb']:.1f} MB, ~{estimate['rows']} rows; "
+          f"budget {memory['budget_mb']} MB)")
+    if memory["mode"] == "partitioned":
+        return run_partitioned(query, cfg, dataset_path, out_dir, memory, date_range=(start_date, max_date),
+                               filters=plan.get("filters") or None)
+
+    print("Loading data:", dataset_path, "sample_mode:", sample_mode, "date_range:", (start_date, max_date))
+    with stage("load_data") as rec:
+        load_stats = {}
+        quality = scanner_from_config(cfg, out_dir)
+        df = load_data(dataset_path, sample=sample_mode, sample_n=sample_n, columns=plan.get("columns") or None,
+                       stats=load_stats, date_range=(start_date, max_date),
+                       seed=cfg.get("runtime", {}).get("random_seed", 42),
+                       strata=cfg["data"].get("sample_strata"), chunksize=cfg["data"].get("sample_chunksize", 50_000),
+                       quality=quality, filters=plan.get("filters") or None, aggregate=memory["mode"] == "streaming",
+                       workers=cfg["data"].get("ingest_workers", 4), read_ahead=cfg["data"].get("read_ahead_chunks", 4))
+        rec["rows"] = metrics.rows = len(df)
+    print(f"Ingest: {load_stats['parts']} part(s), {load_stats['input_bytes'] / 1024 ** 2:.1f} MB "
+          f"in {load_stats['parse_seconds']:.2f}s ({load_stats['input_mb_per_s']:.1f} MB/s)")
+    if "memory_saved_pct" in load_stats:
+        print(
+            f"Column projection: read {load_stats['columns_read']}/{load_stats['columns_total']} columns, "
+            f"~{load_stats['memory_saved_pct']:.1f}% less memory, ~{load_stats['parse_time_saved_pct']:.1f}% less parse time"
+        )
+
+    if quality is not None:
+        dq = quality.summary()
+        print(
+            f"Data quality: {dq['rows_quarantined']} of {dq['rows_scanned']} rows quarantined, "
+            f"{sum(dq['violations'].values())} violations, scan {dq['seconds']:.3f}s of {load_stats['parse_seconds']:.3f}s load"
+        )
+
+    # Insight
+    with stage("analyze"):
+        insight_result = insight_agent.analyze(df)
+        insight_result["horizons"] = insight_agent.analyze_horizons(df)
+    # Per-segment analysis on the shared-memory process backend, streamed to NDJSON as workers finish
+    ndjson_ext = ".ndjson.gz" if cfg.get("outputs", {}).get("ndjson_gzip", False) else ".ndjson"
+    segments_path = None
+    seg_cfg = cfg.get("analysis", {}).get("segment_analysis", {})
+    if seg_cfg.get("enabled", False):
+        with stage("segments"):
+            segment_col = seg_cfg.get("segment_col", "campaign_name")
+            segments_path = os.path.join(out_dir, "segments" + ndjson_ext)
+            n_segments = write_ndjson(segments_path, iter_segments(df, segment_col, cfg, workers=seg_cfg.get("workers")))
+            insight_result["segment_analysis"] = {"segment_col": segment_col, "segments": n_segments, "file": segments_path}
+            print(f"Segment analysis: {n_segments} segments by {segment_col} -> {segments_path}")
+    # KPI rollups at every configured grain, one pass over the frame
+    with stage("rollups"):
+        insight_result["rollups"] = insight_agent.analyze_rollups(df)
+    # summary sketches and high-spend campaigns (thresholds.spend_high_pctile) over the loaded rows
+    with stage("data_profile"):
+        insight_result["data_profile"] = DataAgent(cfg).profile_frame(df)
+    high_spend = insight_result["data_profile"]["high_spend_campaigns"]
+    print(f"High-spend campaigns: {len(high_spend['segments'])} above p{high_spend['pctile'] * 100:.0f} of campaign spend")
+    # ROAS change split into CTR / CVR / AOV / CPM drivers, one structured hypothesis per segment
+    if cfg.get("analysis", {}).get("funnel", {}).get("enabled", False):
+        with stage("funnel"):
+            insight_result["funnel"] = insight_agent.analyze_funnel(df)
+    # CTR decay vs cumulative impressions for every creative within each adset (planned for creative / CTR queries)
+    if cfg.get("analysis", {}).get("creative_fatigue", {}).get("enabled", False) and "detect_creative_fatigue" in plan["steps"]:
+        with stage("creative_fatigue"):
+            insight_result["creative_fatigue"] = FatigueAgent(cfg).detect(df)
+        print(f"Creative fatigue: {insight_result['creative_fatigue']['flagged']} of {insight_result['creative_fatigue']['fitted']} creatives flagged")
+    # latest-day robust z-score alerts per campaign / adset (state file: incremental daily runs)
+    anomaly_cfg = cfg.get("analysis", {}).get("anomaly", {})
+    if anomaly_cfg.get("enabled", False):
+        # state file is configured relative to the reports dir so each account keeps its own
+        with stage("anomalies"):
+            state_file = account_output_path(cfg, anomaly_cfg.get("state_file", "reports/anomaly_state.npz"), out_dir)
+            source = AnomalyAgent.source_key(dataset_path, sample=sample_mode, filters=plan.get("filters"))
+            insight_result["anomalies"] = AnomalyAgent(cfg, state_file=state_file).run(df, source=source)
+        print(f"Anomalies ({insight_result['anomalies']['mode']}): {insight_result['anomalies']['alerts_total']} alerts "
+              f"for {insight_result['anomalies']['date']}")
+    # next-N-day forecasts for every campaign / adset
+    if cfg.get("analysis", {}).get("forecast", {}).get("enabled", False):
+        with stage("forecast"):
+            insight_result["forecasts"] = ForecastAgent(cfg).run(df)
+    # budget reallocation over fitted spend -> revenue curves
+    if cfg.get("analysis", {}).get("budget_optimizer", {}).get("enabled", False):
+        with stage("budget"):
+            insight_result["budget"] = BudgetAgent(cfg).optimize(df)
+    if quality is not None:
+        insight_result["data_quality"] = dq
     # Save raw insight_result for debugging
-    write_json("reports/insight_result_raw.json", insight_result)
+    write_json(os.path.join(out_dir, "insight_result_raw.json"), insight_result)
 
     # Evaluator
-    eval_agent = EvaluatorAgent(cfg)
-    validated = eval_agent.validate(insight_result)
-    eval_agent.save_insights(validated, out_path="reports/insights.json")
-    print("Saved validated insights to reports/insights.json")
+    with stage("evaluate"):
+        eval_agent = EvaluatorAgent(cfg)
+        counts = {"hypotheses": 0, "validated": 0}
+        account_level = []
+
+        def _count(entries):
+            for entry in entries:
+                counts["hypotheses"] += 1
+                counts["validated"] += bool(entry.get("validated"))
+                if entry.get("grain") in (None, "total"):
+                    account_level.append(entry)
+                yield entry
+
+        # streamed as validated; only counters and the account-level entries stay in memory
+        insights_path = os.path.join(out_dir, "insights" + ndjson_ext)
+        eval_agent.save_insights(_count(eval_agent.iter_validate(insight_result)), out_path=insights_path)
+        # insights.json is the account-level deliverable; per-segment drivers are in the NDJSON stream only
+        eval_agent.save_insights(account_level, out_path=os.path.join(out_dir, "insights.json"))
+    print(f"Saved validated insights to {out_dir}/insights.json and {insights_path}")
 
     # Creative: choose a low-CTR campaign to generate creatives for
     # Simple heuristic: pick the hypothesis mentioning CTR drop OR pick sample campaign
-    campaign_to_use = None
-    # try to find a campaign name in dataframe with low ctr
-    try:
-        # compute campaign-level ctr and pick campaign with lowest ctr
-        df2 = df.copy()
-        df2["ctr"] = df2["clicks"] / df2["impressions"].replace({0: 1})
-        campaign_ctr = df2.groupby("campaign_name")["ctr"].mean().sort_values()
-        if not campaign_ctr.empty:
-            campaign_to_use = campaign_ctr.index[0]
-            campaign_ctr_value = float(campaign_ctr.iloc[0])
-        else:
+    with stage("creatives"):
+        campaign_to_use = None
+        # try to find a campaign name in dataframe with low ctr
+        try:
+            # compute campaign-level ctr and pick campaign with lowest ctr
+            # (row ctr is a separate Series: the shared frame is never copied or modified)
+            row_ctr = df["clicks"] / df["impressions"].replace({0: 1})
+            campaign_ctr = row_ctr.groupby(df["campaign_name"]).mean().sort_values()
+            if not campaign_ctr.empty:
+                campaign_to_use = campaign_ctr.index[0]
+                campaign_ctr_value = float(campaign_ctr.iloc[0])
+            else:
+                campaign_to_use = None
+                campaign_ctr_value = None
+        except Exception:
             campaign_to_use = None
             campaign_ctr_value = None
-    except Exception:
-        campaign_to_use = None
-        campaign_ctr_value = None
-
-    creative_agent = CreativeAgent(cfg)
-    creatives_out = {}
-    if campaign_to_use:
-        # find an example current_message for the campaign
-        msg_row = df[df["campaign_name"] == campaign_to_use]["creative_message"].dropna()
-        current_message = msg_row.iloc[0] if not msg_row.empty else ""
-        creatives_out = creative_agent.generate_creatives(
-            campaign_name=campaign_to_use,
-            current_message=current_message,
-            ctr_value=campaign_ctr_value,
-            max_ideas=8
-        )
-        write_json("reports/creatives.json", creatives_out)
-        print("Saved creatives to reports/creatives.json")
-    else:
-        print("No campaign selected for creative generation.")
+
+        creative_agent = CreativeAgent(cfg)
+        creatives_out = {}
+        if campaign_to_use:
+            # find an example current_message for the campaign (deferred column, fetched on demand)
+            current_message = lookup_first_value(dataset_path, "campaign_name", campaign_to_use, "creative_message") or ""
+            creatives_out = creative_agent.generate_creatives(
+                campaign_name=campaign_to_use,
+                current_message=current_message,
+                ctr_value=campaign_ctr_value,
+                max_ideas=8
+            )
+        # replacements for the creatives whose CTR decays with exposure
+        fatigue = insight_result.get("creative_fatigue")
+        if fatigue and fatigue["targets"]:
+            creatives_out = dict(creatives_out)
+            creatives_out["refresh"] = creative_agent.refresh_fatigued(
+                fatigue["targets"], max_targets=cfg["analysis"]["creative_fatigue"].get("refresh_targets", 3)
+            )
+        if creatives_out:
+            write_json(os.path.join(out_dir, "creatives.json"), creatives_out)
+            write_ndjson(os.path.join(out_dir, "creatives" + ndjson_ext), (
+                {"campaign_name": c.get("campaign_name"), "adset_name": c.get("adset_name"), "rank": rank, "idea": idea}
+                for c in [creatives_out] + creatives_out.get("refresh", [])
+                for rank, idea in enumerate(c.get("ideas", []), 1)
+            ))
+            print(f"Saved creatives to {out_dir}/creatives.json and {out_dir}/creatives{ndjson_ext}")
+        else:
+            print("No campaign selected for creative generation.")
+
+    # per-campaign trend charts (only campaigns whose series changed are re-rendered)
+    with stage("charts"):
+        charts = []
+        chart_cfg = cfg.get("charts", {})
+        if chart_cfg.get("enabled", False):
+            charts = render_campaign_charts(
+                df,
+                # chart dir is configured relative to the reports dir so each account gets its own
+                account_output_path(cfg, chart_cfg.get("dir", "reports/charts"), out_dir),
+                max_workers=chart_cfg.get("max_workers"),
+                max_campaigns=chart_cfg.get("max_campaigns"),
+            )
+            print(f"Charts: {sum(c['rendered'] for c in charts)} rendered, {sum(not c['rendered'] for c in charts)} unchanged")
 
     # final report.md
-    write_report_md("reports/report.md", validated, creatives_out, cfg)
-    print("Saved final report to reports/report.md")
+    with stage("report"):
+        write_report_md(os.path.join(out_dir, "report.md"), iter_ndjson(insights_path), creatives_out, cfg,
+                        horizons=insight_result["horizons"], charts=charts,
+                        segments=iter_ndjson(segments_path) if segments_path else None, rollups=insight_result.get("rollups"),
+                        forecasts=insight_result.get("forecasts"), budget=insight_result.get("budget"),
+                        data_quality=insight_result.get("data_quality"), funnel=insight_result.get("funnel"),
+                        creative_fatigue=insight_result.get("creative_fatigue"), anomalies=insight_result.get("anomalies"),
+                        data_profile=insight_result.get("data_profile"))
+    print(f"Saved final report to {out_dir}/report.md")
+
+    # append this run to the indexed run-history store (one transaction)
+    with stage("history"):
+        history_db = cfg.get("outputs", {}).get("history_db")
+        if history_db:
+            history = RunHistory(history_db)
+            try:
+                run_id = history.record_run(query, dataset_path, plan, insight_result, iter_ndjson(insights_path),
+                                            creatives_out)
+            finally:
+                history.close()
+            print(f"Recorded run {run_id} in {history_db}")
 
     # print short summary
     print("\n=== RUN SUMMARY ===")
-    successes = [h for h in validated if h.get("validated")]
-    print(f"Validated insights: {len(successes)} / {len(validated)}")
+    print(f"Validated insights: {counts['validated']} / {counts['hypotheses']}")
     if creatives_out:
         print(f"Creative ideas generated for campaign: {creatives_out.get('campaign_name')}")
-    print("Outputs: reports/insights.json, reports/creatives.json, reports/report.md")
+    retries = retry_stats()
+    if retries["retries"] or retries["gave_up"]:
+        print(f"Retries: {retries['retries']} ({retries['wait_seconds']:.1f}s waiting), {retries['gave_up']} gave up")
+    peak_rss = peak_rss_mb()
+    print(f"Memory: {memory['mode']} mode, {len(df)} rows loaded, peak RSS "
+          + (f"{peak_rss:.0f} MB" if peak_rss is not None else "n/a"))
+    print(f"Outputs: {out_dir}/insights.json, {out_dir}/creatives.json, {out_dir}/report.md")
+    profile_summary = profiler.write_summary()
+    if profile_summary:
+        slowest = max(profiler.results, key=lambda r: r["seconds"])
+        print(f"Profiles: {len(profiler.results)} stages -> {profiler.out_dir} (slowest: {slowest['stage']} {slowest['seconds']:.2f}s)")
+        pooled = [r["stage"] for r in profiler.results if r["stage"] in profiler.pooled_stages]
+        if pooled:
+            print(f"  {', '.join(pooled)}: stage thread only, pool workers are not profiled")
+    metrics.finish(peak_rss_mb=peak_rss)
+    textfile = metrics.flush()
+    if textfile:
+        print(f"Metrics: {textfile}")
+
+    return {
+        "dataset_path": dataset_path,
+        "out_dir": out_dir,
+        "rows": int(len(df)),
+        "recent_roas": float(insight_result["recent_window"]["roas"]),
+        "previous_roas": float(insight_result["previous_window"]["roas"]),
+        "roas_change_pct": float(insight_result["percent_changes"]["roas"]),
+        "ctr_change_pct": float(insight_result["percent_changes"]["ctr"]),
+        "spend_change_pct": float(insight_result["percent_changes"]["spend"]),
+        "validated": counts["validated"],
+        "hypotheses": counts["hypotheses"],
+        # window totals let partitioned runs recombine account-level KPIs exactly
+        "windows": {w: {k: float(insight_result[f"{w}_window"][k]) for k in WINDOW_TOTALS} for w in ("recent", "previous")},
+        "memory": {"mode": memory["mode"], "budget_mb": memory["budget_mb"], "estimated_mb": estimate["frame_mb"],
+                   "peak_rss_mb": peak_rss},
+        "retries": {k: retries[k] for k in RetryStats.FIELDS},
+    }
+
+
+WINDOW_TOTALS = ("spend", "impressions", "clicks", "revenue")
+
+
+def _pct_change(recent: float, previous: float) -> float:
+    return (recent - previous) / previous * 100.0 if previous else 0.0
+
+
+def run_partitioned(query: str, cfg: dict, dataset_path: str, out_dir: str, memory: dict,
+                    date_range: tuple = None, filters: dict = None) -> dict:
+    """
+    Out-of-core mode of the memory governor: split the dataset on disk into memory["partitions"]
+    parts by a hash of memory.partition_col (whole campaigns per part) and run the pipeline on
+    one part at a time, each writing to <out_dir>/partitions/<part>/ (see accounts_summary.md there).
+    Per-campaign results are exact; each part's windows are anchored on its own latest date.
+    Returns a run summary with the account-level KPIs recombined from the parts' window totals.
+    """
+    mem_cfg = cfg.get("memory", {})
+    partition_col = mem_cfg.get("partition_col", "campaign_name")
+    parts_dir = os.path.join(out_dir, "partitions")
+    # parts are sized to fit: they may stream but never partition again. They run one at a
+    # time in this process, so each keeps the full segment / chart pools (see account_config)
+    part_cfg = {**cfg, "memory": {**mem_cfg, "mode": "auto", "allow_partition": False}}
+    t0 = time.perf_counter()
+    results = []
+    os.makedirs(out_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="spill-", dir=out_dir) as spill:
+        paths = partition_csv(dataset_path, spill, memory["partitions"], partition_col, date_range=date_range,
+                              filters=filters, chunksize=cfg["data"].get("sample_chunksize", 50_000))
+        print(f"Partitioned {dataset_path} by {partition_col} into {len(paths)} parts")
+        for path in paths:
+            res = _run_account((query, part_cfg, path, os.path.join(parts_dir, account_name(path))))
+            status = "ok" if res["ok"] else f"FAILED ({res['error']})"
+            print(f"[{res['account']}] {status} in {res['seconds']:.1f}s")
+            results.append(res)
+    write_accounts_summary(parts_dir, results, time.perf_counter() - t0)
+
+    ok = [r for r in results if r.get("ok")]
+    if not ok:
+        raise RuntimeError(f"All {len(results)} partitions of {dataset_path} failed")
+    totals = {w: {k: sum(r["windows"][w][k] for r in ok) for k in WINDOW_TOTALS} for w in ("recent", "previous")}
+    recent, previous = totals["recent"], totals["previous"]
+    roas = {w: t["revenue"] / t["spend"] if t["spend"] else 0.0 for w, t in totals.items()}
+    ctr = {w: t["clicks"] / t["impressions"] if t["impressions"] else 0.0 for w, t in totals.items()}
+    peak_rss = peak_rss_mb()
+    print(f"\n=== PARTITIONED RUN SUMMARY ===\n{len(ok)}/{len(results)} partitions succeeded, peak RSS "
+          + (f"{peak_rss:.0f} MB" if peak_rss is not None else "n/a"))
+    print(f"Outputs: {parts_dir}/accounts_summary.md, {parts_dir}/<part>/")
+    return {
+        "dataset_path": dataset_path,
+        "out_dir": out_dir,
+        "rows": sum(r["rows"] for r in ok),
+        "recent_roas": roas["recent"],
+        "previous_roas": roas["previous"],
+        "roas_change_pct": _pct_change(roas["recent"], roas["previous"]),
+        "ctr_change_pct": _pct_change(ctr["recent"], ctr["previous"]),
+        "spend_change_pct": _pct_change(recent["spend"], previous["spend"]),
+        "validated": sum(r["validated"] for r in ok),
+        "hypotheses": sum(r["hypotheses"] for r in ok),
+        "windows": totals,
+        "memory": {"mode": "partitioned", "partitions": len(paths), "failed_partitions": len(results) - len(ok),
+                   "budget_mb": memory["budget_mb"], "estimated_mb": memory["estimate"]["frame_mb"],
+                   "peak_rss_mb": peak_rss},
+    }
+
+
+DATASET_PATTERNS = ("*.csv", "*.csv.gz", "*.csv.bz2", "*.csv.xz", "*.zip")
+
+
+def resolve_datasets(spec: str) -> list:
+    """
+    Expand a dataset spec (file, directory or glob) into a sorted list of datasets, one per account.
+    In a directory, every data file is an account and so is every subdirectory holding
+    part files (its dataset is the glob "<subdir>/*", read as one multi-part export).
+    """
+    if os.path.isdir(spec):
+        paths = []
+        for pattern in DATASET_PATTERNS:
+            paths.extend(glob.glob(os.path.join(spec, pattern)))
+        for sub in glob.glob(os.path.join(spec, "*", "")):
+            if any(glob.glob(os.path.join(sub, pattern)) for pattern in DATASET_PATTERNS):
+                paths.append(os.path.join(os.path.normpath(sub), "*"))
+        return sorted(paths)
+    if glob.has_magic(spec):
+        return sorted(p for p in glob.glob(spec) if os.path.isfile(p))
+    return [spec]
+
+
+def account_name(dataset_path: str) -> str:
+    """Account id used for per-account output dirs: the dataset file name without extensions (dir name for part globs)."""
+    if glob.has_magic(dataset_path):
+        return os.path.basename(os.path.dirname(dataset_path))
+    return os.path.basename(dataset_path).split(".")[0]
+
+
+def account_config(cfg: dict) -> dict:
+    """
+    Config for one account of a multi-account run. Each account already runs in its own
+    process, so its nested pools (segment analysis, charts) run single-process instead of
+    each opening one sized to the machine (accounts x cores processes).
+    """
+    analysis = cfg.get("analysis", {})
+    return {
+        **cfg,
+        "analysis": {**analysis, "segment_analysis": {**analysis.get("segment_analysis", {}), "workers": 1}},
+        "charts": {**cfg.get("charts", {}), "max_workers": 1},
+    }
+
+
+def _run_account(job):
+    """Process-pool worker: run one account and never raise (failures are isolated per account)."""
+    query, cfg, dataset_path, out_dir = job
+    t0 = time.perf_counter()
+    try:
+        summary = run_pipeline(query, cfg, dataset_path=dataset_path, out_dir=out_dir)
+        summary.update({"account": account_name(dataset_path), "ok": True})
+    except Exception as e:
+        summary = {"account": account_name(dataset_path), "dataset_path": dataset_path, "out_dir": out_dir,
+                   "ok": False, "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()}
+    summary["seconds"] = time.perf_counter() - t0
+    return summary
+
+
+def write_accounts_summary(out_dir: str, results: list, elapsed: float) -> dict:
+    """Cross-account comparison of ROAS changes (JSON + Markdown) with throughput."""
+    ok = sorted((r for r in results if r.get("ok")), key=lambda r: r["roas_change_pct"])
+    failed = [r for r in results if not r.get("ok")]
+    throughput = len(results) / (elapsed / 60.0) if elapsed > 0 else 0.0
+    summary = {
+        "accounts": len(results),
+        "succeeded": len(ok),
+        "failed": len(failed),
+        "elapsed_seconds": elapsed,
+        "accounts_per_minute": throughput,
+        "results": ok + failed,
+    }
+    write_json(os.path.join(out_dir, "accounts_summary.json"), summary)
+
+    lines = [
+        "# Cross-account ROAS Comparison",
+        "",
+        f"Accounts: {len(results)} (succeeded: {len(ok)}, failed: {len(failed)}) — "
+        f"{elapsed:.1f}s, {throughput:.1f} accounts/minute",
+        "",
+        "| Account | ROAS (recent) | ROAS (previous) | ROAS change % | CTR change % | Spend change % | Validated |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for r in ok:
+        lines.append(
+            f"| [{r['account']}]({os.path.relpath(r['out_dir'], out_dir)}/report.md) | {r['recent_roas']:.3f} | {r['previous_roas']:.3f} "
+            f"| {r['roas_change_pct']:.2f} | {r['ctr_change_pct']:.2f} | {r['spend_change_pct']:.2f} | {r['validated']}/{r['hypotheses']} |"
+        )
+    if failed:
+        lines += ["", "## Failed accounts", ""]
+        lines += [f"- {r['account']}: {r['error']}" for r in failed]
+    with open(os.path.join(out_dir, "accounts_summary.md"), "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return summary
+
+
+def orchestrate(query: str, dataset: str = None, workers: int = None, profile: str = None):
+    """
+    Run the pipeline for the configured dataset, or for every dataset matched by
+    `dataset` (a file, directory or glob). Several datasets are processed in a
+    process pool sized to the available cores, each writing to reports/accounts/<account>/.
+    `profile` ("all" or comma-separated stage names) turns on per-stage profiling.
+    """
+    cfg = load_config("config/config.yaml")
+    # shared retry budget and run deadline (inherited by forked account workers)
+    configure_retry(cfg)
+    if profile:
+        cfg["profiling"] = {**cfg.get("profiling", {}), "enabled": True, "stages": profile}
+    datasets = resolve_datasets(dataset) if dataset else [None]
+    if not datasets:
+        print("No datasets matched:", dataset)
+        return None
+    if len(datasets) == 1:
+        return run_pipeline(query, cfg, dataset_path=datasets[0])
+
+    reports_dir = cfg.get("outputs", {}).get("reports_dir", "reports")
+    accounts_dir = os.path.join(reports_dir, "accounts")
+    account_cfg = account_config(cfg)
+    jobs = [(query, account_cfg, path, os.path.join(accounts_dir, account_name(path))) for path in datasets]
+    workers = min(workers or available_cores(), len(jobs))
+    print(f"Processing {len(jobs)} accounts with {workers} workers")
+
+    t0 = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for res in pool.map(_run_account, jobs):
+            status = "ok" if res["ok"] else f"FAILED ({res['error']})"
+            print(f"[{res['account']}] {status} in {res['seconds']:.1f}s")
+            results.append(res)
+    elapsed = time.perf_counter() - t0
+
+    summary = write_accounts_summary(reports_dir, results, elapsed)
+    print(f"\n=== ACCOUNTS SUMMARY ===\n{summary['succeeded']}/{summary['accounts']} accounts succeeded, "
+          f"{summary['accounts_per_minute']:.1f} accounts/minute")
+    print(f"Outputs: {reports_dir}/accounts_summary.md, {accounts_dir}/<account>/")
+    return summary
+
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python run.py \"Analyze ROAS drop\"")
-        sys.exit(1)
-    query = sys.argv[1]
-    orchestrate(query)
+    parser = argparse.ArgumentParser(description="Agentic Facebook Ads analyst")
+    parser.add_argument("query", help='e.g. "Analyze ROAS drop"')
+    parser.add_argument("--data", help="dataset file, directory or glob (default: data.dataset_path from config)")
+    parser.add_argument("--workers", type=int, help="process pool size for multi-account runs (default: available cores)")
+    parser.add_argument("--profile", nargs="?", const="all", metavar="STAGES",
+                        help="profile every stage, or only the comma-separated STAGES (writes reports/profile/)")
+    args = parser.parse_args()
+    orchestrate(args.query, dataset=args.data, workers=args.workers, profile=args.profile)
@@ -0,0 +1,30 @@
+# scripts/bench_budget.py
+"""
+Benchmark the budget optimizer: curve fitting + greedy allocation over many adsets.
+Usage: python scripts/bench_budget.py [n_segments] [n_days]
+"""
+import sys, os, time
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+from src.utils.budget import fit_response_curves, allocate_budget, response
+
+n_segments = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+n_days = int(sys.argv[2]) if len(sys.argv) > 2 else 28
+
+rng = np.random.default_rng(0)
+spend = rng.gamma(2.0, 20.0, size=(n_segments, n_days))
+a_true, b_true = rng.uniform(1, 5, n_segments), rng.uniform(0.3, 0.8, n_segments)
+revenue = a_true[:, None] * spend ** b_true[:, None] * rng.lognormal(0, 0.1, size=spend.shape)
+print(f"{n_segments} segments x {n_days} days")
+
+t0 = time.perf_counter()
+a, b, _ = fit_response_curves(spend, revenue)
+t1 = time.perf_counter()
+current = spend[:, -7:].mean(axis=1)
+alloc = allocate_budget(a, b, current.sum(), 0.5 * current, 2.0 * current)
+t2 = time.perf_counter()
+
+lift = response(a, b, alloc).sum() / response(a, b, current).sum() - 1
+print(f"fit: {t1 - t0:.2f}s, allocate: {t2 - t1:.2f}s, expected revenue lift: {lift:+.2%}")
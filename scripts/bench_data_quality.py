@@ -0,0 +1,60 @@
+# scripts/bench_data_quality.py
+"""
+Benchmark the data-quality scan's cost on load: load_data with and without a scanner,
+plus the per-frame work every analysis needs anyway (parsed dates, segment dictionary
+codes), which the scan leaves cached for the later stages.
+On the whole-file path the scan (the scanner's own time) must stay under 10% (MAX_OVERHEAD)
+of the plain load time, and under 10% of the load plus that work. The wall-clock load delta is
+printed too; on a busy machine its noise is larger than the scan.
+Usage: python scripts/bench_data_quality.py [copies_of_the_dataset] [repeats]
+"""
+import gc, sys, os, tempfile, time
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import pandas as pd
+from src.agents.planner_agent import PlannerAgent
+from src.utils.data_quality import DataQualityScanner
+from src.utils.frame_guard import factorized, parsed_dates
+from src.utils.loader import load_config, load_data
+
+copies = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 9
+MAX_OVERHEAD = 0.10
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+columns = PlannerAgent(cfg).plan("Analyze ROAS drop")["columns"]
+base = pd.read_csv(os.path.join(PROJECT_ROOT, cfg["data"]["dataset_path"]))
+
+
+def timed(path, scanner, **kwargs):
+    gc.collect()
+    t0 = time.perf_counter()
+    df = load_data(path, columns=columns, quality=scanner, **kwargs)
+    t1 = time.perf_counter()
+    parsed_dates(df)
+    for col in ("campaign_name", "adset_name"):
+        factorized(df, col)
+    return t1 - t0, time.perf_counter() - t0
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "ads.csv")
+    # distinct campaign names per copy, so the copies are not duplicates of each other
+    pd.concat([base.assign(campaign_name=base["campaign_name"] + f" #{i}") for i in range(copies)],
+              ignore_index=True).to_csv(path, index=False)
+    print(f"{len(base) * copies} rows, {len(columns)} columns loaded")
+    for label, kwargs in (("whole file", {}), ("date range", {"date_range": (base["date"].min(), None)})):
+        # interleaved, best of `repeats`: drift on a busy machine hits both sides alike
+        plain, scanned, scan_seconds = [], [], []
+        for _ in range(repeats):
+            plain.append(timed(path, None, **kwargs))
+            scanner = DataQualityScanner()
+            scanned.append(timed(path, scanner, **kwargs))
+            scan_seconds.append(scanner.seconds)
+        load = min(s[0] for s in scanned) / min(p[0] for p in plain) - 1
+        share = min(scan_seconds) / min(p[0] for p in plain)
+        net = min(s[1] for s in scanned) / min(p[1] for p in plain) - 1
+        print(f"{label}: load {min(p[0] for p in plain):.3f}s -> {min(s[0] for s in scanned):.3f}s ({load:+.1%}); "
+              f"scan {min(scan_seconds) * 1000:.0f} ms = {share:.1%} of the load; with dates + segment codes {net:+.1%}")
+        if label == "whole file":
+            assert share < MAX_OVERHEAD and net < MAX_OVERHEAD, (label, share, net)
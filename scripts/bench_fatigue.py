@@ -0,0 +1,43 @@
+# scripts/bench_fatigue.py
+"""
+Benchmark batched creative-fatigue fits over creative x adset exposure curves.
+Usage: python scripts/bench_fatigue.py [n_series] [n_days]
+"""
+import sys, os, time
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+import pandas as pd
+from src.utils.loader import load_config
+from src.agents.fatigue_agent import FatigueAgent
+
+n_series = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+n_days = int(sys.argv[2]) if len(sys.argv) > 2 else 14
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+
+rng = np.random.default_rng(0)
+days = pd.date_range("2025-01-01", periods=n_days).strftime("%Y-%m-%d")
+n = n_series * n_days
+impressions = rng.integers(1_000, 50_000, n).astype(float)
+# a fifth of the creatives decay with exposure
+decay = np.repeat(np.where(rng.random(n_series) < 0.2, 4.0, 0.0), n_days)
+exposure = (pd.Series(impressions).groupby(np.repeat(np.arange(n_series), n_days)).cumsum() - impressions).to_numpy()
+ctr = 0.02 * np.exp(-decay * exposure / 1e6) * rng.lognormal(0, 0.05, n)
+order = rng.permutation(n)  # rows arrive unsorted, as in an export
+df = pd.DataFrame({
+    "campaign_name": np.repeat(np.arange(n_series) // 500, n_days).astype(str),
+    "adset_name": np.repeat(np.arange(n_series) // 10, n_days).astype(str),
+    "creative_type": "Image",
+    "creative_message": np.repeat(np.arange(n_series) % 10, n_days).astype(str),
+    "date": np.tile(days, n_series),
+    "impressions": impressions,
+    "clicks": np.round(impressions * ctr),
+}).iloc[order].reset_index(drop=True)
+print(f"{n_series} creative x adset series x {n_days} days ({n} rows)")
+
+agent = FatigueAgent(cfg)
+t0 = time.perf_counter()
+result = agent.detect(df)
+elapsed = time.perf_counter() - t0
+print(f"fatigue: {elapsed:.2f}s, {result['flagged']} of {result['fitted']} fitted creatives flagged")
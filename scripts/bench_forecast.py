@@ -0,0 +1,40 @@
+# scripts/bench_forecast.py
+"""
+Benchmark batched forecasting: fit every series of a (segment x day) frame at once.
+Usage: python scripts/bench_forecast.py [n_series] [n_days]
+"""
+import sys, os, time
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+import pandas as pd
+from src.utils.loader import load_config
+from src.agents.forecast_agent import ForecastAgent
+
+n_series = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+n_days = int(sys.argv[2]) if len(sys.argv) > 2 else 56
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+cfg["analysis"]["forecast"]["segments"] = [["campaign_name"]]
+cfg["analysis"]["forecast"]["history_days"] = n_days
+
+rng = np.random.default_rng(0)
+days = pd.date_range("2025-01-01", periods=n_days).strftime("%Y-%m-%d")
+n = n_series * n_days
+trend = np.repeat(rng.normal(0, 1, n_series), n_days) * np.tile(np.arange(n_days), n_series)
+df = pd.DataFrame({
+    "campaign_name": np.repeat(np.arange(n_series), n_days).astype(str),
+    "date": np.tile(days, n_series),
+    "spend": rng.gamma(2.0, 50.0, n),
+    "revenue": np.clip(rng.gamma(2.0, 150.0, n) + trend, 0, None),
+})
+print(f"{n_series} series x {n_days} days ({n} rows)")
+
+for method in ("linear", "holt"):
+    cfg["analysis"]["forecast"]["method"] = method
+    agent = ForecastAgent(cfg)
+    t0 = time.perf_counter()
+    result = agent.run(df)
+    elapsed = time.perf_counter() - t0
+    g = result["grains"]["campaign_name"]
+    print(f"{method:>6}: {elapsed:.2f}s for {g['series']} series ({g['falling']} with falling ROAS)")
@@ -0,0 +1,57 @@
+# scripts/bench_ingest.py
+"""
+Benchmark ingestion throughput of compressed and multi-part exports against the plain CSV.
+MB/s is reported per on-disk MB and per CSV (uncompressed) MB.
+Usage: python scripts/bench_ingest.py [n_rows] [n_parts] [workers]
+"""
+import sys, os, bz2, gzip, shutil, tempfile, time, zipfile
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+import pandas as pd
+from src.utils.loader import load_config, load_data
+
+n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+n_parts = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+base = pd.read_csv(os.path.join(PROJECT_ROOT, cfg["data"]["dataset_path"]))
+df = base.iloc[np.arange(n_rows) % len(base)].reset_index(drop=True)
+columns = ["campaign_name", "adset_name", "date", "spend", "impressions", "clicks", "purchases", "revenue"]
+
+tmp = tempfile.mkdtemp()
+try:
+    plain = os.path.join(tmp, "ads.csv")
+    df.to_csv(plain, index=False)
+    shutil.copyfileobj(open(plain, "rb"), gzip.open(os.path.join(tmp, "ads.csv.gz"), "wb", compresslevel=6))
+    shutil.copyfileobj(open(plain, "rb"), bz2.open(os.path.join(tmp, "ads.csv.bz2"), "wb"))
+    with zipfile.ZipFile(os.path.join(tmp, "ads.zip"), "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.write(plain, "ads.csv")
+    os.makedirs(os.path.join(tmp, "parts"))
+    for i, part in enumerate(np.array_split(np.arange(n_rows), n_parts)):
+        with gzip.open(os.path.join(tmp, "parts", f"part-{i:03d}.csv.gz"), "wt", compresslevel=6) as f:
+            df.iloc[part].to_csv(f, index=False)
+    csv_mb = os.path.getsize(plain) / 1024 ** 2
+
+    cases = [
+        ("plain csv", plain, 1),
+        ("gzip", os.path.join(tmp, "ads.csv.gz"), 1),
+        ("bz2", os.path.join(tmp, "ads.csv.bz2"), 1),
+        ("zip", os.path.join(tmp, "ads.zip"), 1),
+        (f"{n_parts} gzip parts, 1 thread", os.path.join(tmp, "parts", "*.csv.gz"), 1),
+        (f"{n_parts} gzip parts, {workers} threads", os.path.join(tmp, "parts", "*.csv.gz"), workers),
+    ]
+    print(f"{n_rows} rows, {csv_mb:.1f} MB as CSV, projection of {len(columns)} columns")
+    baseline = None
+    for name, spec, w in cases:
+        stats = {}
+        t0 = time.perf_counter()
+        out = load_data(spec, columns=columns, stats=stats, workers=w, read_ahead=4, chunksize=100_000)
+        elapsed = time.perf_counter() - t0
+        assert len(out) == n_rows
+        baseline = baseline or elapsed
+        print(f"{name:<28} {elapsed:6.2f}s  {stats['input_bytes'] / 1024 ** 2:7.1f} MB on disk "
+              f"{stats['input_mb_per_s']:7.1f} MB/s  {csv_mb / elapsed:7.1f} CSV MB/s  {baseline / elapsed:5.2f}x plain")
+finally:
+    shutil.rmtree(tmp)
@@ -0,0 +1,40 @@
+# scripts/bench_planner.py
+"""
+Benchmark query compilation against a large dimension dictionary.
+Usage: python scripts/bench_planner.py [n_values] [n_queries]
+"""
+import sys, os, time
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+from src.utils.loader import load_config
+from src.utils.dim_dictionary import DimensionDictionary
+from src.agents.planner_agent import PlannerAgent
+
+n_values = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+
+rng = np.random.default_rng(0)
+words = ["Men", "Women", "Comfort", "Max", "Seamless", "Cotton", "Summer", "Sport", "Launch", "Classic", "Bold", "Fit"]
+campaigns = sorted({f"{' '.join(rng.choice(words, 3))} {i}" for i in range(n_values)})
+t0 = time.perf_counter()
+dims = DimensionDictionary({
+    "campaign_name": campaigns,
+    "platform": ["Facebook", "Instagram", "Audience Network", "Messenger"],
+    "country": ["US", "UK", "IN", "DE", "FR"],
+    "audience_type": ["Broad", "Lookalike", "Retargeting"],
+})
+build = time.perf_counter() - t0
+planner = PlannerAgent(cfg, dimensions=dims)
+queries = [f"Analyze ROAS drop for {campaigns[i]} on Instagram in US over the last {7 + i % 21} days"
+           for i in rng.integers(0, len(campaigns), n_queries)]
+
+t0 = time.perf_counter()
+for q in queries:
+    plan = planner.plan(q)
+elapsed = time.perf_counter() - t0
+assert plan["filters"]["platform"] == ["Instagram"] and len(plan["filters"]["campaign_name"]) >= 1
+print(f"{len(campaigns)} known campaign values: dictionary built in {build:.2f}s")
+print(f"plan compilation: {elapsed / n_queries * 1e6:.0f} µs per query ({n_queries} queries)")
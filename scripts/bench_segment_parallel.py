@@ -0,0 +1,44 @@
+# scripts/bench_segment_parallel.py
+"""
+Benchmark per-segment analysis: serial vs the shared-memory process backend on 1..N cores.
+Usage: python scripts/bench_segment_parallel.py [n_segments] [max_workers]
+"""
+import sys, os, time
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+import pandas as pd
+from src.utils.loader import load_config
+from src.utils.shared_frame import analyze_segments
+
+n_segments = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+
+# synthetic frame: 90 days per segment
+rng = np.random.default_rng(0)
+days = pd.date_range("2025-01-01", periods=90).strftime("%Y-%m-%d")
+n = n_segments * len(days)
+df = pd.DataFrame({
+    "segment": np.repeat(np.arange(n_segments), len(days)).astype(str),
+    "date": np.tile(days, n_segments),
+    "spend": rng.gamma(2.0, 50.0, n),
+    "impressions": rng.integers(1_000, 100_000, n),
+    "clicks": rng.integers(10, 1_000, n).astype(float),
+    "purchases": rng.integers(0, 50, n),
+    "revenue": rng.gamma(2.0, 150.0, n),
+})
+
+t0 = time.perf_counter()
+serial = analyze_segments(df, "segment", cfg, workers=1)
+t_serial = time.perf_counter() - t0
+print(f"{n_segments} segments, {n} rows")
+print(f"serial: {t_serial:.2f}s")
+
+for w in range(1, max_workers + 1):
+    t0 = time.perf_counter()
+    out = analyze_segments(df, "segment", cfg, workers=w) if w > 1 else serial
+    t = time.perf_counter() - t0 if w > 1 else t_serial
+    assert len(out) == len(serial)
+    print(f"workers={w}: {t:.2f}s  speedup x{t_serial / t:.2f}")
@@ -0,0 +1,92 @@
+# scripts/test_accounts.py
+import sys, os, json, tempfile, gzip
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import pandas as pd
+import yaml
+
+from run import account_config, account_name, orchestrate, resolve_datasets
+from src.utils.helpers import account_output_path
+from src.utils.loader import load_config
+
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+df = pd.read_csv(os.path.join(PROJECT_ROOT, cfg["data"]["dataset_path"]))
+campaigns = sorted(df["campaign_name"].unique())
+
+# side outputs follow the account's reports dir; absolute paths pass through, escapes are rejected
+assert account_output_path(cfg, "reports/charts", "reports/accounts/a") == os.path.join("reports/accounts/a", "charts")
+assert account_output_path(cfg, "reports/charts", None) == "reports/charts"
+assert account_output_path(cfg, "/tmp/charts", "reports/accounts/a") == "/tmp/charts"
+for bad in ("../charts", "data/charts", "reports/../../charts"):
+    try:
+        account_output_path(cfg, bad, "reports/accounts/a")
+        raise AssertionError(bad)
+    except ValueError:
+        pass
+
+cwd = os.getcwd()
+with tempfile.TemporaryDirectory() as tmp:
+    data_dir = os.path.join(tmp, "exports")
+    os.makedirs(os.path.join(data_dir, "gamma"))
+    # three accounts: a plain file, a compressed file and a directory of part files
+    df[df["campaign_name"].isin(campaigns[::3])].to_csv(os.path.join(data_dir, "alpha.csv"), index=False)
+    with gzip.open(os.path.join(data_dir, "beta.csv.gz"), "wt") as fh:
+        df[df["campaign_name"].isin(campaigns[1::3])].to_csv(fh, index=False)
+    gamma = df[df["campaign_name"].isin(campaigns[2::3])]
+    gamma.iloc[: len(gamma) // 2].to_csv(os.path.join(data_dir, "gamma", "part-0.csv"), index=False)
+    gamma.iloc[len(gamma) // 2:].to_csv(os.path.join(data_dir, "gamma", "part-1.csv"), index=False)
+    # and one broken export
+    with open(os.path.join(data_dir, "broken.csv"), "w") as fh:
+        fh.write("foo,bar\n1,2\n")
+
+    datasets = resolve_datasets(data_dir)
+    assert datasets == sorted([os.path.join(data_dir, f) for f in ("alpha.csv", "beta.csv.gz", "broken.csv")]
+                              + [os.path.join(data_dir, "gamma", "*")]), datasets
+    assert [account_name(p) for p in datasets] == ["alpha", "beta", "broken", "gamma"]
+    assert resolve_datasets(os.path.join(data_dir, "*.csv")) == [os.path.join(data_dir, f) for f in ("alpha.csv", "broken.csv")]
+    assert resolve_datasets(os.path.join(data_dir, "gamma", "*")) == [os.path.join(data_dir, "gamma", f) for f in ("part-0.csv", "part-1.csv")]
+
+    # orchestrate reads config/config.yaml and writes reports/ relative to the working directory
+    run_cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+    run_cfg["charts"]["enabled"] = False
+    run_cfg["data"]["sample"] = False
+    run_cfg["outputs"]["logs_dir"] = "logs"
+    os.makedirs(os.path.join(tmp, "config"))
+    with open(os.path.join(tmp, "config", "config.yaml"), "w") as fh:
+        yaml.safe_dump(run_cfg, fh)
+    os.chdir(tmp)
+    try:
+        summary = orchestrate("Analyze ROAS drop", dataset=data_dir, workers=2)
+    finally:
+        os.chdir(cwd)
+
+    # accounts already run in a pool: their segment and chart pools are single-process
+    nested = account_config(run_cfg)
+    assert nested["analysis"]["segment_analysis"]["workers"] == 1 and nested["charts"]["max_workers"] == 1
+    assert nested["analysis"]["segment_analysis"]["segment_col"] == run_cfg["analysis"]["segment_analysis"]["segment_col"]
+    assert run_cfg["analysis"]["segment_analysis"]["workers"] is None and run_cfg["charts"]["max_workers"] is None
+
+    # the broken account fails on its own; the others complete with their own outputs
+    assert (summary["accounts"], summary["succeeded"], summary["failed"]) == (4, 3, 1), summary
+    reports = os.path.join(tmp, "reports")
+    with open(os.path.join(reports, "accounts_summary.json")) as fh:
+        saved = json.load(fh)
+    assert [r["account"] for r in saved["results"]][-1] == "broken" and not saved["results"][-1]["ok"]
+    assert saved["results"][-1]["error"]
+    ok = saved["results"][:3]
+    assert sorted(r["account"] for r in ok) == ["alpha", "beta", "gamma"]
+    assert [r["roas_change_pct"] for r in ok] == sorted(r["roas_change_pct"] for r in ok)
+    assert sum(r["rows"] for r in ok) == len(df)
+    for r in ok:
+        assert os.path.exists(os.path.join(reports, "accounts", r["account"], "report.md"))
+        assert os.path.exists(os.path.join(reports, "accounts", r["account"], "insights.json"))
+    with open(os.path.join(reports, "accounts_summary.md")) as fh:
+        md = fh.read()
+    assert "Accounts: 4 (succeeded: 3, failed: 1)" in md
+    for name in ("alpha", "beta", "gamma"):
+        assert f"[{name}](accounts/{name}/report.md)" in md
+    assert "## Failed accounts" in md and f"- broken: {saved['results'][-1]['error']}" in md
+
+print("--- ACCOUNTS ---")
+print(f"{summary['succeeded']}/{summary['accounts']} accounts, {summary['accounts_per_minute']:.1f} accounts/minute")
@@ -0,0 +1,48 @@
+# scripts/test_budget.py
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+from src.utils.loader import load_config, load_data
+from src.utils.budget import fit_response_curves, allocate_budget, marginal_roas
+from src.agents.budget_agent import BudgetAgent
+
+# curves are recovered from noisy daily history
+rng = np.random.default_rng(0)
+spend = rng.gamma(2.0, 20.0, size=(200, 28))
+a_true, b_true = rng.uniform(1, 5, 200), rng.uniform(0.3, 0.8, 200)
+revenue = a_true[:, None] * spend ** b_true[:, None] * rng.lognormal(0, 0.05, size=spend.shape)
+a, b, n = fit_response_curves(spend, revenue)
+assert np.abs(b - b_true).max() < 0.1
+
+# allocation spends exactly the budget, respects bounds and equalizes marginal ROAS
+current = spend[:, -7:].mean(axis=1)
+lower, upper = 0.5 * current, 2.0 * current
+alloc = allocate_budget(a, b, current.sum(), lower, upper, steps=20_000)
+assert abs(alloc.sum() - current.sum()) < 1e-6
+assert (alloc >= lower - 1e-9).all() and (alloc <= upper + 1e-9).all()
+step = (current.sum() - lower.sum()) / 20_000
+free = (alloc > lower + step) & (alloc < upper - step)
+mr = marginal_roas(a, b, alloc)[free]
+assert mr.max() / mr.min() < 1.2
+
+# a budget below the minimums scales them down (never overspends); above the maximums the rest is left over
+small = allocate_budget(a, b, 0.25 * current.sum(), lower, upper)
+assert abs(small.sum() - 0.25 * current.sum()) < 1e-6 and np.allclose(small / lower, 0.5)
+big = allocate_budget(a, b, 3.0 * current.sum(), lower, upper)
+assert np.allclose(big, upper)
+
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+df = load_data(os.path.join(PROJECT_ROOT, cfg["data"]["dataset_path"]))
+result = BudgetAgent(cfg).optimize(df)
+assert result["expected_revenue_recommended"] >= result["expected_revenue_current"]
+assert result["unallocated"] == 0.0 and abs(result["allocated"] - result["daily_budget"]) < 1e-6 * result["daily_budget"]
+
+opt = cfg["analysis"]["budget_optimizer"]
+capped = BudgetAgent({**cfg, "analysis": {**cfg["analysis"], "budget_optimizer": {**opt, "daily_budget": 10 * result["daily_budget"]}}}).optimize(df)
+assert abs(capped["allocated"] + capped["unallocated"] - capped["daily_budget"]) < 1e-6 * capped["daily_budget"]
+assert abs(capped["allocated"] - opt.get("max_pct", 2.0) * result["daily_budget"]) < 1e-6 * capped["daily_budget"]
+
+print("\n--- BUDGET ---")
+print("segments:", result["segments"], "expected lift %:", round(result["expected_lift_pct"], 2))
@@ -0,0 +1,50 @@
+# scripts/test_charts.py
+import sys, os, json, tempfile
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+from src.utils.charts import MANIFEST, render_campaign_charts
+from src.utils.loader import load_config, load_data
+
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+df = load_data(os.path.join(PROJECT_ROOT, cfg["data"]["dataset_path"]))
+
+with tempfile.TemporaryDirectory() as tmp:
+    # first run renders every chart (in a pool) and records it in the manifest
+    charts = render_campaign_charts(df, tmp, max_workers=2, max_campaigns=4)
+    assert len(charts) == 4 and all(c["rendered"] for c in charts)
+    spend = df.groupby("campaign_name")["spend"].sum().sort_values(ascending=False)
+    assert [c["campaign"] for c in charts] == list(spend.index[:4])
+    for c in charts:
+        with open(c["path"], "rb") as fh:
+            assert fh.read(8) == b"\x89PNG\r\n\x1a\n", c["path"]
+    with open(os.path.join(tmp, MANIFEST)) as fh:
+        manifest = json.load(fh)
+    assert {k: v["hash"] for k, v in manifest.items()} == {c["campaign"]: c["hash"] for c in charts}
+    assert all(manifest[c["campaign"]]["file"] == os.path.basename(c["path"]) for c in charts)
+    mtimes = {c["campaign"]: os.stat(c["path"]).st_mtime_ns for c in charts}
+
+    # unchanged data: nothing is re-rendered
+    again = render_campaign_charts(df, tmp, max_workers=2, max_campaigns=4)
+    assert not any(c["rendered"] for c in again)
+    assert all(os.stat(c["path"]).st_mtime_ns == mtimes[c["campaign"]] for c in again)
+
+    # one campaign's rows change: only its chart is re-rendered
+    changed = charts[2]["campaign"]
+    edited = df.copy()
+    rows = edited.index[edited["campaign_name"] == changed][:3]
+    edited.loc[rows, "revenue"] = edited.loc[rows, "revenue"] * 1.5
+    third = render_campaign_charts(edited, tmp, max_workers=1, max_campaigns=4)
+    assert [c["campaign"] for c in third if c["rendered"]] == [changed]
+    assert all(os.stat(c["path"]).st_mtime_ns == mtimes[c["campaign"]] for c in third if c["campaign"] != changed)
+    with open(os.path.join(tmp, MANIFEST)) as fh:
+        assert json.load(fh)[changed]["hash"] == next(c["hash"] for c in third if c["campaign"] == changed)
+
+    # a deleted chart file is rendered again even though the manifest knows it
+    os.remove(charts[0]["path"])
+    fourth = render_campaign_charts(edited, tmp, max_workers=1, max_campaigns=4)
+    assert [c["campaign"] for c in fourth if c["rendered"]] == [charts[0]["campaign"]]
+
+print("--- CHARTS ---")
+print(f"{len(charts)} rendered, then {sum(c['rendered'] for c in again)} on the second run, "
+      f"{sum(c['rendered'] for c in third)} after changing {changed}")
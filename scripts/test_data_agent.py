@@ -14,5 +14,19 @@ agent = DataAgent(config)
 
 summary = agent.run()
 
+# the stats come from the sketches built while the chunks were read; a streaming profile agrees
+df = agent.df
+assert summary["basic_stats"]["numeric"]["spend"]["count"] == df["spend"].notna().sum()
+assert abs(summary["basic_stats"]["numeric"]["spend"]["mean"] - df["spend"].mean()) < 1e-6
+totals = df.groupby("campaign_name")["spend"].sum()
+assert abs(summary["high_spend_campaigns"]["threshold"] - totals.quantile(agent.spend_high_pctile)) < 1e-6
+assert set(summary["high_spend_campaigns"]["segments"]) == set(totals[totals > totals.quantile(agent.spend_high_pctile)].index)
+assert DataAgent(config).profile_frame(df)["high_spend_campaigns"] == summary["high_spend_campaigns"]
+full = DataAgent({**config, "data": {**config["data"], "sample": False}})
+full_spend = full.run()["high_spend_campaigns"]
+profile = DataAgent(config).profile()["high_spend_campaigns"]
+assert set(profile["segments"]) == set(full_spend["segments"])
+assert abs(profile["threshold"] - full_spend["threshold"]) < 1e-6
+
 print("\n--- DATA SUMMARY ---")
 print(summary)
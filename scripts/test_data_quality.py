@@ -0,0 +1,92 @@
+# scripts/test_data_quality.py
+import sys, os, tempfile
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+import pandas as pd
+from src.utils.loader import load_config, load_data
+from src.utils.data_quality import DataQualityScanner
+from src.utils.frame_guard import derived, dictionary, factorized
+from src.utils.helpers import validate_schema as helpers_validate_schema
+from src.utils.schema import check_schema
+
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+path = os.path.join(PROJECT_ROOT, cfg["data"]["dataset_path"])
+df = pd.read_csv(path)
+
+# one schema implementation behind both entry points
+assert helpers_validate_schema(df.columns) == check_schema(df.columns)
+assert check_schema(["date"])["missing"] == ["clicks", "impressions", "purchases", "revenue", "spend"]
+
+# inject bad rows: negative spend, clicks > impressions, bad date, inconsistent ctr, duplicates
+bad = df.copy()
+bad.loc[0, "spend"] = -5.0
+bad.loc[1, "clicks"] = bad.loc[1, "impressions"] + 1
+bad.loc[2, "date"] = "2025-13-45"
+bad.loc[3, "ctr"] = 0.9
+extra = pd.concat([bad.iloc[[10]], bad.iloc[[11]].assign(spend=1.0, revenue=2.0)])
+extra.iloc[1, extra.columns.get_loc("date")] = bad.loc[11, "date"]
+bad = pd.concat([bad, extra], ignore_index=True)  # row 10 copied exactly, row 11 with other metrics
+
+with tempfile.TemporaryDirectory() as tmp:
+    src = os.path.join(tmp, "bad.csv")
+    bad.to_csv(src, index=False)
+
+    # whole-frame and streaming scans agree
+    results = []
+    for chunked in (False, True):
+        q = DataQualityScanner(quarantine_path=os.path.join(tmp, f"q{int(chunked)}.csv"))
+        if chunked:
+            out = q.dedupe(pd.concat(q.scan_chunks(pd.read_csv(src, chunksize=500), keep_dates=True), ignore_index=True))
+        else:
+            out = load_data(src, quality=q)
+        results.append((out, q.summary()))
+    (full, s_full), (streamed, s_stream) = results
+    assert s_full["violations"] == s_stream["violations"]
+    assert full.reset_index(drop=True).equals(streamed.reset_index(drop=True))
+
+    v = s_full["violations"]
+    assert v["negative_metric"] == 1 and v["clicks_gt_impressions"] == 1 and v["bad_date"] == 1
+    assert v["ctr_inconsistent"] >= 1 and v["duplicate_exact"] == 1 and v["duplicate_key"] == 1
+    assert s_full["rows_quarantined"] == 3
+    quarantined = pd.read_csv(s_full["quarantine_file"])
+    assert len(quarantined) == 3 and "dq_rules" in quarantined.columns
+
+    # the conflicting duplicate was summed into the first row's position
+    assert len(full) == len(df) - 3
+    key = (full["campaign_name"] == df.loc[11, "campaign_name"]) & (full["adset_name"] == df.loc[11, "adset_name"]) & (full["date"] == df.loc[11, "date"])
+    assert key.sum() == 1
+    assert np.isclose(full.loc[key, "spend"].iloc[0], np.nansum([df.loc[11, "spend"], 1.0]))
+
+    # the scan's date parse is handed to the loaded frame, past quarantined and re-aggregated rows
+    for frame in (full, streamed):
+        handed = derived(frame, "dates:date", lambda: None)
+        assert handed is not None and (handed == pd.to_datetime(frame["date"])).all()
+        assert handed.index.equals(frame.index)
+
+    # rows without a campaign or adset are quarantined as missing keys
+    keyless = df.head(50).copy()
+    keyless.loc[[3, 7], "campaign_name"] = np.nan
+    keyless.loc[9, "adset_name"] = np.nan
+    q = DataQualityScanner()
+    assert len(q.scan_chunk(keyless)) == 47 and q.counts["missing_key"] == 3
+
+    # without ctr/roas loaded, the consistency rules are skipped, not evaluated
+    q = DataQualityScanner()
+    load_data(src, quality=q, columns=["campaign_name", "adset_name", "date", "spend", "impressions", "clicks",
+                                       "purchases", "revenue"])
+    assert {"ctr_inconsistent", "roas_inconsistent"} <= set(q.summary()["skipped_rules"])
+    assert q.counts["ctr_inconsistent"] == 0
+
+# the scan's first-seen dictionaries, renumbered, are exactly the sorted codes later stages use
+scanned = DataQualityScanner(actions={"missing_key": "flag"}).scan_chunk(df.assign(campaign_name=df["campaign_name"].where(df.index % 97 != 5)))
+assert (dictionary(scanned, "campaign_name")[0] < 0).any()
+for col in ("campaign_name", "adset_name", "date", "spend"):
+    codes, uniques = factorized(scanned, col)
+    expected_codes, expected_uniques = pd.factorize(scanned[col], sort=True)
+    assert np.array_equal(codes, expected_codes) and uniques.equals(expected_uniques), col
+
+print("\n--- DATA QUALITY ---")
+for rule, count in s_full["violations"].items():
+    print(rule, count)
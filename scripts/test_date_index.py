@@ -0,0 +1,35 @@
+# scripts/test_date_index.py
+import sys, os, tempfile
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import pandas as pd
+from src.utils.date_index import load_or_build_index, read_date_range, index_path
+
+src = os.path.join(PROJECT_ROOT, "data/synthetic_fb_ads_undergarments.csv")
+df = pd.read_csv(src)
+
+with tempfile.TemporaryDirectory() as tmp:
+    # date-sorted copy: the index must be seekable and slice by byte offsets
+    sorted_path = os.path.join(tmp, "sorted.csv")
+    df.sort_values("date", kind="stable").to_csv(sorted_path, index=False)
+    idx = load_or_build_index(sorted_path)
+    assert idx["seekable"] and os.path.exists(index_path(sorted_path))
+
+    part = read_date_range(sorted_path, "2025-03-01", "2025-03-14", columns=["date", "spend"])
+    expected = df[(df["date"] >= "2025-03-01") & (df["date"] <= "2025-03-14")]
+    assert len(part) == len(expected)
+    assert abs(part["spend"].sum() - expected["spend"].sum()) < 1e-6
+
+    # unsorted original order: falls back to a chunked scan with the same result
+    unsorted_path = os.path.join(tmp, "unsorted.csv")
+    df.to_csv(unsorted_path, index=False)
+    assert not load_or_build_index(unsorted_path)["seekable"]
+    part = read_date_range(unsorted_path, "2025-03-01", "2025-03-14", chunksize=1000)
+    assert len(part) == len(expected)
+
+    # changing the file invalidates the sidecar index
+    df.sort_values("date").head(100).to_csv(sorted_path, index=False)
+    assert load_or_build_index(sorted_path)["rows"] == 100
+
+print("date index checks passed")
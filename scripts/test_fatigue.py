@@ -0,0 +1,60 @@
+# scripts/test_fatigue.py
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+import pandas as pd
+
+from src.utils.loader import load_config
+from src.utils.fatigue import fit_exposure_decay, EXPOSURE_UNIT
+from src.agents.fatigue_agent import FatigueAgent
+from src.agents.creative_agent import CreativeAgent
+from src.agents.evaluator_agent import EvaluatorAgent
+
+rng = np.random.default_rng(7)
+days = pd.date_range("2025-01-01", periods=20).strftime("%Y-%m-%d")
+rows = []
+# one decaying creative, one steady creative, one noisy short-lived creative; rows deliberately shuffled
+for adset, message, decay, n_days in (("A", "Old hook", 0.8, 20), ("A", "Fresh hook", 0.0, 20), ("B", "Blip", 0.0, 4)):
+    exposure = 0.0
+    for d in days[:n_days]:
+        imp = 100_000.0
+        ctr = 0.02 * np.exp(-decay * exposure / EXPOSURE_UNIT) * (1 + rng.normal(0, 0.01))
+        rows.append({"campaign_name": "C1", "adset_name": adset, "creative_type": "Image", "creative_message": message,
+                     "date": d, "impressions": imp, "clicks": round(imp * ctr)})
+        exposure += imp
+df = pd.DataFrame(rows).sample(frac=1.0, random_state=1).reset_index(drop=True)
+
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+table = FatigueAgent(cfg).fit(df).set_index("creative_message")
+assert table.loc["Old hook", "fatigued"] and not table.loc["Fresh hook", "fatigued"] and not table.loc["Blip", "fatigued"]
+assert abs(table.loc["Old hook", "exposure_m"] - 2.0) < 1e-9
+
+# the batched fit equals a per-series least-squares fit
+old = df[df["creative_message"] == "Old hook"].sort_values("date")
+x = (old["impressions"].cumsum() - old["impressions"]).to_numpy() / EXPOSURE_UNIT
+slope = np.polyfit(x, np.log(old["clicks"] / old["impressions"]), 1)[0]
+fit = fit_exposure_decay(np.zeros(len(old), dtype=np.int64), np.arange(len(old)), old["impressions"], old["clicks"])
+assert abs(fit["slope"][0] - slope) < 1e-9 and abs(slope + 0.8) < 0.05
+
+result = FatigueAgent(cfg).detect(df)
+assert result["flagged"] == 1 and result["targets"][0]["creative_message"] == "Old hook"
+refresh = CreativeAgent(cfg).refresh_fatigued(result["targets"])
+assert refresh[0]["adset_name"] == "A" and refresh[0]["ideas"]
+
+# the fatigue hypothesis is only re-scored when some curve could be fitted
+window = {"spend": 100.0, "impressions": 10_000, "clicks": 100, "purchases": 5, "revenue": 200.0, "ctr": 0.01, "roas": 2.0}
+base = {"recent_window": dict(window, ctr=0.0095), "previous_window": window,
+        "percent_changes": {"ctr": -5.0, "roas": 0.0, "spend": 0.0},
+        "hypotheses": ["CTR fell — creatives may be fatiguing or less relevant."]}
+evaluator = EvaluatorAgent(cfg)
+plain = evaluator.validate(base)[0]
+unfitted = evaluator.validate({**base, "creative_fatigue": dict(result, fitted=0, flagged=0)})[0]
+assert unfitted["confidence"] == plain["confidence"] and "insufficient exposure history" in unfitted["evidence"]
+supported = evaluator.validate({**base, "creative_fatigue": result})[0]
+assert supported["confidence"] > plain["confidence"] and "1 of " in supported["evidence"]
+
+print("\n--- CREATIVE FATIGUE ---")
+print(table[["adset_name", "points", "exposure_m", "decay_pct", "t_stat", "fatigued"]])
+print(refresh[0]["rationale"])
@@ -0,0 +1,35 @@
+# scripts/test_forecast.py
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+from src.utils.loader import load_config, load_data
+from src.utils.forecast import fit_linear_trend, fit_holt, segment_matrix
+from src.agents.forecast_agent import ForecastAgent
+
+# batched OLS must match a per-series polyfit
+rng = np.random.default_rng(0)
+Y = 100 + 2.0 * np.arange(30) + rng.normal(0, 5, size=(50, 30))
+fit = fit_linear_trend(Y, horizon=7)
+slope, intercept = np.polyfit(np.arange(30), Y[3], 1)
+assert abs(fit["slope"][3] - slope) < 1e-9
+assert abs(fit["point"][3, 0] - (intercept + slope * 30)) < 1e-6
+assert (fit["lower"] < fit["point"]).all() and (fit["point"] < fit["upper"]).all()
+
+# Holt on a clean line extrapolates the line, with widening intervals
+line = np.tile(10.0 + 3.0 * np.arange(40), (4, 1))
+holt = fit_holt(line, horizon=5)
+assert np.allclose(holt["point"][:, 0], 10.0 + 3.0 * 40)
+
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+df = load_data(os.path.join(PROJECT_ROOT, cfg["data"]["dataset_path"]))
+
+segments, days, m = segment_matrix(df, ["campaign_name"], ["spend"])
+assert m["spend"].shape == (len(segments), len(days))
+assert abs(m["spend"].sum() - df["spend"].sum()) < 1e-6
+
+result = ForecastAgent(cfg).run(df)
+print("\n--- FORECASTS ---")
+for grain, g in result["grains"].items():
+    print(grain, "series:", g["series"], "falling ROAS:", g["falling"])
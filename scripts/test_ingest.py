@@ -0,0 +1,85 @@
+# scripts/test_ingest.py
+import sys, os, bz2, gzip, tempfile, zipfile
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import pandas as pd
+
+from src.utils.loader import load_config, load_data, dataset_date_bounds, lookup_first_value
+from src.utils.ingest import expand_parts, iter_csv, read_parts
+from src.utils.dim_dictionary import load_or_build_dictionary
+
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+path = os.path.join(PROJECT_ROOT, cfg["data"]["dataset_path"])
+full = load_data(path)
+keys = ["campaign_name", "adset_name", "date", "creative_message"]
+
+
+def same_rows(a, b):
+    a = a.sort_values(keys).reset_index(drop=True)
+    b = b.sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(a, b, check_dtype=False)
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    # one export split into gzip / bz2 / multi-member zip parts
+    pieces = [full.iloc[i::4] for i in range(4)]
+    with gzip.open(os.path.join(tmp, "part-0.csv.gz"), "wt") as f:
+        pieces[0].to_csv(f, index=False)
+    with bz2.open(os.path.join(tmp, "part-1.csv.bz2"), "wt") as f:
+        pieces[1].to_csv(f, index=False)
+    with zipfile.ZipFile(os.path.join(tmp, "part-2.zip"), "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("a.csv", pieces[2].to_csv(index=False))
+        zf.writestr("b.csv", pieces[3].to_csv(index=False))
+    spec = os.path.join(tmp, "part-*")
+
+    assert len(expand_parts(spec)) == 3
+    stats = {}
+    df = load_data(spec, stats=stats, workers=3, read_ahead=1, chunksize=300)
+    same_rows(df, full)
+    assert stats["parts"] == 3 and stats["input_mb_per_s"] > 0
+    # sidecar files next to the parts are never mistaken for parts
+    assert dataset_date_bounds(spec) == dataset_date_bounds(path)
+    assert len(expand_parts(spec)) == 3
+
+    # a single compressed file is streamed the same way
+    same_rows(load_data(os.path.join(tmp, "part-2.zip")), pd.concat(pieces[2:]))
+
+    # date range, filters, projection, aggregation and sampling all apply to the parts
+    cols = ["campaign_name", "date", "spend", "revenue"]
+    camp = full["campaign_name"].iloc[0]
+    part_df = load_data(spec, columns=cols, date_range=("2025-03-01", None), filters={"campaign_name": [camp]})
+    expected = full[(full["date"] >= "2025-03-01") & (full["campaign_name"] == camp)]
+    assert list(part_df.columns) == cols and len(part_df) == len(expected)
+    # the same read of the plain file, with load stats (input size is taken from the file, not the chunks)
+    stats = {}
+    plain_df = load_data(path, columns=cols, date_range=("2025-03-01", None), filters={"campaign_name": [camp]}, stats=stats)
+    assert len(plain_df) == len(expected) and stats["parts"] == 1 and stats["input_bytes"] == os.path.getsize(path)
+    stats = {}
+    assert len(load_data(path, filters={"campaign_name": [camp]}, stats=stats)) == (full["campaign_name"] == camp).sum()
+    assert stats["parts"] == 1
+    agg = load_data(spec, columns=cols, aggregate=True)
+    assert abs(agg["revenue"].sum() - full["revenue"].sum()) < 1e-6 * full["revenue"].sum()
+    sample = load_data(spec, sample=True, sample_n=200, columns=cols, seed=1)
+    assert len(sample) == 200 and list(sample.columns) == cols
+
+    assert lookup_first_value(spec, "campaign_name", camp, "adset_name") in set(full.loc[full["campaign_name"] == camp, "adset_name"])
+    dims = load_or_build_dictionary(spec, ["platform", "country"])
+    assert set(dims.values["country"]) == set(full["country"].dropna())
+
+    # read-ahead is bounded and closing the stream early stops the readers
+    parts = expand_parts(spec)
+    stream = read_parts(parts, lambda p: iter_csv(p, chunksize=50), workers=3, read_ahead=2)
+    first = next(stream)
+    stream.close()
+    assert len(first) == 50
+
+    # reader errors surface in the consumer
+    try:
+        list(read_parts(parts + [os.path.join(tmp, "missing.csv.gz")], lambda p: iter_csv(p), workers=2))
+        raise AssertionError("missing part did not raise")
+    except FileNotFoundError:
+        pass
+
+print("--- Ingest ---")
+print(f"3 compressed parts == plain file ({len(full)} rows); {stats['input_mb_per_s']:.1f} MB/s")
@@ -0,0 +1,40 @@
+# scripts/test_loader.py
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+from src.agents.planner_agent import PlannerAgent
+from src.utils.loader import load_config, load_data, projection_savings
+
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+path = os.path.join(PROJECT_ROOT, cfg["data"]["dataset_path"])
+
+# the default query's projection: only the planned columns are parsed
+plan = PlannerAgent(cfg).plan("Analyze ROAS drop")
+stats = {}
+df = load_data(path, columns=plan["columns"], stats=stats)
+assert set(df.columns) == set(plan["columns"]), (sorted(df.columns), plan["columns"])
+for col in ("creative_message", "ctr", "roas"):
+    assert col not in df.columns, col
+assert stats["columns_read"] < stats["columns_total"], stats
+assert stats["memory_saved_pct"] > 0, stats
+
+# a narrow plan saves far more
+narrow = {}
+df = load_data(path, columns=["date", "spend", "revenue"], stats=narrow)
+assert list(df.columns) == ["date", "spend", "revenue"]
+assert narrow["columns_read"] == 3 and narrow["columns_read"] < narrow["columns_total"]
+assert narrow["memory_saved_pct"] > stats["memory_saved_pct"] > 0, (narrow, stats)
+
+# the savings estimate compares the projection against all columns of the same sample
+savings = projection_savings(path, ["date", "spend"], sample_rows=100)
+assert 0 < savings["memory_share"] < 1 and savings["columns_total"] == stats["columns_total"]
+
+# queries about creatives still plan (and load) the fatigue step's text column
+fatigue = PlannerAgent(cfg).plan("Suggest creative improvements for low CTR campaigns")
+assert "detect_creative_fatigue" in fatigue["steps"] and "creative_message" in fatigue["columns"]
+assert "detect_creative_fatigue" not in plan["steps"]
+
+print("--- LOADER ---")
+print(f"default query: {stats['columns_read']}/{stats['columns_total']} columns, "
+      f"{stats['memory_saved_pct']:.1f}% memory saved; narrow plan {narrow['memory_saved_pct']:.1f}%")
@@ -0,0 +1,106 @@
+# scripts/test_memory_budget.py
+import sys, os, tempfile, tracemalloc
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+import pandas as pd
+
+from src.utils.data_quality import DataQualityScanner
+from src.utils.date_index import load_or_build_index
+from src.utils.loader import load_config, load_data
+from src.utils.memory_budget import aggregate_chunks, choose_mode, estimate_footprint, partition_csv, peak_rss_mb, plan_memory
+
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+path = os.path.join(PROJECT_ROOT, cfg["data"]["dataset_path"])
+full = load_data(path)
+cols = ["campaign_name", "adset_name", "date", "spend", "impressions", "clicks", "purchases", "revenue", "roas"]
+
+# estimate from file size + sampled row width is close to the real frame
+est = estimate_footprint(path, columns=cols, sample_rows=500)
+actual_mb = full[cols].memory_usage(index=False, deep=True).sum() / 1024 ** 2
+assert abs(est["rows"] - len(full)) / len(full) < 0.1, est
+assert abs(est["frame_mb"] - actual_mb) / actual_mb < 0.25, (est, actual_mb)
+half = estimate_footprint(path, columns=cols, date_range=("2025-02-15", None))
+assert half["rows"] < est["rows"] * 0.6
+
+# mode thresholds
+e = {"frame_mb": 100.0, "aggregate_mb": 20.0}
+assert choose_mode(e, None) == ("in_memory", 1)
+assert choose_mode(e, 400, 3.0) == ("in_memory", 1)
+assert choose_mode(e, 100, 3.0) == ("streaming", 1)
+assert choose_mode(e, 20, 3.0) == ("partitioned", 3)
+assert choose_mode(e, 20, 3.0, allow_partition=False) == ("streaming", 1)
+small = {**cfg, "data": {**cfg["data"], "sample": False}, "memory": {"budget_mb": 0.05}}
+assert plan_memory(small, path, columns=cols)["mode"] == "partitioned"
+assert plan_memory({**cfg, "data": {**cfg["data"], "sample": True}, "memory": {"budget_mb": 0.05}}, path)["mode"] == "in_memory"
+
+# streaming aggregation == one groupby over the whole input, with compaction in between
+rng = np.random.default_rng(0)
+raw = pd.DataFrame({
+    "campaign_name": rng.choice(["a", "b", "c"], 5000), "date": rng.choice(["2025-01-01", "2025-01-02"], 5000),
+    "spend": rng.random(5000), "impressions": rng.integers(1, 100, 5000), "clicks": rng.integers(0, 5, 5000),
+    "purchases": rng.integers(0, 2, 5000), "revenue": rng.random(5000), "roas": 0.0,
+})
+agg = aggregate_chunks((raw.iloc[i:i + 700] for i in range(0, len(raw), 700)), compact_rows=3)
+expected = raw.groupby(["campaign_name", "date"], sort=False)[["spend", "impressions", "clicks", "purchases", "revenue"]].sum()
+got = agg.set_index(["campaign_name", "date"]).loc[expected.index]
+assert list(agg.columns) == list(raw.columns) and len(agg) == len(expected)
+assert np.allclose(got["spend"], expected["spend"]) and (got["clicks"] == expected["clicks"]).all()
+assert np.allclose(got["roas"], (expected["revenue"] / expected["spend"]).round(2))
+
+# streaming load keeps the totals (rows are already unique on this dataset's grain)
+streamed = load_data(path, columns=cols, aggregate=True, chunksize=1000)
+assert len(streamed) <= len(full) and abs(streamed["revenue"].sum() - full["revenue"].sum()) < 1e-6 * full["revenue"].sum()
+
+# with the quality scan, exact duplicates are dropped before aggregation: same KPIs as in_memory
+with tempfile.TemporaryDirectory() as tmp:
+    dup_path = os.path.join(tmp, "dup.csv")
+    raw_full = pd.read_csv(path)
+    pd.concat([raw_full, raw_full.iloc[[5, 5, 1200]]], ignore_index=True).to_csv(dup_path, index=False)
+    results = {}
+    for mode in ("in_memory", "streaming"):
+        scanner = DataQualityScanner()
+        out = load_data(dup_path, columns=cols, quality=scanner, aggregate=mode == "streaming", chunksize=1000)
+        results[mode] = (out, scanner.counts["duplicate_exact"])
+    (mem, mem_dups), (stream, stream_dups) = results["in_memory"], results["streaming"]
+    assert mem_dups == stream_dups == 3
+    keys = ["campaign_name", "adset_name", "date"]
+    a = mem.groupby(keys)[["spend", "revenue", "clicks"]].sum()
+    b = stream.groupby(keys)[["spend", "revenue", "clicks"]].sum().loc[a.index]
+    assert len(a) == len(b) and np.allclose(a.to_numpy(), b.to_numpy())
+    assert abs(mem["spend"].sum() - raw_full["spend"].sum()) < 1e-6 * raw_full["spend"].sum()
+
+# a date-sorted file is sliced through the date index and streamed: the slice is never held whole
+with tempfile.TemporaryDirectory() as tmp:
+    sorted_path = os.path.join(tmp, "sorted.csv")
+    big = pd.concat([pd.read_csv(path)] * 20, ignore_index=True).sort_values("date", kind="stable")
+    big.to_csv(sorted_path, index=False)
+    assert load_or_build_index(sorted_path)["seekable"]
+    since = "2025-01-15"
+    slice_bytes = os.path.getsize(sorted_path) * (big["date"] >= since).mean()
+    sum_cols = cols[:-1]
+    tracemalloc.start()
+    try:
+        streamed = load_data(sorted_path, columns=sum_cols, aggregate=True, date_range=(since, None), chunksize=1000)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < slice_bytes / 4, (peak, slice_bytes)
+    expected = big[big["date"] >= since].groupby(["campaign_name", "adset_name", "date"])["revenue"].sum()
+    got = streamed.groupby(["campaign_name", "adset_name", "date"])["revenue"].sum().loc[expected.index]
+    assert np.allclose(got.to_numpy(), expected.to_numpy())
+    stream_peak_mb, slice_mb = peak / 1024 ** 2, slice_bytes / 1024 ** 2
+
+# out-of-core parts hold whole campaigns and every row once
+with tempfile.TemporaryDirectory() as tmp:
+    parts = partition_csv(path, tmp, 3, chunksize=700)
+    frames = [pd.read_csv(p) for p in parts]
+    assert sum(len(f) for f in frames) == len(full)
+    names = [set(f["campaign_name"]) for f in frames]
+    assert all(not (names[i] & names[j]) for i in range(len(names)) for j in range(i + 1, len(names)))
+
+assert peak_rss_mb() is None or peak_rss_mb() > 0
+print("--- Memory budget ---")
+print(f"estimate {est['frame_mb']:.2f} MB / ~{est['rows']} rows (actual {actual_mb:.2f} MB / {len(full)} rows); "
+      f"{len(parts)} parts; streamed date slice peak {stream_peak_mb:.1f} MB of {slice_mb:.1f} MB; peak RSS {peak_rss_mb():.0f} MB")
@@ -0,0 +1,105 @@
+# scripts/test_metrics.py
+import sys, os, json, re, tempfile, threading, time
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+from run import run_pipeline
+from src.utils.helpers import UMASK
+from src.utils.loader import load_config
+from src.utils.metrics import (LATENCY_BUCKETS, RunMetrics, cache_event, load_state, metrics_from_config,
+                               render_textfile)
+
+tmp = tempfile.mkdtemp()
+state_file, textfile = os.path.join(tmp, "state.json"), os.path.join(tmp, "kasparro.prom")
+
+
+def one_run(seconds=0.2, rows=1000):
+    m = RunMetrics(state_file, textfile)
+    m.rows = rows
+    m.record_stage("analyze", seconds)
+    m.record_stage("load_data", seconds / 2, rows=rows * 2)
+    cache_event("date_index", True)
+    cache_event("charts", False)
+    m.finish(peak_rss_mb=300.0)
+    return m
+
+
+# two runs merge: histogram counts, sums and counters add up
+one_run().flush()
+one_run(seconds=3.0).flush()
+state = load_state(state_file)
+h = state["histograms"]["stage_duration_seconds"]["series"]['stage="analyze"']
+assert h[-1] == 2 and abs(h[-2] - 3.2) < 1e-9
+assert h[LATENCY_BUCKETS.index(0.25)] == 1 and h[LATENCY_BUCKETS.index(5.0)] == 1
+assert state["counters"]["stage_rows_total"]['stage="load_data"'] == 4000
+assert state["counters"]["runs_total"]['status="ok"'] == 2
+assert state["counters"]["cache_hits_total"]['cache="date_index"'] == 2
+assert state["counters"]["cache_misses_total"]['cache="charts"'] == 2
+
+# concurrent runs in threads never lose an update (flock + atomic replace)
+threads = [threading.Thread(target=lambda: one_run().flush()) for _ in range(8)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+assert load_state(state_file)["counters"]["runs_total"]['status="ok"'] == 10
+
+# Prometheus textfile: cumulative buckets ending in +Inf == _count
+text = open(textfile).read()
+assert "# TYPE kasparro_stage_duration_seconds histogram" in text
+assert 'kasparro_stage_duration_seconds_bucket{stage="analyze",le="+Inf"} 10' in text
+assert 'kasparro_stage_duration_seconds_count{stage="analyze"} 10' in text
+assert "# TYPE kasparro_runs_total counter" in text and "kasparro_last_run_peak_rss_bytes 314572800" in text
+buckets = [int(v) for v in re.findall(r'kasparro_stage_duration_seconds_bucket\{stage="analyze",le="[^"]+"\} (\d+)', text)]
+assert buckets == sorted(buckets) and len(buckets) == len(LATENCY_BUCKETS) + 1
+assert all(re.match(r'^(# (HELP|TYPE) \w+ .+|\w+(\{[^}]*\})? [-+.e\d]+)$', line) for line in text.splitlines())
+assert render_textfile(load_state(state_file)) == text
+assert os.stat(textfile).st_mode & 0o777 == 0o666 & ~UMASK
+
+# a stage that raises is still recorded
+m = RunMetrics(state_file, textfile)
+try:
+    with m.stage("broken") as rec:
+        rec["rows"] = 7
+        raise RuntimeError("boom")
+except RuntimeError:
+    pass
+assert m.histograms["stage_duration_seconds"]['stage="broken"'][-1] == 1
+assert m.counters["stage_rows_total"]['stage="broken"'] == 7
+
+# a failed pipeline run is flushed as runs_total{status="error"}, then the error propagates
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+cfg = {**cfg, "metrics": {**cfg.get("metrics", {}), "enabled": True},
+       "outputs": {**cfg["outputs"], "logs_dir": os.path.join(tmp, "failed")}}
+try:
+    run_pipeline("Analyze ROAS drop", cfg, dataset_path=os.path.join(tmp, "missing.csv"), out_dir=os.path.join(tmp, "out"))
+    raise AssertionError("run_pipeline should fail on a missing dataset")
+except (OSError, ValueError):
+    pass
+failed = load_state(os.path.join(tmp, "failed", cfg["metrics"].get("state_file", "metrics_state.json")))
+assert failed["counters"]["runs_total"] == {'status="error"': 1}, failed["counters"]["runs_total"]
+assert failed["counters"]["stage_runs_total"]['stage="plan"'] == 1
+
+# a changed bucket layout restarts that histogram instead of mixing layouts
+state = load_state(state_file)
+state["histograms"]["stage_duration_seconds"]["buckets"] = [1.0]
+json.dump(state, open(state_file, "w"))
+one_run().flush()
+assert load_state(state_file)["histograms"]["stage_duration_seconds"]["series"]['stage="analyze"'][-1] == 1
+
+# recording is microseconds per stage; disabled config never touches disk
+m = RunMetrics(state_file, textfile)
+m.rows = 1000
+n = 20000
+t0 = time.perf_counter()
+for _ in range(n):
+    with m.stage("analyze"):
+        pass
+per_stage_us = (time.perf_counter() - t0) / n * 1e6
+assert per_stage_us < 50, per_stage_us
+off = metrics_from_config({"metrics": {"enabled": False}, "outputs": {"logs_dir": os.path.join(tmp, "off")}})
+assert off.flush() is None and not os.path.exists(os.path.join(tmp, "off"))
+
+print("--- Metrics ---")
+print(f"stage recording: {per_stage_us:.1f} us")
+print("\n".join(text.splitlines()[:6]))
@@ -0,0 +1,48 @@
+# scripts/test_ndjson.py
+import sys, os, tempfile
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+from src.utils.loader import load_config, load_data
+from src.utils.helpers import UMASK
+from src.utils.ndjson import NDJSONWriter, iter_ndjson, write_ndjson, top_n
+from src.agents.insight_agent import InsightAgent
+from src.agents.evaluator_agent import EvaluatorAgent
+
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+df = load_data(os.path.join(PROJECT_ROOT, cfg["data"]["dataset_path"]))
+insight_result = InsightAgent(cfg).analyze(df)
+evaluator = EvaluatorAgent(cfg)
+
+with tempfile.TemporaryDirectory() as tmp:
+    for name in ("insights.ndjson", "insights.ndjson.gz"):
+        path = os.path.join(tmp, name)
+        n = evaluator.save_insights(evaluator.iter_validate(insight_result), out_path=path)
+        assert n == len(insight_result["hypotheses"])
+        assert list(iter_ndjson(path)) == evaluator.validate(insight_result)
+    with open(os.path.join(tmp, "insights.ndjson.gz"), "rb") as fh:
+        assert fh.read(2) == b"\x1f\x8b"
+
+    # a failed write leaves the previous file untouched and no temp files behind
+    path = os.path.join(tmp, "records.ndjson")
+    write_ndjson(path, ({"i": i} for i in range(1000)))
+    try:
+        with NDJSONWriter(path) as w:
+            w.write({"i": -1})
+            raise RuntimeError("producer failed")
+    except RuntimeError:
+        pass
+    assert sum(1 for _ in iter_ndjson(path)) == 1000
+    assert sorted(os.listdir(tmp)) == ["insights.ndjson", "insights.ndjson.gz", "records.ndjson"]
+
+    # published with the mode a plain open() gives (mkstemp's 0600 is not kept)
+    plain = os.path.join(tmp, "plain.txt")
+    open(plain, "w").close()
+    assert os.stat(path).st_mode & 0o777 == os.stat(plain).st_mode & 0o777 == 0o666 & ~UMASK
+    os.remove(plain)
+
+    # top-N over a lazy reader
+    assert [r["i"] for r in top_n(iter_ndjson(path), 3, key=lambda r: -r["i"])] == [999, 998, 997]
+
+print("\n--- NDJSON ---")
+print("validated hypotheses streamed:", n)
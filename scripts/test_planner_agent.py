@@ -23,3 +23,11 @@ for t in tests:
     print("--- PLAN ---")
     print("Steps:", plan["steps"])
     print("Notes:", plan["notes"])
+    print("Columns:", plan["columns"])
+    # free-text creative columns are only loaded eagerly for the per-creative fatigue curves
+    fatigue = cfg["analysis"].get("creative_fatigue", {})
+    if not (fatigue.get("enabled") and "creative_message" in fatigue.get("series", [])):
+        assert "creative_message" not in plan["columns"]
+
+no_fatigue = {**cfg, "analysis": {**cfg["analysis"], "creative_fatigue": {"enabled": False}}}
+assert "creative_message" not in PlannerAgent(no_fatigue).plan("Quick summary")["columns"]
@@ -0,0 +1,47 @@
+# scripts/test_prefix_sums.py
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import pandas as pd
+from src.utils.loader import load_config, load_data
+from src.utils.prefix_sums import PrefixSumIndex
+from src.agents.insight_agent import InsightAgent
+
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+df = load_data(os.path.join(PROJECT_ROOT, cfg["data"]["dataset_path"]))
+
+# range totals must match a direct pandas filter
+idx = PrefixSumIndex(df, segment_cols=["platform"])
+dates = pd.to_datetime(df["date"])
+start, end = idx.n_days - 14, idx.n_days
+mask = dates >= idx.min_date + pd.Timedelta(days=start)
+for m in ("spend", "clicks", "revenue"):
+    assert abs(idx.totals(start, end)[m] - df.loc[mask, m].sum()) < 1e-6, m
+
+per_platform = idx.segment_totals("platform", start, end)
+assert abs(per_platform["spend"].sum() - df.loc[mask, "spend"].sum()) < 1e-6
+
+# the lookback horizon must agree with the single-window analyze()
+agent = InsightAgent(cfg)
+single = agent.analyze(df)
+multi = agent.analyze_horizons(df, horizons=[agent.lookback_days, "wow", "mom"], segment_col="platform")
+assert abs(single["percent_changes"]["roas"] - multi[f"{agent.lookback_days}d"]["percent_changes"]["roas"]) < 1e-6
+
+# the reported spans are the real ones: an N-day lookback covers N + 1 recent days (as analyze()) and N previous
+h = multi[f"{agent.lookback_days}d"]
+dates = pd.to_datetime(df["date"])
+recent_start = dates.max() - pd.Timedelta(days=agent.lookback_days)
+previous_start = dates.max() - pd.Timedelta(days=2 * agent.lookback_days)
+assert h["days"] == agent.lookback_days + 1 and h["previous_days"] == agent.lookback_days
+assert h["recent_dates"] == [recent_start.date().isoformat(), dates.max().date().isoformat()]
+assert h["previous_dates"] == [previous_start.date().isoformat(), (recent_start - pd.Timedelta(days=1)).date().isoformat()]
+assert multi["wow"]["days"] == 7 and pd.Timestamp(multi["wow"]["recent_dates"][1]).dayofweek == 6
+# windows reaching before the first date are clipped, and say so
+short = agent.analyze_horizons(df, horizons=[10_000])["10000d"]
+assert short["days"] == (dates.max() - dates.min()).days + 1 and short["previous_days"] == 0 and short["previous_dates"] is None
+
+print("\n--- HORIZONS ---")
+for label, h in multi.items():
+    print(label, h["days"], "days", h["recent_dates"], "vs", h["previous_days"], "days, ROAS change %:",
+          round(h["percent_changes"]["roas"], 2))
@@ -0,0 +1,65 @@
+# scripts/test_profiler.py
+import sys, os, json, tempfile
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+
+from src.utils.profiler import COVERAGE_FULL, COVERAGE_POOLED, StageProfiler, parse_stages, profiler_from_config, ENV_VAR
+
+
+def busy(n):
+    total = 0.0
+    for _ in range(n):
+        total += float(np.sort(np.random.default_rng(0).random(2000))[0])
+    return total
+
+
+assert parse_stages(None) is None and parse_stages("0") is None and parse_stages([]) is None
+assert parse_stages("all") == "*" and parse_stages(True) == "*" and parse_stages(["*"]) == "*"
+assert parse_stages("load_data, forecast") == {"load_data", "forecast"}
+
+with tempfile.TemporaryDirectory() as tmp:
+    for engine in ("sampler", "cprofile"):
+        out = os.path.join(tmp, engine)
+        prof = StageProfiler(out, stages="hot", engine=engine, interval_ms=1, top_n=10)
+        with prof.stage("hot"):
+            busy(1500)
+        with prof.stage("cold"):  # not selected: no output
+            busy(10)
+        assert [r["stage"] for r in prof.results] == ["hot"]
+        assert not os.path.exists(os.path.join(out, "cold.collapsed"))
+        lines = open(os.path.join(out, "hot.collapsed")).read().split("\n")
+        stack, count = lines[0].rsplit(" ", 1)
+        assert int(count) > 0
+        assert any("busy (test_profiler.py" in l for l in lines)
+        top = open(os.path.join(out, "hot.top.txt")).read()
+        assert top.startswith("# hot:") and "function" in top
+        summary = json.load(open(prof.write_summary()))
+        assert summary[0]["stage"] == "hot" and summary[0]["samples"] > 0
+        assert summary[0]["coverage"] == COVERAGE_FULL
+        print(f"{engine}: {summary[0]['samples']} samples/calls, hottest {summary[0]['hot'][0]['function']}")
+
+    # env var overrides config; dir is placed under the run's out_dir
+    cfg = {"profiling": {"enabled": False, "dir": "reports/profile"}, "outputs": {"reports_dir": "reports"}}
+    assert not profiler_from_config(cfg, tmp).enabled
+    os.environ[ENV_VAR] = "load_data"
+    try:
+        prof = profiler_from_config(cfg, os.path.join(tmp, "acct"))
+    finally:
+        del os.environ[ENV_VAR]
+    assert prof.selected("load_data") and not prof.selected("report")
+    assert prof.out_dir == os.path.join(tmp, "acct", "profile")
+    assert StageProfiler(tmp).write_summary() is None
+
+    # pool-backed stages are flagged: their workers are not in the profile
+    prof = StageProfiler(os.path.join(tmp, "pooled"), stages="*", interval_ms=1)
+    with prof.stage("segments"):
+        busy(50)
+    with prof.stage("rollups"):
+        busy(50)
+    coverage = {r["stage"]: r["coverage"] for r in prof.results}
+    assert coverage == {"segments": COVERAGE_POOLED, "rollups": COVERAGE_FULL}
+    assert COVERAGE_POOLED in open(os.path.join(tmp, "pooled", "segments.top.txt")).readline()
+
+print("--- Profiler OK ---")
@@ -0,0 +1,41 @@
+# scripts/test_query_compiler.py
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+from src.utils.loader import load_config, load_data
+from src.utils.dim_dictionary import DimensionDictionary, load_or_build_dictionary
+from src.agents.planner_agent import PlannerAgent
+
+dims = DimensionDictionary({
+    "campaign_name": ["Men ComfortMax Launch", "Men_ComfortMax_Launch", "Women Seamless Everyday"],
+    "platform": ["Facebook", "Instagram"],
+    "country": ["US", "UK", "IN"],
+})
+# spelling variants share a key; leading-token prefixes match; short codes need capitals
+f = dims.filters("ROAS for men comfortmax on Instagram in US")
+assert f == {"campaign_name": ["Men ComfortMax Launch", "Men_ComfortMax_Launch"], "platform": ["Instagram"], "country": ["US"]}
+assert dims.filters("tell us about women seamless everyday") == {"campaign_name": ["Women Seamless Everyday"]}
+
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+planner = PlannerAgent(cfg, dimensions=dims)
+plan = planner.plan("Analyze ROAS drop for Men ComfortMax on Instagram in US over the last 14 days")
+assert plan["horizon_days"] == 14 and plan["metrics"] == ["roas"]
+assert set(plan["filters"]) == {"campaign_name", "platform", "country"}
+# filter columns are part of the projection so the loader can apply them
+assert {"campaign_name", "platform", "country"} <= set(plan["columns"])
+assert planner.plan("CTR and cost per click, past 2 weeks")["metrics"] == ["ctr", "cpc"]
+assert planner.plan("spend last month")["horizon_days"] == 30
+assert planner.plan("Quick summary")["horizon_days"] is None
+
+# the loader applies the compiled filters while reading
+path = os.path.join(PROJECT_ROOT, cfg["data"]["dataset_path"])
+real = PlannerAgent(cfg, dimensions=load_or_build_dictionary(path)).plan("ROAS on Instagram in US")
+df = load_data(path, columns=real["columns"], filters=real["filters"], date_range=("2025-01-01", "2025-03-31"))
+full = load_data(path)
+expected = full[(full["platform"] == "Instagram") & (full["country"] == "US")]
+assert len(df) == len(expected) and set(df["platform"]) == {"Instagram"}
+
+print("\n--- COMPILED QUERY ---")
+print({k: plan[k] for k in ("filters", "horizon_days", "metrics")})
+print("Rows after filters:", len(df), "of", len(full))
@@ -0,0 +1,43 @@
+# scripts/test_readonly_guard.py
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from src.utils.loader import load_config, load_data
+from src.utils.frame_guard import FrameMutationError, GUARD_ENV, readonly
+from src.agents.insight_agent import InsightAgent
+
+os.environ[GUARD_ENV] = "1"
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+df = load_data(os.path.join(PROJECT_ROOT, cfg["data"]["dataset_path"]))
+before = pd.util.hash_pandas_object(df).sum()
+
+# analyze() runs under the guard and leaves the caller's frame untouched
+agent = InsightAgent(cfg)
+result = agent.analyze(df)
+agent.analyze_horizons(df, segment_col="platform")
+assert df["date"].dtype == object
+assert pd.util.hash_pandas_object(df).sum() == before
+
+# the guard catches both column assignment and in-place writes
+try:
+    with readonly(df):
+        df["date"] = pd.to_datetime(df["date"])
+    raise AssertionError("column assignment was not detected")
+except FrameMutationError:
+    df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+try:
+    with readonly(df):
+        df["spend"].to_numpy()[0] = -1.0
+    raise AssertionError("in-place write was not blocked")
+except ValueError:
+    pass
+
+# several threads can analyze the same frame without copying it
+with ThreadPoolExecutor(max_workers=4) as pool:
+    results = list(pool.map(lambda _: agent.analyze(df), range(8)))
+assert all(r["percent_changes"] == result["percent_changes"] for r in results)
+print("read-only guard checks passed")
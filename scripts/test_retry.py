@@ -0,0 +1,122 @@
+# scripts/test_retry.py
+import sys, os, asyncio, threading, time
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+from src.utils.retry import (RetryBudget, async_retry, backoff_delay, reset_retry_stats, retry, retry_on_exception,
+                             retry_stats, set_run_deadline)
+from src.utils.helpers import safe_read_csv
+from src.utils.logger import timed_agent
+
+
+def flaky(failures, exc=OSError):
+    state = {"calls": 0}
+
+    def fn():
+        state["calls"] += 1
+        if state["calls"] <= failures:
+            raise exc("mount went away")
+        return state["calls"]
+    return fn, state
+
+
+reset_retry_stats()
+fn, state = flaky(2)
+assert retry(fn, retries=3, base_delay=0.001, budget=RetryBudget(10, 0)) == 3
+stats = retry_stats()
+assert stats["retries"] == 2 and stats["gave_up"] == 0 and stats["wait_seconds"] <= 0.004
+
+# gives up with the original error; non-matching errors are not retried
+fn, state = flaky(5)
+try:
+    retry(fn, retries=2, base_delay=0.001, budget=RetryBudget(10, 0))
+    raise AssertionError("expected OSError")
+except OSError:
+    assert state["calls"] == 3
+fn, state = flaky(1, ValueError)
+try:
+    retry(fn, retries=3, base_delay=0.001, exceptions=(OSError,))
+except ValueError:
+    assert state["calls"] == 1
+
+# full jitter: uniform below the capped exponential ceiling
+waits = [backoff_delay(4, 0.5, 3.0) for _ in range(200)]
+assert all(0.0 <= w <= 3.0 for w in waits) and len(set(waits)) > 100
+assert backoff_delay(3, 0.5, 10.0, jitter=False) == 2.0
+
+# per-call and run deadlines stop retries whose wait would overrun them
+reset_retry_stats()
+fn, state = flaky(5)
+t0 = time.perf_counter()
+try:
+    retry(fn, retries=5, base_delay=5.0, jitter=False, deadline=0.5)
+except OSError:
+    assert time.perf_counter() - t0 < 0.5 and state["calls"] == 1
+set_run_deadline(0.0)
+try:
+    retry(flaky(1)[0], retries=3, base_delay=0.001)
+except OSError:
+    pass
+set_run_deadline(None)
+assert retry_stats()["deadline_exceeded"] == 2
+
+# a shared budget caps retries across threads
+reset_retry_stats()
+budget = RetryBudget(capacity=3, refill_per_second=0)
+errors = []
+
+
+def reader():
+    try:
+        retry(flaky(10)[0], retries=5, base_delay=0.001, budget=budget)
+    except OSError as e:
+        errors.append(e)
+
+
+threads = [threading.Thread(target=reader) for _ in range(4)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+stats = retry_stats()
+assert len(errors) == 4 and stats["retries"] == 3 and stats["budget_exhausted"] >= 1
+
+
+# decorator (sync and async) and the async call form
+@retry_on_exception(max_attempts=3, initial_wait=0.001, budget=RetryBudget(10, 0))
+def decorated(box):
+    box.append(1)
+    if len(box) < 3:
+        raise OSError("again")
+    return "ok"
+
+
+@retry_on_exception(max_attempts=2, initial_wait=0.001, budget=RetryBudget(10, 0))
+async def decorated_async(box):
+    box.append(1)
+    if len(box) < 2:
+        raise OSError("again")
+    return "ok"
+
+
+async def coro(box):
+    box.append(1)
+    if len(box) < 3:
+        raise OSError("again")
+    return len(box)
+
+
+assert decorated([]) == "ok" and decorated.__name__ == "decorated"
+assert asyncio.run(decorated_async([])) == "ok"
+assert asyncio.run(async_retry(coro, args=([],), retries=3, base_delay=0.001, budget=RetryBudget(10, 0))) == 3
+
+# helpers.safe_read_csv is really wrapped now (not the old no-op fallback)
+assert hasattr(safe_read_csv, "__wrapped__")
+
+# timed_agent reports the retries of its step
+with timed_agent("flaky_step") as info:
+    retry(flaky(2)[0], retries=3, base_delay=0.001, budget=RetryBudget(10, 0))
+assert info["retries"] == 2 and info["retry_wait_seconds"] >= 0
+
+print("--- Retry ---")
+print({k: v for k, v in retry_stats().items() if k != "by_function"})
@@ -0,0 +1,43 @@
+# scripts/test_rollup.py
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+from src.utils.loader import load_config, load_data
+from src.utils.rollup import compute_grouping_sets, cube, rollup, parse_grouping_sets
+from src.agents.insight_agent import InsightAgent
+
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+df = load_data(os.path.join(PROJECT_ROOT, cfg["data"]["dataset_path"]))
+
+assert rollup(["a", "b"]) == [("a", "b"), ("a",), ()]
+assert len(cube(["a", "b", "c"])) == 8
+assert parse_grouping_sets([{"rollup": ["a", "b"]}, ["a"], "c"]) == [("a", "b"), ("a",), (), ("c",)]
+
+# every grouping set must match a separate pandas groupby
+sets = [("campaign_name", "adset_name"), ("platform", "country")] + cube(["audience_type", "creative_type"])
+out = compute_grouping_sets(df, sets)
+for s in sets:
+    name = " x ".join(s) if s else "total"
+    if not s:
+        assert abs(out[name]["spend"].iloc[0] - df["spend"].sum()) < 1e-6
+        assert out[name]["rows"].iloc[0] == len(df)
+        continue
+    expected = df.groupby(list(s))[["spend", "clicks", "revenue"]].sum()
+    got = out[name].set_index(list(s)).sort_index()
+    assert len(got) == len(expected), name
+    for m in ("spend", "clicks", "revenue"):
+        assert (got[m] - expected[m]).abs().max() < 1e-6, (name, m)
+    # ratios come from sums, not averages of row ratios
+    roas = (expected["revenue"] / expected["spend"].where(expected["spend"] > 0)).fillna(0)
+    assert (got["roas"] - roas).abs().max() < 1e-9, name
+
+# rollups for the insight windows must agree with analyze()
+agent = InsightAgent(cfg)
+single = agent.analyze(df)
+rollups = agent.analyze_rollups(df, grouping_sets=[[], ["platform"]])
+assert abs(rollups["total"][0]["roas_change_pct"] - single["percent_changes"]["roas"]) < 1e-6
+
+print("\n--- ROLLUPS ---")
+for r in rollups["platform"]:
+    print(r["platform"], "ROAS change %:", round(r["roas_change_pct"], 2))
@@ -0,0 +1,66 @@
+# scripts/test_run_history.py
+import sys, os, sqlite3, tempfile, time
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+from src.utils.run_history import RunHistory
+
+dataset = os.path.join(PROJECT_ROOT, "data/synthetic_fb_ads_undergarments.csv")
+plan = {"steps": ["load_data", "compile_report"]}
+
+with tempfile.TemporaryDirectory() as tmp:
+    history = RunHistory(os.path.join(tmp, "history.sqlite"))
+    for i in range(1000):
+        insight = {
+            "recent_window": {"roas": 6.0 + i / 1000}, "previous_window": {"roas": 6.0},
+            "percent_changes": {"roas": i / 60, "ctr": -1.0},
+            "horizons": {"7d": {"percent_changes": {"roas": -i / 100}}},
+        }
+        validated = [
+            {"hypothesis": "ROAS improved — campaigns are becoming more efficient.", "metric": "roas",
+             "confidence": round(i / 1000, 3), "validated": i % 2 == 0, "evidence": "roas changed"},
+            {"hypothesis": "CTR fell — creatives may be fatiguing or less relevant.", "metric": "ctr",
+             "confidence": 0.2, "validated": False, "evidence": "ctr changed"},
+        ]
+        history.record_run("Analyze ROAS drop", dataset, plan, insight, validated, {"campaign_name": "A", "ideas": ["x", "y"]})
+
+    t0 = time.perf_counter()
+    rows = history.hypothesis_history("ROAS improved%", limit=50)
+    diff = history.diff_runs(1, 1000)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+
+    # a prefix is a range over the text index, not a LIKE scan
+    plan_rows = history.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM hypotheses h WHERE h.hypothesis >= ? AND h.hypothesis < ?", ("ROAS", "ROAT")
+    ).fetchall()
+    assert any("ix_hyp_text" in r["detail"] for r in plan_rows), [r["detail"] for r in plan_rows]
+    assert history.hypothesis_history("roas improved%") == []
+    assert len(history.hypothesis_history("%", limit=5000)) == 2000
+
+    # the same text about two campaigns stays two hypotheses in a diff
+    driver = {"hypothesis": "ROAS fell, driven mainly by rising CPC", "metric": "cpc", "type": "funnel_driver",
+              "confidence": 0.5, "validated": True, "evidence": ""}
+    a = history.record_run("q", dataset, plan, {}, [dict(driver, campaign="A"), dict(driver, campaign="B")])
+    b = history.record_run("q", dataset, plan, {}, [dict(driver, campaign="A", confidence=0.7), dict(driver, campaign="C")])
+    d = history.diff_runs(a, b)
+    assert [h["campaign"] for h in d["hypotheses_added"]] == ["C"]
+    assert [h["campaign"] for h in d["hypotheses_removed"]] == ["B"]
+    assert [(h["campaign"], h["type"], h["confidence_b"]) for h in d["hypotheses_changed"]] == [("A", "funnel_driver", 0.7)]
+    history.close()
+
+    # databases written before hypotheses had a type are upgraded in place
+    old = os.path.join(tmp, "old.sqlite")
+    conn = sqlite3.connect(old)
+    conn.execute("CREATE TABLE hypotheses (run_id INTEGER NOT NULL, hypothesis TEXT NOT NULL, metric TEXT, campaign TEXT, "
+                 "confidence REAL, validated INTEGER, evidence TEXT)")
+    conn.close()
+    upgraded = RunHistory(old)
+    upgraded.record_run("q", dataset, plan, {}, [dict(driver, campaign="A")])
+    assert upgraded.hypothesis_history("ROAS fell%")[0]["type"] == "funnel_driver"
+    upgraded.close()
+
+assert rows[0]["confidence"] == 0.999 and len(rows) == 50
+assert any(m["metric"] == "roas" and m["horizon"] == "7d" for m in diff["metrics"])
+assert diff["hypotheses_changed"][0]["confidence_b"] == 0.999 and diff["hypotheses_changed"][0]["metric"] == "roas"
+print(f"history + diff over 1000 runs: {elapsed_ms:.1f} ms")
+assert elapsed_ms < 500
@@ -0,0 +1,27 @@
+# scripts/test_sampling.py
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import pandas as pd
+from src.utils.sampling import sample_csv
+
+path = os.path.join(PROJECT_ROOT, "data/synthetic_fb_ads_undergarments.csv")
+full = pd.read_csv(path)
+
+a = sample_csv(path, n=500, strata=["campaign_name", "date"], seed=42, chunksize=700)
+b = sample_csv(path, n=500, strata=["campaign_name", "date"], seed=42, chunksize=700)
+assert len(a) == 500
+assert a.equals(b), "same seed must give the same sample"
+
+# unlike head(n), the sample spans the whole date range and many campaigns
+head = full.head(500)
+print("head:", head["date"].nunique(), "dates,", head["campaign_name"].nunique(), "campaigns,", head["adset_name"].nunique(), "adsets")
+print("sample:", a["date"].nunique(), "dates,", a["campaign_name"].nunique(), "campaigns,", a["adset_name"].nunique(), "adsets")
+assert a["date"].nunique() == full["date"].nunique()
+assert a["campaign_name"].nunique() > head["campaign_name"].nunique()
+assert a["adset_name"].nunique() > head["adset_name"].nunique()
+
+# every stratum is covered when there are fewer strata than sample rows
+few = sample_csv(path, n=200, strata=["platform"], seed=7, chunksize=1000)
+assert set(few["platform"]) == set(full["platform"])
@@ -0,0 +1,60 @@
+# scripts/test_shared_frame.py
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+import pandas as pd
+
+from src.utils.loader import load_config, load_data
+from src.utils.shared_frame import analyze_segments
+
+cfg = load_config(os.path.join(PROJECT_ROOT, "config/config.yaml"))
+df = load_data(os.path.join(PROJECT_ROOT, cfg["data"]["dataset_path"]))
+
+# the shared-memory process pool returns exactly the serial records, in the same order
+serial = analyze_segments(df, "campaign_name", cfg, workers=1)
+parallel = analyze_segments(df, "campaign_name", cfg, workers=2, ranges_per_worker=3)
+assert len(serial) == len(parallel) == df["campaign_name"].nunique()
+for s, p in zip(serial, parallel):
+    assert s == p, (s, p)
+
+# and both agree with a plain pandas groupby of the two lookback windows
+lookback = int(cfg["analysis"]["lookback_days"])
+dates = pd.to_datetime(df["date"])
+day = (dates - dates.min()).dt.days
+last = day.max()
+window = np.where(day >= last - lookback, "recent",
+                  np.where((day < last - lookback) & (day >= last - 2 * lookback), "previous", "older"))
+metrics = ["spend", "impressions", "clicks", "purchases", "revenue"]
+sums = df.assign(_window=window).groupby(["campaign_name", "_window"])[metrics].sum().unstack("_window", fill_value=0.0)
+rows = df.groupby("campaign_name").size()
+
+
+def ratio(num, den):
+    return (num / den.where(den > 0)).fillna(0.0)
+
+
+def pct(new, old):
+    return ((new - old) / old.where(old != 0) * 100).fillna(0.0)
+
+
+roas = {w: ratio(sums[("revenue", w)], sums[("spend", w)]) for w in ("recent", "previous")}
+ctr = {w: ratio(sums[("clicks", w)], sums[("impressions", w)]) for w in ("recent", "previous")}
+expected = pd.DataFrame({
+    "rows": rows,
+    "recent_roas": roas["recent"],
+    "previous_roas": roas["previous"],
+    "roas_change_pct": pct(roas["recent"], roas["previous"]),
+    "ctr_change_pct": pct(ctr["recent"], ctr["previous"]),
+    "spend_change_pct": pct(sums[("spend", "recent")], sums[("spend", "previous")]),
+})
+got = pd.DataFrame(serial).set_index("segment")[expected.columns]
+assert list(got.index) == sorted(expected.index)
+expected = expected.loc[got.index]
+assert (got["rows"] == expected["rows"]).all()
+assert np.allclose(got.drop(columns="rows").to_numpy(dtype=float), expected.drop(columns="rows").to_numpy(dtype=float),
+                   rtol=1e-9, atol=1e-9)
+
+print("--- SHARED FRAME ---")
+print(f"{len(serial)} segments: parallel == serial == pandas groupby")
@@ -0,0 +1,43 @@
+# scripts/test_sketches.py
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+import pandas as pd
+from src.utils.sketches import SegmentTotals, SummarySketch, TDigest, HyperLogLog, sketch_frame
+
+rng = np.random.default_rng(0)
+values = rng.lognormal(mean=3.0, sigma=1.0, size=200_000)
+
+# quantiles from merged per-chunk digests stay close to the exact ones
+merged = TDigest()
+for part in np.array_split(values, 8):
+    merged = merged.merge(TDigest().update(part))
+for q in (0.01, 0.5, 0.9, 0.99):
+    exact = np.quantile(values, q)
+    assert abs(merged.quantile(q) - exact) / exact < 0.02, q
+
+# HyperLogLog distinct counts within a few percent, and merge == union
+a = HyperLogLog().update([f"c{i}" for i in range(30_000)])
+b = HyperLogLog().update([f"c{i}" for i in range(20_000, 50_000)])
+assert abs(a.merge(b).estimate() - 50_000) / 50_000 < 0.05
+
+# exact moments are independent of chunking
+df = pd.DataFrame({"spend": values, "campaign_name": rng.integers(0, 500, size=values.size).astype(str)})
+s = sketch_frame(df, quantile_cols=["spend"], distinct_cols=["campaign_name"], chunksize=7_000)
+stats = s.to_dict()
+assert abs(stats["numeric"]["spend"]["mean"] - values.mean()) < 1e-6
+assert abs(stats["numeric"]["spend"]["std"] - values.std(ddof=1)) < 1e-6
+assert abs(s.distinct("campaign_name") - 500) <= 10
+
+# per-segment totals merge across chunks; the high-value cut is the exact quantile of the totals
+totals = SegmentTotals("campaign_name", "spend")
+for i in range(0, len(df), 7_000):
+    totals.update(df.iloc[i:i + 7_000])
+exact_totals = df.groupby("campaign_name")["spend"].sum()
+top = totals.above(0.9)
+assert abs(top["threshold"] - exact_totals.quantile(0.9)) < 1e-6
+assert set(top["segments"]) == set(exact_totals[exact_totals > exact_totals.quantile(0.9)].index)
+
+print("sketch checks passed:", stats["numeric"]["spend"]["p95"], s.distinct("campaign_name"))
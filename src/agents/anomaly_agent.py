@@ -0,0 +1,183 @@
+# src/agents/anomaly_agent.py
+import hashlib
+import os
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.utils.frame_guard import guard_inputs, parsed_dates
+from src.utils.forecast import segment_matrix
+from src.utils.prefix_sums import BASE_METRICS
+from src.utils.anomaly import KPIS, ADVERSE_DIRECTION, daily_kpis, robust_z, rolling_robust_z, load_state, save_state
+from src.utils.ingest import expand_parts
+from src.utils.rollup import set_name
+
+
+class AnomalyAgent:
+    """
+    Daily "what broke yesterday" alerts.
+    Scores the latest day's spend / CTR / CPA / ROAS of every campaign and adset
+    against a rolling median/MAD baseline of the preceding window and emits the
+    outliers as compact records ranked by severity (|z|).
+    In incremental mode the last window of daily KPIs per segment is kept in a
+    state file, so a run over new days only aggregates and scores those days.
+    Fully deterministic; the input frame is treated as read-only.
+    """
+
+    def __init__(self, config: Dict, state_file: Optional[str] = None):
+        self.config = config
+        an = config.get("analysis", {}).get("anomaly", {})
+        self.segments = [list(s) for s in an.get("segments", [["campaign_name"], ["campaign_name", "adset_name"]])]
+        self.metrics = [m for m in an.get("metrics", list(KPIS)) if m in KPIS]
+        self.window_days = int(an.get("window_days", 28))
+        self.min_periods = int(an.get("min_periods", 7))
+        self.z_threshold = float(an.get("z_threshold", 3.5))
+        self.scale_floor = float(an.get("scale_floor_pct", 5.0)) / 100.0
+        self.top_n = int(an.get("top_n", 20))
+        self.incremental = bool(an.get("incremental", False))
+        self.state_file = state_file if state_file is not None else an.get("state_file", "reports/anomaly_state.npz")
+        self.source: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def source_key(dataset_path: str, sample: bool = False, filters: Optional[Dict[str, List[str]]] = None,
+                   probe_bytes: int = 65536) -> Dict[str, Any]:
+        """
+        Which rows the windows were built from: the dataset (resolved path and a hash of its
+        first part's head, so daily appends keep the identity but a replaced file does not),
+        the sample flag and the compiled row filters.
+        """
+        head = hashlib.sha1()
+        with open(expand_parts(dataset_path)[0], "rb") as fh:
+            head.update(fh.read(probe_bytes))
+        return {"dataset": os.path.abspath(dataset_path), "head_sha1": head.hexdigest(), "sample": bool(sample),
+                "filters": {d: sorted(map(str, v)) for d, v in sorted((filters or {}).items())}}
+
+    def _meta(self, last_day: pd.Timestamp) -> Dict[str, Any]:
+        return {"window_days": self.window_days, "metrics": self.metrics, "segments": self.segments,
+                "source": self.source, "last_day": last_day.strftime("%Y-%m-%d")}
+
+    def _alerts(self, dims: List[str], labels: np.ndarray, values: np.ndarray, z: np.ndarray,
+                median: np.ndarray, day: pd.Timestamp) -> List[Dict[str, Any]]:
+        """Alert records for every (segment, metric) with |z| over the threshold."""
+        with np.errstate(invalid="ignore"):
+            hit = np.abs(z) >= self.z_threshold
+        alerts = []
+        for i, j in zip(*np.nonzero(hit)):
+            metric = self.metrics[j]
+            direction = 1 if z[i, j] > 0 else -1
+            alerts.append({
+                "grain": set_name(dims),
+                **dict(zip(dims, labels[i].tolist())),
+                "metric": metric,
+                "date": day.strftime("%Y-%m-%d"),
+                "value": float(values[i, j]),
+                "baseline_median": float(median[i, j]),
+                "z": float(z[i, j]),
+                "severity": float(abs(z[i, j])),
+                "direction": "up" if direction > 0 else "down",
+                "adverse": ADVERSE_DIRECTION[metric] in (0, direction),
+            })
+        return alerts
+
+    def detect(self, df: pd.DataFrame) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Batch mode: score the latest day against the full rolling baseline.
+        Returns (alerts, state) where state seeds incremental runs.
+        """
+        alerts, arrays = [], {}
+        last_day = parsed_dates(df).max()
+        for g, dims in enumerate(self.segments):
+            segments, _, Y = segment_matrix(df, dims, BASE_METRICS)
+            kpis = daily_kpis(Y)
+            scored = [rolling_robust_z(kpis[m], self.window_days, self.min_periods, self.scale_floor, last_days=1)
+                      for m in self.metrics]
+            z = np.column_stack([s[0][:, 0] for s in scored])
+            median = np.column_stack([s[1][:, 0] for s in scored])
+            values = np.column_stack([kpis[m][:, -1] for m in self.metrics])
+            labels = segments.to_numpy().astype(str)
+            alerts.extend(self._alerts(dims, labels, values, z, median, last_day))
+            # the last window of daily KPIs per segment, (n_segments, n_metrics, window)
+            buffer = np.full((len(segments), len(self.metrics), self.window_days), np.nan)
+            tail = np.stack([kpis[m][:, -self.window_days:] for m in self.metrics], axis=1)
+            buffer[:, :, self.window_days - tail.shape[2]:] = tail
+            arrays[f"g{g}_labels"] = labels
+            arrays[f"g{g}_buffer"] = buffer
+        return alerts, {"meta": self._meta(last_day), "arrays": arrays}
+
+    def update(self, df: pd.DataFrame, state: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Incremental mode: score only the days after state's last day, one day at a time,
+        against the stored windows. Work per day is O(segments x window).
+        Returns the alerts of the last new day and the advanced state.
+        """
+        last_day = pd.Timestamp(state["meta"]["last_day"])
+        dates = parsed_dates(df)
+        new = df[(dates > last_day).to_numpy()]
+        arrays = dict(state["arrays"])
+        alerts: List[Dict[str, Any]] = []
+        new_last = parsed_dates(new).max()
+        for g, dims in enumerate(self.segments):
+            labels, buffer = arrays[f"g{g}_labels"], arrays[f"g{g}_buffer"]
+            segments, days, Y = segment_matrix(new, dims, BASE_METRICS)
+            new_labels = segments.to_numpy().astype(str)
+            # map today's segments onto the stored ones; unseen segments start with an empty window
+            pos = pd.MultiIndex.from_arrays(list(labels.T)).get_indexer(pd.MultiIndex.from_arrays(list(new_labels.T))) \
+                if len(labels) else np.full(len(new_labels), -1)
+            unseen = pos < 0
+            if unseen.any():
+                pos[unseen] = len(labels) + np.arange(int(unseen.sum()))
+                labels = np.concatenate([labels.reshape(-1, len(dims)), new_labels[unseen]])
+                buffer = np.concatenate([buffer, np.full((int(unseen.sum()),) + buffer.shape[1:], np.nan)])
+
+            kpis = daily_kpis(Y)
+            day_alerts: List[Dict[str, Any]] = []
+            gap = (days[0] - last_day).days - 1
+            if gap > 0:  # days without any rows: the windows move on with missing values
+                buffer = np.concatenate([buffer[:, :, min(gap, self.window_days):],
+                                         np.full(buffer.shape[:2] + (min(gap, self.window_days),), np.nan)], axis=2)
+            for t, day in enumerate(days):
+                values = np.full(buffer.shape[:2], np.nan)
+                values[pos] = np.column_stack([kpis[m][:, t] for m in self.metrics])
+                z, median = robust_z(values, buffer, self.min_periods, self.scale_floor)
+                if day == new_last:
+                    day_alerts = self._alerts(dims, labels, values, z, median, day)
+                buffer = np.concatenate([buffer[:, :, 1:], values[:, :, None]], axis=2)
+            alerts.extend(day_alerts)
+            arrays[f"g{g}_labels"] = labels
+            arrays[f"g{g}_buffer"] = buffer
+        return alerts, {"meta": self._meta(new_last), "arrays": arrays}
+
+    @guard_inputs
+    def run(self, df: pd.DataFrame, source: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Returns {"mode", "date", "alerts_total", "alerts"}: the latest day's alerts,
+        top_n by severity. Uses (and refreshes) the state file in incremental mode;
+        falls back to a batch run when there is no usable state. `source` (source_key())
+        says which rows df holds: a state built from another dataset, a sample or other
+        row filters is not reused.
+        """
+        self.source = source
+        state = load_state(self.state_file) if self.incremental and self.state_file else {}
+        meta = state.get("meta", {})
+        max_day = parsed_dates(df).max()
+        usable = (
+            meta
+            and {k: meta.get(k) for k in ("window_days", "metrics", "segments", "source")}
+            == {"window_days": self.window_days, "metrics": self.metrics, "segments": self.segments, "source": source}
+            and pd.Timestamp(meta["last_day"]) < max_day
+        )
+        if usable:
+            alerts, state = self.update(df, state)
+            mode = "incremental"
+        else:
+            alerts, state = self.detect(df)
+            mode = "batch"
+        if self.incremental and self.state_file:
+            save_state(self.state_file, state)
+        alerts.sort(key=lambda a: -a["severity"])
+        return {
+            "mode": mode,
+            "date": state["meta"]["last_day"],
+            "alerts_total": len(alerts),
+            "alerts": alerts[:self.top_n],
+        }
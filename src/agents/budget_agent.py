@@ -0,0 +1,81 @@
+# src/agents/budget_agent.py
+import pandas as pd
+import numpy as np
+from typing import Dict, Any
+
+from src.utils.frame_guard import guard_inputs
+from src.utils.forecast import segment_matrix
+from src.utils.budget import fit_response_curves, allocate_budget, response, marginal_roas
+from src.utils.rollup import set_name
+
+
+class BudgetAgent:
+    """
+    Recommends where to move spend.
+    Fits a diminishing-returns spend -> revenue curve per segment from the daily
+    history, then reallocates the current daily budget (or a configured one)
+    greedily by marginal ROAS within per-segment min/max bounds.
+    Fully deterministic; the input frame is treated as read-only.
+    """
+
+    def __init__(self, config: Dict):
+        self.config = config
+        opt = config.get("analysis", {}).get("budget_optimizer", {})
+        self.segment = list(opt.get("segment", ["campaign_name"]))
+        self.history_days = int(opt.get("history_days", 28))
+        self.recent_days = int(opt.get("recent_days", 7))
+        self.daily_budget = opt.get("daily_budget")
+        self.min_pct = float(opt.get("min_pct", 0.5))
+        self.max_pct = float(opt.get("max_pct", 2.0))
+        self.steps = int(opt.get("steps", 0))
+        self.top_n = int(opt.get("top_n", 15))
+
+    @guard_inputs
+    def optimize(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Returns {"segment", "daily_budget", "allocated", "unallocated", "expected_revenue_current",
+        "expected_revenue_recommended", "expected_lift_pct", "segments", "moves"}; "moves" lists
+        the top_n largest reallocations (both directions) with current vs recommended daily spend.
+        "unallocated" is the part of the budget above every segment's max_pct cap (see allocate_budget).
+        """
+        segments, _, m = segment_matrix(df, self.segment, ["spend", "revenue"])
+        spend = m["spend"][:, -self.history_days:]
+        revenue = m["revenue"][:, -self.history_days:]
+        a, b, n_points = fit_response_curves(spend, revenue)
+
+        # current daily spend per segment, and the bounds a recommendation may move it within
+        current = spend[:, -self.recent_days:].mean(axis=1)
+        budget = float(self.daily_budget) if self.daily_budget is not None else float(current.sum())
+        lower = current * self.min_pct
+        upper = current * self.max_pct
+        recommended = allocate_budget(a, b, budget, lower, upper, steps=self.steps)
+        allocated = float(recommended.sum())
+        # rounding of the greedy increments is not "unallocated"
+        unallocated = budget - allocated if budget - allocated > 1e-6 * max(budget, 1.0) else 0.0
+
+        rev_current = response(a, b, current)
+        rev_recommended = response(a, b, recommended)
+        table = segments.copy()
+        table["elasticity"] = b
+        table["fit_days"] = n_points
+        table["current_daily_spend"] = current
+        table["recommended_daily_spend"] = recommended
+        table["change"] = recommended - current
+        table["expected_revenue_current"] = rev_current
+        table["expected_revenue_recommended"] = rev_recommended
+        table["marginal_roas"] = marginal_roas(a, b, recommended)
+        moves = table.reindex(table["change"].abs().sort_values(ascending=False, kind="stable").index).head(self.top_n)
+
+        total_current = float(rev_current.sum())
+        total_recommended = float(rev_recommended.sum())
+        return {
+            "segment": set_name(self.segment),
+            "daily_budget": budget,
+            "allocated": allocated,
+            "unallocated": unallocated,
+            "expected_revenue_current": total_current,
+            "expected_revenue_recommended": total_recommended,
+            "expected_lift_pct": ((total_recommended - total_current) / total_current * 100.0) if total_current > 0 else 0.0,
+            "segments": int(len(table)),
+            "moves": moves.to_dict(orient="records"),
+        }
@@ -154,3 +154,27 @@ class CreativeAgent:
             "ideas": ideas[:max_ideas],
             "rationale": rationale
         }
+
+    def refresh_fatigued(self, targets: List[Dict[str, Any]], max_targets: int = 3, max_ideas: int = 4) -> List[Dict[str, Any]]:
+        """
+        Replacement ideas for creatives flagged by FatigueAgent (largest decay first).
+        Each result is a generate_creatives() dict plus the target's adset, creative type
+        and fitted decay; the decayed CTR drives the CTA choice.
+        """
+        refreshed = []
+        for t in targets[:max_targets]:
+            out = self.generate_creatives(
+                campaign_name=t.get("campaign_name", ""),
+                current_message=t.get("creative_message", ""),
+                ctr_value=t.get("last_ctr"),
+                max_ideas=max_ideas
+            )
+            out["adset_name"] = t.get("adset_name")
+            out["creative_type"] = t.get("creative_type")
+            out["decay_pct"] = t.get("decay_pct")
+            out["rationale"] = (
+                f"CTR decayed {t.get('decay_pct', 0.0):.1f}% over {t.get('exposure_m', 0.0):.2f}M impressions "
+                f"(t = {t.get('t_stat', 0.0):.1f}). " + out["rationale"]
+            )
+            refreshed.append(out)
+        return refreshed
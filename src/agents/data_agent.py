@@ -6,6 +6,14 @@ from src.utils.logger import logger, timed_agent
 from src.utils.retry import retry
 from src.utils.schema import validate_schema
 from src.utils.helpers import compute_kpis, summarize_df
+from src.utils.sampling import sample_csv
+from src.utils.ingest import expand_parts, head, iter_csv, read_parts
+from src.utils.sketches import SegmentTotals, SummarySketch
+from src.utils.data_quality import scanner_from_config
+
+# columns summarized by basic_stats: quantiles + exact moments / distinct counts
+SKETCH_NUMERIC_COLS = ["spend", "impressions", "clicks", "purchases", "revenue", "ctr", "roas"]
+SKETCH_DISTINCT_COLS = ["campaign_name", "adset_name", "creative_message"]
 
 
 class DataAgent:
@@ -21,15 +29,66 @@ class DataAgent:
         # sample flag (True/False) - configured in config.yaml
         self.sample = config["data"].get("sample", False)
         self.sample_n = config["data"].get("sample_n", 500)
+        self.sample_strata = config["data"].get("sample_strata", ["campaign_name", "date"])
+        self.sample_chunksize = config["data"].get("sample_chunksize", 50_000)
+        self.ingest_workers = config["data"].get("ingest_workers", 4)
+        self.read_ahead = config["data"].get("read_ahead_chunks", 4)
+        self.seed = config.get("runtime", {}).get("random_seed", 42)
+        self.spend_high_pctile = float(config.get("thresholds", {}).get("spend_high_pctile", 0.9))
         self.df: Optional[pd.DataFrame] = None
+        self.quality: Optional[Dict[str, Any]] = None
+        # summary sketches + exact per-campaign spend, fed chunk by chunk as the data streams in
+        self.sketch: Optional[SummarySketch] = None
+        self.spend_totals: Optional[SegmentTotals] = None
+
+    def _new_stats(self) -> None:
+        self.sketch = SummarySketch(SKETCH_NUMERIC_COLS, SKETCH_DISTINCT_COLS)
+        self.spend_totals = SegmentTotals("campaign_name", "spend")
+
+    def _update_stats(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        self.sketch.update(chunk)
+        self.spend_totals.update(chunk)
+        return chunk
 
-    def _read_csv_with_retry(self, path: str) -> pd.DataFrame:
-        """Read CSV using the retry helper to handle transient IO errors."""
+    def _stream_csv(self, path: str, keep: bool = True, scanner=None) -> Optional[pd.DataFrame]:
+        """
+        Stream the CSV (plain, compressed or a glob of parts) chunk by chunk, updating the
+        summary sketches as each chunk arrives. keep=False holds one chunk at a time and
+        returns None (stats only).
+        """
+        self._new_stats()
+        parts = expand_parts(path)
+        chunks = read_parts(parts, lambda p: iter_csv(p, chunksize=self.sample_chunksize),
+                            workers=self.ingest_workers, read_ahead=self.read_ahead)
+        if scanner is not None:
+            chunks = scanner.scan_chunks(chunks, keep_dates=keep)
+        if not keep:
+            for chunk in chunks:
+                self._update_stats(chunk)
+            return None
+        kept = [self._update_stats(chunk) for chunk in chunks]
+        return pd.concat(kept, ignore_index=True) if kept else head(parts[0], 0)
+
+    def _read_csv_with_retry(self, path: str, scanner=None) -> pd.DataFrame:
+        """Read the CSV using the retry helper to handle transient IO errors (a retry restarts the stats)."""
         logger.info("Attempting to load CSV with retry: %s", path)
-        df = retry(pd.read_csv, args=(path,), kwargs={"encoding": "utf-8"}, retries=3, base_delay=1.0)
+        df = retry(self._stream_csv, args=(path,), kwargs={"scanner": scanner}, retries=3, base_delay=1.0)
         logger.info("CSV read complete: rows=%s cols=%s", df.shape[0], df.shape[1])
         return df
 
+    def _sample_csv_with_retry(self, path: str) -> pd.DataFrame:
+        """Stream the CSV once and keep a seeded, stratified sample (never the full file)."""
+        logger.info("Sampling %d rows stratified by %s (seed=%s): %s", self.sample_n, self.sample_strata, self.seed, path)
+        df = retry(
+            sample_csv,
+            args=(path,),
+            kwargs={"n": self.sample_n, "strata": self.sample_strata, "seed": self.seed, "chunksize": self.sample_chunksize},
+            retries=3,
+            base_delay=1.0,
+        )
+        logger.info("Sample complete: rows=%s cols=%s", df.shape[0], df.shape[1])
+        return df
+
     def load_data(self) -> Dict[str, Any]:
         """
         Load CSV, validate schema, optionally sample, compute KPIs, and return dataset info.
@@ -37,8 +96,18 @@ class DataAgent:
             dict with rows, columns, sample flag, and summary stats.
         """
         with timed_agent("data_agent", {"path": self.dataset_path, "sample": self.sample}):
-            # 1) robust load
-            df = self._read_csv_with_retry(self.dataset_path)
+            # 1) robust load (sample mode streams the file instead of loading it whole);
+            # a full load feeds the summary sketches and the row scan while streaming
+            scanner = scanner_from_config(self.config)
+            if self.sample:
+                df = self._sample_csv_with_retry(self.dataset_path)
+                if scanner is not None:
+                    df = scanner.scan_chunk(df, keep_dates=True)
+                # the stats describe what was loaded: the sample
+                self._new_stats()
+                self._update_stats(df)
+            else:
+                df = self._read_csv_with_retry(self.dataset_path, scanner=scanner)
 
             # 2) basic schema validation
             try:
@@ -48,12 +117,14 @@ class DataAgent:
                 logger.exception("Schema validation failed: %s", e)
                 raise
 
-            # 3) sample if requested (keeps determinism during dev)
-            if self.sample:
-                logger.info("Sampling first %d rows for dev mode", self.sample_n)
-                df = df.head(self.sample_n)
+            # 2b) row-level data quality: bad rows were quarantined while reading, re-aggregate duplicates
+            if scanner is not None:
+                df = scanner.dedupe(df)
+                self.quality = scanner.summary()
+                logger.info("Data quality: %d rows quarantined, violations=%s",
+                            self.quality["rows_quarantined"], self.quality["violations"])
 
-            # 4) compute KPI columns safely
+            # 3) compute KPI columns safely
             try:
                 df = compute_kpis(df)
                 logger.info("Computed KPIs: added columns if missing (ctr,cpc,cpa,roas)")
@@ -61,13 +132,13 @@ class DataAgent:
                 logger.exception("Error computing KPIs: %s", e)
                 raise
 
-            # 5) persist to self and return summary
+            # 4) persist to self and return summary
             self.df = df
             summary = summarize_df(df)
 
             info = {"rows": len(df), "columns": list(df.columns)}
             logger.info("DataAgent.load_data finished: rows=%d columns=%d", info["rows"], len(info["columns"]))
-            return {"dataset_info": info, "summary": summary}
+            return {"dataset_info": info, "summary": summary, "data_quality": self.quality}
 
     def missing_values(self) -> Dict[str, int]:
         """Return missing values per column as dict."""
@@ -76,12 +147,41 @@ class DataAgent:
             return {}
         return self.df.isnull().sum().to_dict()
 
+    def profile(self, path: Optional[str] = None) -> Dict[str, Any]:
+        """Summary stats of a dataset in one streaming pass, holding one chunk at a time (no frame kept)."""
+        self._stream_csv(path or self.dataset_path, keep=False)
+        return {"basic_stats": self.basic_stats(), "high_spend_campaigns": self.high_spend_campaigns()}
+
+    def profile_frame(self, df: pd.DataFrame, chunksize: int = 100_000) -> Dict[str, Any]:
+        """The same summary for a frame that is already loaded (e.g. the pipeline's), chunk by chunk."""
+        self._new_stats()
+        for i in range(0, len(df), chunksize):
+            self._update_stats(df.iloc[i:i + chunksize])
+        return {"basic_stats": self.basic_stats(), "high_spend_campaigns": self.high_spend_campaigns()}
+
     def basic_stats(self) -> Dict[str, Any]:
-        """Return numeric column descriptive statistics as dict."""
-        if self.df is None:
+        """
+        Return summary statistics from the mergeable sketches built while the data streamed in:
+        exact moments + t-digest quantiles for numeric metrics, HyperLogLog distinct
+        counts for campaigns/adsets/creative messages. Free-text columns are never described.
+        """
+        if self.sketch is None:
             logger.warning("basic_stats called before data loaded")
             return {}
-        return self.df.describe(include="all").to_dict()
+        stats = self.sketch.to_dict()
+        # columns the data did not have carry empty sketches
+        stats["numeric"] = {c: s for c, s in stats["numeric"].items() if s.get("count")}
+        stats["distinct"] = {c: n for c, n in stats["distinct"].items() if n}
+        return stats
+
+    def high_spend_campaigns(self) -> Dict[str, Any]:
+        """Campaigns whose total spend is above the thresholds.spend_high_pctile percentile (exact)."""
+        if self.spend_totals is None:
+            logger.warning("high_spend_campaigns called before data loaded")
+            return {}
+        flagged = self.spend_totals.above(self.spend_high_pctile)
+        flagged["pctile"] = self.spend_high_pctile
+        return flagged
 
     def get_df(self) -> Optional[pd.DataFrame]:
         """Return processed DataFrame (after load_data)."""
@@ -92,4 +192,6 @@ class DataAgent:
         res = self.load_data()
         missing = self.missing_values()
         stats = self.basic_stats()
-        return {"dataset_info": res.get("dataset_info"), "missing_values": missing, "basic_stats": stats}
+        high_spend = self.high_spend_campaigns()
+        return {"dataset_info": res.get("dataset_info"), "missing_values": missing, "basic_stats": stats,
+                "high_spend_campaigns": high_spend}
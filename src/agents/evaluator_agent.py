@@ -1,8 +1,11 @@
 # src/agents/evaluator_agent.py
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, Iterator, List
 from pathlib import Path
 
+from src.utils.logger import logger
+from src.utils.ndjson import write_ndjson
+
 
 class EvaluatorAgent:
     """
@@ -18,6 +21,7 @@ class EvaluatorAgent:
         self.ctr_low_threshold = float(self.config["thresholds"].get("ctr_low_threshold", 0.01)) * 100.0
         self.roas_low_threshold = float(self.config["thresholds"].get("roas_low_threshold", 0.5))
         self.spend_high_pctile = float(self.config["thresholds"].get("spend_high_pctile", 0.9))
+        self.funnel_noise_z = float(self.config["thresholds"].get("funnel_noise_z", 2.0))
 
     def _as_float(self, value) -> float:
         try:
@@ -46,27 +50,32 @@ class EvaluatorAgent:
             return f"{metric} changed by {change_pct:.2f}% (recent: {r}, previous: {p})"
 
     def validate(self, insight_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Validates the hypotheses returned by InsightAgent (see iter_validate)."""
+        return list(self.iter_validate(insight_result))
+
+    def iter_validate(self, insight_result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
         """
-        Validates the hypotheses returned by InsightAgent.
+        Validates the hypotheses returned by InsightAgent, yielding one entry at a time
+        so callers can stream them out (see src.utils.ndjson).
         Expects insight_result to contain:
           - recent_window (dict of metrics)
           - previous_window (dict of metrics)
           - percent_changes (dict metric -> percent)
           - hypotheses (list of hypothesis strings)
-        Returns a list of dicts with fields:
-          hypothesis, evidence, confidence (0-1), validated (bool)
+          - funnel (optional): structured per-segment driver hypotheses from InsightAgent.analyze_funnel
+        Yields dicts with fields:
+          hypothesis, metric, evidence, confidence (0-1), validated (bool)
+        (funnel drivers also carry type, grain, segment, campaign)
         """
         recent = insight_result.get("recent_window", {})
         previous = insight_result.get("previous_window", {})
         percent_changes = {k: self._as_float(v) for k, v in insight_result.get("percent_changes", {}).items()}
         hyps = insight_result.get("hypotheses", [])
 
-        validated = []
-
         # We'll map common keywords to metrics
         for h in hyps:
             h_lower = h.lower()
-            entry = {"hypothesis": h, "evidence": "", "confidence": 0.0, "validated": False}
+            entry = {"hypothesis": h, "metric": None, "evidence": "", "confidence": 0.0, "validated": False}
 
             # ROAS related
             if "roas" in h_lower:
@@ -77,6 +86,7 @@ class EvaluatorAgent:
                 direction_match = (change < 0) if expects_drop else (change >= 0)
                 # base confidence from magnitude
                 conf = score * (0.9 if direction_match else 0.5)
+                entry["metric"] = "roas"
                 entry["evidence"] = self._build_evidence("roas", recent, previous, change)
                 entry["confidence"] = round(float(conf), 3)
                 entry["validated"] = bool(conf > 0.25 and direction_match)
@@ -93,7 +103,21 @@ class EvaluatorAgent:
                 conf = score * (0.9 if direction_match else 0.5)
                 if low_ctr_flag:
                     conf = min(1.0, conf + 0.15)
+                entry["metric"] = "ctr"
                 entry["evidence"] = self._build_evidence("ctr", recent, previous, change)
+                # fatigue claims are checked against the per-creative exposure curves when available
+                fatigue = insight_result.get("creative_fatigue")
+                if "fatigu" in h_lower and fatigue and fatigue["fitted"]:
+                    conf = min(1.0, conf + 0.15) if fatigue["flagged"] else conf * 0.5
+                    entry["evidence"] += (
+                        f"; {fatigue['flagged']} of {fatigue['fitted']} creatives show significant CTR decay with exposure"
+                    )
+                elif "fatigu" in h_lower and fatigue:
+                    # no curve to test: neither support nor penalty
+                    note = (f"insufficient exposure history: none of {fatigue['series']} creatives has "
+                            f"{fatigue.get('min_days', 'enough')} days of data, fatigue not tested")
+                    entry["evidence"] += f"; {note}"
+                    logger.info("Creative fatigue check skipped (%s)", note)
                 entry["confidence"] = round(float(conf), 3)
                 entry["validated"] = bool(conf > 0.3 and direction_match)
 
@@ -102,6 +126,7 @@ class EvaluatorAgent:
                 change = percent_changes.get("spend", 0.0)
                 # percent of change vs small threshold - reuse roas threshold as heuristic
                 score = self._score_change(change, self.roas_threshold_pct)
+                entry["metric"] = "spend"
                 entry["evidence"] = self._build_evidence("spend", recent, previous, change)
                 conf = score * 0.7
                 entry["confidence"] = round(float(conf), 3)
@@ -111,6 +136,7 @@ class EvaluatorAgent:
             elif "impression" in h_lower or "audience" in h_lower or "frequency" in h_lower:
                 change = percent_changes.get("impressions", 0.0)
                 score = self._score_change(change, 5.0)  # small heuristic threshold 5%
+                entry["metric"] = "impressions"
                 entry["evidence"] = self._build_evidence("impressions", recent, previous, change)
                 entry["confidence"] = round(float(score * 0.7), 3)
                 entry["validated"] = bool(abs(change) > 3.0)
@@ -119,6 +145,7 @@ class EvaluatorAgent:
             elif "purchase" in h_lower or "conversion" in h_lower or "cpa" in h_lower:
                 change = percent_changes.get("purchases", 0.0)
                 score = self._score_change(change, 10.0)  # 10% heuristic
+                entry["metric"] = "purchases"
                 entry["evidence"] = self._build_evidence("purchases", recent, previous, change)
                 entry["confidence"] = round(float(score * 0.85), 3)
                 entry["validated"] = bool(score > 0.25 and (change < 0 if "down" in h_lower or "drop" in h_lower or "fell" in h_lower else True))
@@ -127,19 +154,69 @@ class EvaluatorAgent:
                 # fallback: use ROAS percent change as generic evidence
                 change = percent_changes.get("roas", 0.0)
                 score = self._score_change(change, self.roas_threshold_pct)
+                entry["metric"] = "roas"
                 entry["evidence"] = self._build_evidence("roas", recent, previous, change)
                 entry["confidence"] = round(float(score * 0.5), 3)
                 entry["validated"] = bool(score > 0.4)
 
-            validated.append(entry)
+            yield entry
 
-        return validated
+        for h in insight_result.get("funnel", {}).get("hypotheses", []):
+            yield self._validate_funnel_driver(h)
 
-    def save_insights(self, validated_hypotheses: List[Dict[str, Any]], out_path: str = "reports/insights.json") -> None:
+    def _validate_funnel_driver(self, h: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        A funnel driver is supported when its factor moved by more than funnel_noise_z times
+        its day-to-day noise in the segment (the contributions themselves add up to the ROAS
+        change by construction, so they are no evidence); confidence grows with the size of
+        the change and with how much of it the driver explains.
+        """
+        change = self._as_float(h.get("roas_change_pct"))
+        recent, previous = self._as_float(h.get("recent_roas")), self._as_float(h.get("previous_roas"))
+        contributions = h.get("contributions", {})
+        driver = self._as_float(contributions.get(h.get("metric")))
+        noise = h.get("driver_noise")
+        if noise is None:
+            z = 0.0
+        else:
+            z = abs(driver) / noise if noise > 0 else (float("inf") if driver else 0.0)
+        significant = z >= self.funnel_noise_z
+        share = self._as_float(h.get("driver_share"))
+        conf = self._score_change(change, self.roas_threshold_pct) * (0.5 + 0.5 * share)
+        if not significant:
+            conf *= 0.5
+        parts = ", ".join(f"{f.upper()} {c:+.1f}" for f, c in contributions.items())
+        if noise is None:
+            check = "too few days to measure the driver's daily noise"
+        else:
+            check = f"driver moved {z:.1f}x its daily noise (±{noise:.1f} log-points)"
+        return {
+            "hypothesis": h["hypothesis"],
+            "metric": h.get("metric"),
+            "campaign": h.get("campaign"),
+            "type": h.get("type"),
+            "grain": h.get("grain"),
+            "segment": h.get("segment"),
+            "evidence": (
+                f"ROAS changed by {change:.2f}% (recent: {recent:.3f}, previous: {previous:.3f}); "
+                f"log-point contributions: {parts}; driver explains {share:.0%}; {check}"
+            ),
+            "confidence": round(float(conf), 3),
+            "validated": bool(significant and conf > 0.25),
+        }
+
+    def save_insights(self, validated_hypotheses: Iterable[Dict[str, Any]], out_path: str = "reports/insights.json") -> int:
         """
         Persist validated hypotheses to JSON for submission.
+        Paths ending in .ndjson / .ndjson.gz are streamed record by record (atomic write),
+        so `validated_hypotheses` can be a generator such as iter_validate(...).
+        Returns the number of hypotheses written.
         """
+        if out_path.endswith((".ndjson", ".ndjson.gz")):
+            return write_ndjson(out_path, validated_hypotheses)
+        validated_hypotheses = list(validated_hypotheses)
         p = Path(out_path)
         p.parent.mkdir(parents=True, exist_ok=True)
         with open(p, "w", encoding="utf-8") as f:
             json.dump({"validated_hypotheses": validated_hypotheses}, f, indent=2)
+        return len(validated_hypotheses)
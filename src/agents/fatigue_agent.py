@@ -0,0 +1,86 @@
+# src/agents/fatigue_agent.py
+import pandas as pd
+import numpy as np
+from typing import Dict, Any
+
+from src.utils.frame_guard import guard_inputs, factorized
+from src.utils.fatigue import fit_exposure_decay
+from src.utils.rollup import set_name
+
+DEFAULT_SERIES = ["campaign_name", "adset_name", "creative_type", "creative_message"]
+
+
+class FatigueAgent:
+    """
+    Detects creative fatigue from exposure curves.
+    Every creative (message x type) within each adset is one series; its daily CTR is
+    regressed on the impressions it had already served, all series at once.
+    Creatives whose fitted CTR decay exceeds the threshold (and is significant)
+    are flagged as refresh targets for CreativeAgent.
+    Fully deterministic; the input frame is treated as read-only.
+    """
+
+    def __init__(self, config: Dict):
+        self.config = config
+        fc = config.get("analysis", {}).get("creative_fatigue", {})
+        self.series = list(fc.get("series", DEFAULT_SERIES))
+        self.min_days = int(fc.get("min_days", 7))
+        self.decay_threshold_pct = float(fc.get("decay_threshold_pct", 30.0))
+        self.min_t_stat = float(fc.get("min_t_stat", 2.0))
+        self.top_n = int(fc.get("top_n", 20))
+
+    def fit(self, df: pd.DataFrame) -> pd.DataFrame:
+        """One row per series: its dims, fit statistics and a `fatigued` flag."""
+        dims = [d for d in self.series if d in df.columns]
+        # one integer key per series from the cached dictionary codes, then a dense re-code
+        key = np.zeros(len(df), dtype=np.int64)
+        for d in dims:
+            codes, uniques = factorized(df, d)
+            key = key * (len(uniques) + 1) + (codes + 1)
+        series, _ = pd.factorize(key)
+        n_series = int(series.max()) + 1 if len(series) else 0
+        if n_series == 0:
+            return pd.DataFrame(columns=dims + ["points", "exposure_m", "decay_pct", "t_stat", "first_ctr", "last_ctr", "fatigued"])
+
+        fit = fit_exposure_decay(
+            series,
+            # ISO dates: the sorted dictionary codes are in date order
+            factorized(df, "date")[0],
+            df["impressions"].to_numpy(dtype=float, na_value=0.0),
+            df["clicks"].to_numpy(dtype=float, na_value=0.0),
+            n_series=n_series,
+        )
+        # labels from each series' first row (factorize numbers series in first-seen order)
+        first_row = np.flatnonzero(np.r_[True, np.diff(np.maximum.accumulate(series)) > 0])
+        out = df[dims].iloc[first_row].reset_index(drop=True)
+        out["points"] = fit["points"]
+        out["exposure_m"] = fit["exposure"]
+        out["decay_pct"] = fit["decay_pct"]
+        out["t_stat"] = fit["t_stat"]
+        out["first_ctr"] = fit["first_ctr"]
+        out["last_ctr"] = fit["last_ctr"]
+        out["fatigued"] = (
+            (out["points"] >= self.min_days)
+            & (out["decay_pct"] >= self.decay_threshold_pct)
+            & (out["t_stat"] <= -self.min_t_stat)
+        )
+        return out
+
+    @guard_inputs
+    def detect(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Returns {"series_dims", "series", "fitted", "min_days", "flagged", "decay_threshold_pct", "targets"},
+        where "fitted" counts the series with at least min_days points and "targets" lists
+        the top_n flagged creatives, largest decay first.
+        """
+        table = self.fit(df)
+        flagged = table[table["fatigued"]].sort_values("decay_pct", ascending=False, kind="stable")
+        return {
+            "series_dims": set_name([d for d in self.series if d in table.columns]),
+            "series": int(len(table)),
+            "fitted": int((table["points"] >= self.min_days).sum()),
+            "min_days": self.min_days,
+            "flagged": int(len(flagged)),
+            "decay_threshold_pct": self.decay_threshold_pct,
+            "targets": flagged.drop(columns=["fatigued"]).head(self.top_n).to_dict(orient="records"),
+        }
@@ -0,0 +1,86 @@
+# src/agents/forecast_agent.py
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, List
+
+from src.utils.frame_guard import guard_inputs
+from src.utils.forecast import segment_matrix, forecast_totals, active_days
+from src.utils.prefix_sums import percent_change_arrays
+from src.utils.rollup import set_name
+
+
+class ForecastAgent:
+    """
+    Forecasts next-N-day spend, revenue and ROAS for every campaign / adset.
+    All series of a grain are fitted at once over a (segment x day) matrix.
+    Fully deterministic; the input frame is treated as read-only.
+    """
+
+    def __init__(self, config: Dict):
+        self.config = config
+        fc = config.get("analysis", {}).get("forecast", {})
+        self.horizon_days = int(fc.get("horizon_days", 7))
+        self.history_days = int(fc.get("history_days", 56))
+        self.method = fc.get("method", "holt")
+        self.alpha = float(fc.get("alpha", 0.3))
+        self.beta = float(fc.get("beta", 0.1))
+        self.interval = float(fc.get("interval", 0.9))
+        self.min_active_days = int(fc.get("min_active_days", 7))
+        self.segments = [tuple(s) for s in fc.get("segments", [["campaign_name"], ["campaign_name", "adset_name"]])]
+        self.top_n = int(fc.get("top_n", 20))
+
+    def _params(self) -> Dict[str, float]:
+        return {"alpha": self.alpha, "beta": self.beta} if self.method == "holt" else {}
+
+    def forecast_grain(self, df: pd.DataFrame, dims) -> pd.DataFrame:
+        """One row per segment: recent N-day actuals and next N-day forecasts with intervals."""
+        segments, days, Y = segment_matrix(df, list(dims), ["spend", "revenue"])
+        spend = Y["spend"][:, -self.history_days:]
+        revenue = Y["revenue"][:, -self.history_days:]
+        n = self.horizon_days
+
+        spend_fc = forecast_totals(spend, n, self.method, self.interval, **self._params())
+        revenue_fc = forecast_totals(revenue, n, self.method, self.interval, **self._params())
+        recent_spend = spend[:, -n:].sum(axis=1)
+        recent_revenue = revenue[:, -n:].sum(axis=1)
+
+        def _ratio(num, den):
+            return np.divide(num, den, out=np.zeros_like(num, dtype=float), where=den > 0)
+
+        out = segments.copy()
+        out["active_days"] = active_days(spend)
+        out["recent_spend"] = recent_spend
+        out["recent_roas"] = _ratio(recent_revenue, recent_spend)
+        for name, fc in (("spend", spend_fc), ("revenue", revenue_fc)):
+            out[f"{name}_forecast"] = fc["point"]
+            out[f"{name}_lower"] = fc["lower"]
+            out[f"{name}_upper"] = fc["upper"]
+        # ROAS is a ratio of the forecast sums; its interval pairs the opposite bounds
+        # (unbounded above -> NaN when the spend lower bound reaches 0)
+        out["roas_forecast"] = _ratio(revenue_fc["point"], spend_fc["point"])
+        out["roas_lower"] = _ratio(revenue_fc["lower"], spend_fc["upper"])
+        out["roas_upper"] = np.where(spend_fc["lower"] > 0, _ratio(revenue_fc["upper"], spend_fc["lower"]), np.nan)
+        out["roas_change_pct"] = percent_change_arrays(out["roas_forecast"].to_numpy(), out["recent_roas"].to_numpy())
+        out = out[out["active_days"] >= self.min_active_days]
+        return out.sort_values("roas_change_pct", kind="stable").reset_index(drop=True)
+
+    @guard_inputs
+    def run(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Returns {"horizon_days", "method", "interval", "grains": {grain: {"series", "falling", "top"}}},
+        where "top" lists the top_n segments with the largest forecast ROAS drop.
+        """
+        grains = {}
+        for dims in self.segments:
+            table = self.forecast_grain(df, dims)
+            grains[set_name(dims)] = {
+                "series": int(len(table)),
+                "falling": int((table["roas_change_pct"] < 0).sum()),
+                "top": table.head(self.top_n).to_dict(orient="records"),
+            }
+        return {
+            "horizon_days": self.horizon_days,
+            "method": self.method,
+            "interval": self.interval,
+            "grains": grains,
+        }
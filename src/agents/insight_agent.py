@@ -1,17 +1,44 @@
 # src/agents/insight_agent.py
 
+import numpy as np
 import pandas as pd
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.utils.frame_guard import guard_inputs, parsed_dates
+from src.utils.prefix_sums import PrefixSumIndex, BASE_METRICS, derive_kpi_arrays, percent_change_arrays
+from src.utils.funnel import FACTORS, FACTOR_LABELS, FACTOR_SIGNS, change_noise, decompose_log_change
+from src.utils.rollup import compute_grouping_sets, parse_grouping_sets, set_name
 
 class InsightAgent:
     """
     Produces insights + hypotheses from summary statistics and full dataframe.
     Fully deterministic, no LLM used.
+    Input frames are treated as read-only, so threads can analyze one shared frame.
     """
 
     def __init__(self, config: Dict):
         self.config = config
         self.lookback_days = self.config["analysis"]["lookback_days"]
+        self.horizons = self.config["analysis"].get("horizons", [self.lookback_days])
+        self.grouping_sets = parse_grouping_sets(self.config["analysis"].get("grouping_sets", []))
+        funnel = self.config["analysis"].get("funnel", {})
+        self.funnel_segments = [tuple(s) for s in funnel.get("segments", [[], ["campaign_name"], ["campaign_name", "adset_name"]])]
+        self.funnel_min_change_pct = float(funnel.get("min_roas_change_pct", 5.0))
+
+    def required_days(self) -> int:
+        """
+        Days of history (ending at the latest date) that analyze() and analyze_horizons() read.
+        Lets the loader push a date-range predicate down instead of parsing the whole file.
+        """
+        needed = 2 * int(self.lookback_days) + 1
+        for spec in self.horizons:
+            if spec == "wow":
+                needed = max(needed, 20)
+            elif spec == "mom":
+                needed = max(needed, 93)
+            else:
+                needed = max(needed, 2 * int(spec) + 1)
+        return needed
 
     def _compute_window(self, df: pd.DataFrame) -> Dict[str, float]:
         """Compute aggregates for a given window of data."""
@@ -68,6 +95,7 @@ class InsightAgent:
 
         return hyp
 
+    @guard_inputs
     def analyze(self, df: pd.DataFrame) -> Dict[str, Any]:
         """
         1. Split data into recent + previous windows
@@ -75,13 +103,13 @@ class InsightAgent:
         3. Generate percent changes
         4. Produce insights + hypotheses
         """
-        df["date"] = pd.to_datetime(df["date"])
-        max_date = df["date"].max()
+        dates = parsed_dates(df)
+        max_date = dates.max()
 
-        recent_window = df[df["date"] >= (max_date - pd.Timedelta(days=self.lookback_days))]
+        recent_window = df[dates >= (max_date - pd.Timedelta(days=self.lookback_days))]
         previous_window = df[
-            (df["date"] < (max_date - pd.Timedelta(days=self.lookback_days)))
-            & (df["date"] >= (max_date - pd.Timedelta(days=self.lookback_days * 2)))
+            (dates < (max_date - pd.Timedelta(days=self.lookback_days)))
+            & (dates >= (max_date - pd.Timedelta(days=self.lookback_days * 2)))
         ]
 
         recent = self._compute_window(recent_window)
@@ -100,3 +128,202 @@ class InsightAgent:
             "percent_changes": percent_changes,
             "hypotheses": hypotheses,
         }
+
+    def _horizon_bounds(self, index: PrefixSumIndex, spec) -> Tuple[str, Tuple[int, int], Tuple[int, int]]:
+        """
+        Resolve a horizon spec to (label, recent_range, previous_range) in index days.
+        - int N: same windows as analyze() with lookback_days=N, i.e. the recent window is the
+          latest date plus the N days before it (N + 1 days) and the previous one the N days before that
+        - "wow": last complete Mon-Sun week vs the week before
+        - "mom": last complete calendar month vs the month before
+        """
+        last = index.n_days - 1
+        if spec == "wow":
+            max_date = index.max_date
+            week_end = max_date if max_date.weekday() == 6 else max_date - pd.Timedelta(days=max_date.weekday() + 1)
+            end = index.day_of(week_end) + 1
+            return "wow", (end - 7, end), (end - 14, end - 7)
+        if spec == "mom":
+            max_date = index.max_date
+            month_end = max_date if max_date.is_month_end else (max_date.replace(day=1) - pd.Timedelta(days=1))
+            month_start = month_end.replace(day=1)
+            prev_start = (month_start - pd.Timedelta(days=1)).replace(day=1)
+            return "mom", (index.day_of(month_start), index.day_of(month_end) + 1), (index.day_of(prev_start), index.day_of(month_start))
+        days = int(spec)
+        return f"{days}d", (last - days, last + 1), (last - 2 * days, last - days)
+
+    @guard_inputs
+    def analyze_horizons(self, df: pd.DataFrame, horizons: Optional[List] = None,
+                         segment_col: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Evaluate several comparison horizons in one call.
+        Builds per-day prefix sums once; every window after that is an O(1) lookup.
+        Returns {label: {days, previous_days, recent_dates, previous_dates, recent_window,
+        previous_window, percent_changes, hypotheses[, segments]}}. `days` / `previous_days` are the
+        real spans covered (clipped to the data; "7d" spans 8 recent days, see _horizon_bounds) and
+        `*_dates` the [first, last] ISO dates of each window (None when it is empty).
+        When `segment_col` is set, each horizon also carries per-segment percent changes.
+        """
+        horizons = horizons if horizons is not None else self.horizons
+        index = PrefixSumIndex(df, segment_cols=[segment_col] if segment_col else None)
+        results = {}
+
+        for spec in horizons:
+            label, (ra, rb), (pa, pb) = self._horizon_bounds(index, spec)
+            recent = index.window(ra, rb)
+            previous = index.window(pa, pb)
+            percent_changes = {k: self._percent_change(recent[k], previous[k]) for k in recent}
+            days, recent_dates = self._span(index, ra, rb)
+            previous_days, previous_dates = self._span(index, pa, pb)
+            entry = {
+                "days": days,
+                "previous_days": previous_days,
+                "recent_dates": recent_dates,
+                "previous_dates": previous_dates,
+                "recent_window": recent,
+                "previous_window": previous,
+                "percent_changes": percent_changes,
+                "hypotheses": self._generate_hypotheses(recent, previous),
+            }
+            if segment_col:
+                seg_recent = derive_kpi_arrays(index.segment_sums(segment_col, ra, rb))
+                seg_prev = derive_kpi_arrays(index.segment_sums(segment_col, pa, pb))
+                changes = pd.DataFrame(
+                    {k: percent_change_arrays(seg_recent[k], seg_prev[k]) for k in seg_recent},
+                    index=index.segments(segment_col),
+                )
+                entry["segments"] = changes.to_dict(orient="index")
+            results[label] = entry
+
+        return results
+
+    @staticmethod
+    def _span(index: PrefixSumIndex, start_day: int, end_day: int) -> Tuple[int, Optional[List[str]]]:
+        """Days of [start_day, end_day) inside the data, and its [first, last] ISO dates."""
+        start, end = min(max(start_day, 0), index.n_days), min(max(end_day, 0), index.n_days)
+        if end <= start:
+            return 0, None
+        first = index.min_date + pd.Timedelta(days=start)
+        last = index.min_date + pd.Timedelta(days=end - 1)
+        return end - start, [first.date().isoformat(), last.date().isoformat()]
+
+    def _window_labels(self, df: pd.DataFrame) -> pd.Series:
+        """Per-row "recent" / "previous" (None outside both), the same windows as analyze()."""
+        dates = parsed_dates(df)
+        max_date = dates.max()
+        recent_start = max_date - pd.Timedelta(days=self.lookback_days)
+        previous_start = max_date - pd.Timedelta(days=self.lookback_days * 2)
+        return pd.Series(
+            np.where(dates >= recent_start, "recent", np.where(dates >= previous_start, "previous", None)),
+            index=df.index,
+        )
+
+    @guard_inputs
+    def analyze_rollups(self, df: pd.DataFrame, grouping_sets: Optional[List] = None) -> Dict[str, Any]:
+        """
+        Recent vs previous window (same windows as analyze()) at every configured grain.
+        The window is an extra rollup dimension, so all grouping sets and both windows
+        come out of a single pass over the rows.
+        Returns {grain: [{<dims>, recent_roas, previous_roas, roas_change_pct, ctr_change_pct,
+        spend_change_pct, recent_spend}]} sorted by ROAS change (largest drop first).
+        """
+        sets = parse_grouping_sets(grouping_sets) if grouping_sets is not None else self.grouping_sets
+        if not sets:
+            return {}
+        rollups = compute_grouping_sets(df, [("_window",) + s for s in sets], extra_dims={"_window": self._window_labels(df)})
+        results = {}
+        for s in sets:
+            table = rollups[set_name(("_window",) + s)]
+            keys = list(s) or ["_all"]
+            table = table.assign(_all="total") if not s else table
+            wide = table.pivot_table(index=keys, columns="_window", values=["spend", "ctr", "roas"], fill_value=0.0)
+            get = lambda m, w: wide[(m, w)].to_numpy() if (m, w) in wide.columns else np.zeros(len(wide))
+            out = pd.DataFrame(index=wide.index)
+            out["recent_roas"] = get("roas", "recent")
+            out["previous_roas"] = get("roas", "previous")
+            out["roas_change_pct"] = percent_change_arrays(out["recent_roas"], out["previous_roas"])
+            out["ctr_change_pct"] = percent_change_arrays(get("ctr", "recent"), get("ctr", "previous"))
+            out["spend_change_pct"] = percent_change_arrays(get("spend", "recent"), get("spend", "previous"))
+            out["recent_spend"] = get("spend", "recent")
+            out = out.sort_values("roas_change_pct", kind="stable").reset_index()
+            results[set_name(s)] = out.drop(columns=["_all"], errors="ignore").to_dict(orient="records")
+        return results
+
+    @guard_inputs
+    def analyze_funnel(self, df: pd.DataFrame, segments: Optional[List] = None) -> Dict[str, Any]:
+        """
+        Decompose the recent vs previous ROAS change (same windows as analyze()) into
+        CTR, CVR, AOV and CPM log-contributions for the account and every configured grain.
+        Both windows of every grain, and their per-day sums, come out of one rollup pass,
+        and all segments are decomposed in one array expression.
+        Returns {"factors", "segments", "hypotheses"}: one structured hypothesis (the
+        dominant driver) per segment whose ROAS moved at least min_roas_change_pct,
+        with the driver's day-to-day noise for EvaluatorAgent to validate against.
+        """
+        grains = [tuple(s) for s in segments] if segments is not None else self.funnel_segments
+        if not grains:
+            return {"factors": list(FACTORS), "segments": 0, "hypotheses": []}
+        sets = [("_window",) + g for g in grains] + [("_window", "date") + g for g in grains]
+        rollups = compute_grouping_sets(df, sets, extra_dims={"_window": self._window_labels(df)})
+
+        index_parts, recent, previous = [], {m: [] for m in BASE_METRICS}, {m: [] for m in BASE_METRICS}
+        noise = []
+        for g in grains:
+            table = rollups[set_name(("_window",) + g)]
+            keys = list(g) or ["_all"]
+            table = table.assign(_all="total") if not g else table
+            wide = table.pivot_table(index=keys, columns="_window", values=list(BASE_METRICS), fill_value=0.0)
+            get = lambda m, w: wide[(m, w)].to_numpy() if (m, w) in wide.columns else np.zeros(len(wide))
+            for m in BASE_METRICS:
+                recent[m].append(get(m, "recent"))
+                previous[m].append(get(m, "previous"))
+            index_parts.append((g, wide.index))
+            daily = rollups[set_name(("_window", "date") + g)]
+            daily = daily.assign(_all="total") if not g else daily
+            noise.append(change_noise(daily, keys).reindex(wide.index).to_numpy())
+        noise = np.concatenate(noise)
+
+        recent = {m: np.concatenate(v) for m, v in recent.items()}
+        previous = {m: np.concatenate(v) for m, v in previous.items()}
+        out = decompose_log_change(recent, previous)
+
+        hypotheses = []
+        pos = 0
+        for g, idx in index_parts:
+            rows = range(pos, pos + len(idx))
+            pos += len(idx)
+            records = []
+            for i, key in zip(rows, idx):
+                change = float(out["roas_change_pct"][i])
+                if not out["valid"][i] or abs(change) < self.funnel_min_change_pct:
+                    continue
+                segment = dict(zip(g, key if isinstance(key, tuple) else (key,))) if g else {}
+                driver = int(out["dominant"][i])
+                contribution = float(out["contributions"][i, driver])
+                # the factor itself moved in the direction of its contribution, except CPM
+                rising = contribution * FACTOR_SIGNS[driver] > 0
+                label = " / ".join(f"{d.replace('_name', '')} '{v}'" for d, v in segment.items()) or "the account"
+                records.append({
+                    "type": "funnel_driver",
+                    # no numbers in the text: it identifies the hypothesis across runs (run history)
+                    "hypothesis": (
+                        f"ROAS {'fell' if change < 0 else 'rose'} for {label}, driven mainly by "
+                        f"{'rising' if rising else 'falling'} {FACTOR_LABELS[FACTORS[driver]]}"
+                    ),
+                    "metric": FACTORS[driver],
+                    "grain": set_name(g),
+                    "segment": segment,
+                    "campaign": segment.get("campaign_name"),
+                    "recent_roas": float(recent["revenue"][i] / recent["spend"][i]),
+                    "previous_roas": float(previous["revenue"][i] / previous["spend"][i]),
+                    "roas_change_pct": change,
+                    # signed log-points (x100), summing to the ROAS log change
+                    "contributions": {f: float(c) * 100.0 for f, c in zip(FACTORS, out["contributions"][i])},
+                    "driver_share": float(out["share"][i]),
+                    # standard error of the driver's log change from its daily values (None: < 2 days)
+                    "driver_noise": None if np.isnan(noise[i, driver]) else float(noise[i, driver]),
+                    "recent_spend": float(recent["spend"][i]),
+                })
+            records.sort(key=lambda r: r["roas_change_pct"])
+            hypotheses.extend(records)
+        return {"factors": list(FACTORS), "segments": int(out["valid"].sum()), "hypotheses": hypotheses}
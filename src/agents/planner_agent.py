@@ -1,6 +1,71 @@
 # src/agents/planner_agent.py
 import datetime
-from typing import Dict, List
+import re
+from typing import Dict, List, Optional
+
+from src.utils.prefix_sums import BASE_METRICS
+from src.utils.rollup import parse_grouping_sets
+from src.utils.dim_dictionary import filters_from_matches
+
+# Columns each step reads eagerly from the dataset. The loader reads only the union.
+STEP_COLUMNS: Dict[str, List[str]] = {
+    "load_data": ["date"],
+    # the dedupe keys and base metrics; the ctr/roas consistency rules run only if another step loads them
+    "check_data_quality": ["campaign_name", "adset_name", "date"] + BASE_METRICS,
+    "compute_kpis": BASE_METRICS,
+    "compute_trends": ["date"] + BASE_METRICS,
+    "detect_roas_changes": ["date", "spend", "revenue"],
+    "generate_hypotheses": ["date"] + BASE_METRICS,
+    "validate_hypotheses": [],
+    "generate_creative_recommendations": ["campaign_name", "clicks", "impressions"],
+    "check_audience_signals": ["date", "audience_type", "impressions"],
+    "analyze_segments": ["date"] + BASE_METRICS,
+    "compute_rollups": ["date"] + BASE_METRICS,
+    "decompose_funnel": ["date"] + BASE_METRICS,
+    "detect_creative_fatigue": ["date", "impressions", "clicks"],
+    "detect_anomalies": ["date"] + BASE_METRICS,
+    "forecast_kpis": ["date", "spend", "revenue"],
+    "optimize_budget": ["date", "spend", "revenue"],
+    "render_charts": ["campaign_name", "date", "spend", "revenue", "clicks", "impressions"],
+    "compile_report": [],
+}
+
+# Steps that read free-text columns eagerly: planned only when the query mentions one of these terms
+QUERY_STEPS: Dict[str, List[str]] = {
+    "detect_creative_fatigue": ["creative", "fatigu", "ctr", "click", "frequency"],
+}
+
+# Columns a step needs only for a handful of rows; fetched on demand instead of loaded.
+DEFERRED_COLUMNS: Dict[str, List[str]] = {
+    "generate_creative_recommendations": ["creative_message"],
+}
+
+# Date horizons named in the query: "last 14 days", "past 2 weeks", "14-day", "last month", "yesterday"
+HORIZON_UNITS = {"d": 1, "day": 1, "days": 1, "w": 7, "week": 7, "weeks": 7, "month": 30, "months": 30, "quarter": 90}
+HORIZON_PATTERNS = [
+    re.compile(r"\b(?:last|past|previous|trailing)\s+(\d+)\s*(days?|d|weeks?|w|months?)\b"),
+    re.compile(r"\b(\d+)[\s-]*(day|week|month)s?\b"),
+    re.compile(r"\b(?:last|past|previous)\s+()(day|week|month|quarter)\b"),
+]
+
+# Metric vocabulary; longer phrases first so "cost per click" is not read as "cost"
+METRIC_TERMS = [
+    ("return on ad spend", "roas"), ("cost per click", "cpc"), ("cost per acquisition", "cpa"),
+    ("cost per purchase", "cpa"), ("click-through", "ctr"), ("click through", "ctr"),
+    ("conversion rate", "cvr"), ("roas", "roas"), ("ctr", "ctr"), ("cpc", "cpc"), ("cpa", "cpa"),
+    ("cvr", "cvr"), ("spend", "spend"), ("budget", "spend"), ("revenue", "revenue"), ("sales", "revenue"),
+    ("purchases", "purchases"), ("purchase", "purchases"), ("conversions", "purchases"),
+    ("impressions", "impressions"), ("clicks", "clicks"),
+]
+METRIC_PATTERN = re.compile(r"\b(" + "|".join(re.escape(t) for t, _ in METRIC_TERMS) + r")\b")
+METRIC_BY_TERM = dict(METRIC_TERMS)
+
+# Dataset column order, used to keep the projected column list stable
+DATASET_COLUMNS: List[str] = [
+    "campaign_name", "adset_name", "date", "spend", "impressions", "clicks", "ctr",
+    "purchases", "revenue", "roas", "creative_type", "creative_message",
+    "audience_type", "platform", "country",
+]
 
 class PlannerAgent:
     """
@@ -9,21 +74,96 @@ class PlannerAgent:
     Output: dict with 'query', 'timestamp', 'steps' (ordered), and 'notes'
     """
 
-    def __init__(self, config: Dict):
+    def __init__(self, config: Dict, dimensions=None):
         self.config = config
+        # DimensionDictionary of the dataset (src.utils.dim_dictionary); enables row filters
+        self.dimensions = dimensions
 
     def _base_steps(self) -> List[str]:
         return [
             "load_data",
+            "check_data_quality",
             "compute_kpis",
             "compute_trends",
             "detect_roas_changes",
             "generate_hypotheses",
             "validate_hypotheses",
+            "analyze_segments",
+            "compute_rollups",
+            "decompose_funnel",
+            "detect_creative_fatigue",
+            "detect_anomalies",
+            "forecast_kpis",
+            "optimize_budget",
             "generate_creative_recommendations",
+            "render_charts",
             "compile_report"
         ]
 
+    def _step_columns(self, step: str) -> List[str]:
+        if step == "check_data_quality" and not self.config.get("data_quality", {}).get("enabled", False):
+            return []
+        cols = list(STEP_COLUMNS.get(step, []))
+        if step == "analyze_segments":
+            # the segment dimension is configurable
+            cols.append(self.config.get("analysis", {}).get("segment_analysis", {}).get("segment_col", "campaign_name"))
+        if step == "compute_rollups":
+            # every dimension named by the configured grouping sets
+            for grouping_set in parse_grouping_sets(self.config.get("analysis", {}).get("grouping_sets", [])):
+                cols.extend(grouping_set)
+        if step == "decompose_funnel":
+            funnel = self.config.get("analysis", {}).get("funnel", {})
+            if not funnel.get("enabled", False):
+                return []
+            for dims in funnel.get("segments", [[], ["campaign_name"], ["campaign_name", "adset_name"]]):
+                cols.extend(dims)
+        if step == "detect_creative_fatigue":
+            fatigue = self.config.get("analysis", {}).get("creative_fatigue", {})
+            if not fatigue.get("enabled", False):
+                return []
+            # the series are keyed by creative_message, so it is loaded eagerly here
+            cols.extend(fatigue.get("series", ["campaign_name", "adset_name", "creative_type", "creative_message"]))
+        if step == "detect_anomalies":
+            anomaly = self.config.get("analysis", {}).get("anomaly", {})
+            if not anomaly.get("enabled", False):
+                return []
+            for dims in anomaly.get("segments", [["campaign_name"], ["campaign_name", "adset_name"]]):
+                cols.extend(dims)
+        if step == "forecast_kpis":
+            for dims in self.config.get("analysis", {}).get("forecast", {}).get("segments", [["campaign_name"], ["campaign_name", "adset_name"]]):
+                cols.extend(dims)
+        if step == "optimize_budget":
+            cols.extend(self.config.get("analysis", {}).get("budget_optimizer", {}).get("segment", ["campaign_name"]))
+        return cols
+
+    def _columns_for(self, steps: List[str], filters: Optional[Dict[str, List[str]]] = None) -> List[str]:
+        """Union of the columns the planned steps (and the row filters) read, in dataset column order."""
+        needed = set(filters or {})
+        for step in steps:
+            needed.update(self._step_columns(step))
+        return [c for c in DATASET_COLUMNS if c in needed]
+
+    @staticmethod
+    def _horizon_days(q: str) -> Optional[int]:
+        """Days named by the first date horizon in the (lowercased) query, if any."""
+        if re.search(r"\byesterday\b", q):
+            return 1
+        for pattern in HORIZON_PATTERNS:
+            m = pattern.search(q)
+            if m:
+                return int(m.group(1) or 1) * HORIZON_UNITS[m.group(2)]
+        return None
+
+    @staticmethod
+    def _metrics(q: str) -> List[str]:
+        """Target metrics named in the (lowercased) query, in order of mention."""
+        out = []
+        for m in METRIC_PATTERN.finditer(q):
+            metric = METRIC_BY_TERM[m.group(1)]
+            if metric not in out:
+                out.append(metric)
+        return out
+
     def plan(self, user_query: str) -> Dict:
         """
         Convert user_query into a sequence of subtasks.
@@ -57,6 +197,24 @@ class PlannerAgent:
             if "check_audience_signals" not in steps:
                 steps.insert(3, "check_audience_signals")
 
+        for step, terms in QUERY_STEPS.items():
+            if step in steps and not any(t in q for t in terms):
+                steps.remove(step)
+                notes.append(f"Skip {step}: not asked for by the query, so its text columns are not loaded.")
+
+        # compiled query: row filters from known dimension values, date horizon, target metrics
+        matches = self.dimensions.match(user_query) if self.dimensions is not None else []
+        filters = filters_from_matches(matches)
+        horizon_days = self._horizon_days(q)
+        metrics = self._metrics(q)
+        if filters:
+            notes.append("Filter rows to " + "; ".join(
+                f"{m['dim']} ~ '{m['text']}' ({len(m['values'])} value{'s' if len(m['values']) != 1 else ''})" for m in matches
+            ) + ".")
+        if horizon_days:
+            days = f"{horizon_days} day{'s' if horizon_days != 1 else ''}"
+            notes.append(f"Compare the last {days} with the {days} before.")
+
         # default time settings
         ts = datetime.datetime.utcnow().isoformat() + "Z"
 
@@ -65,13 +223,25 @@ class PlannerAgent:
             "timestamp": ts,
             "steps": steps,
             "notes": notes,
+            "step_columns": {step: self._step_columns(step) for step in steps},
+            "columns": self._columns_for(steps, filters),
+            "deferred_columns": {step: cols for step, cols in DEFERRED_COLUMNS.items() if step in steps},
+            "filters": filters,
+            "horizon_days": horizon_days,
+            "metrics": metrics,
             "schema": {
                 "type": "object",
                 "properties": {
                     "query": {"type": "string"},
                     "timestamp": {"type": "string"},
                     "steps": {"type": "array", "items": {"type": "string"}},
-                    "notes": {"type": "array", "items": {"type": "string"}}
+                    "notes": {"type": "array", "items": {"type": "string"}},
+                    "step_columns": {"type": "object"},
+                    "columns": {"type": "array", "items": {"type": "string"}},
+                    "deferred_columns": {"type": "object"},
+                    "filters": {"type": "object", "additionalProperties": {"type": "array", "items": {"type": "string"}}},
+                    "horizon_days": {"type": ["integer", "null"]},
+                    "metrics": {"type": "array", "items": {"type": "string"}}
                 },
                 "required": ["query", "timestamp", "steps"]
             }
@@ -0,0 +1,118 @@
+# src/utils/anomaly.py
+"""
+Rolling robust z-scores for daily segment KPIs.
+
+Each day's value is scored against the `window` days before it:
+    z = (value - median) / (1.4826 * MAD)
+The baselines are sliding windows over the (segment x day) matrix
+(numpy.lib.stride_tricks.sliding_window_view, no copies); medians come from one
+sort along the window axis, with missing days (NaN) sorted to the end. The scale
+is floored at a fraction of |median| so flat series do not produce infinite scores.
+
+For daily runs the last `window` days of every segment are kept as state: scoring
+a new day is O(segments x window), independent of the history length.
+
+Usage:
+    from src.utils.anomaly import daily_kpis, rolling_robust_z
+    kpis = daily_kpis({m: Y[m] for m in ("spend", "impressions", "clicks", "purchases", "revenue")})
+    z, median = rolling_robust_z(kpis["roas"], window=28, last_days=1)
+"""
+
+import json
+import os
+import tempfile
+from typing import Any, Dict, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.utils.helpers import publish_temp_file
+
+KPIS = ("spend", "ctr", "cpa", "roas")
+# direction in which a KPI move hurts the account (0: either way)
+ADVERSE_DIRECTION = {"spend": 0, "ctr": -1, "cpa": 1, "roas": -1}
+MAD_TO_SIGMA = 1.4826
+
+
+def daily_kpis(sums: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Spend, CTR, CPA, ROAS from base-metric sums of any shape; NaN where undefined or inactive."""
+    spend, imp = sums["spend"], sums["impressions"]
+    active = (spend > 0) | (imp > 0)
+
+    def _ratio(num, den):
+        return np.divide(num, den, out=np.full(np.shape(num), np.nan), where=den > 0)
+
+    return {
+        "spend": np.where(active, spend, np.nan),
+        "ctr": _ratio(sums["clicks"], imp),
+        "cpa": _ratio(spend, sums["purchases"]),
+        "roas": _ratio(sums["revenue"], spend),
+    }
+
+
+def _nan_median(a: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Median along the last axis ignoring NaN, and the count of non-NaN values."""
+    s = np.sort(a, axis=-1)  # NaN sorts last
+    k = (~np.isnan(a)).sum(axis=-1)
+    lo = np.take_along_axis(s, np.maximum((k - 1) // 2, 0)[..., None], axis=-1)[..., 0]
+    hi = np.take_along_axis(s, (k // 2)[..., None], axis=-1)[..., 0]
+    return np.where(k > 0, (lo + hi) / 2.0, np.nan), k
+
+
+def robust_z(values: np.ndarray, baseline: np.ndarray, min_periods: int = 7,
+             scale_floor: float = 0.05) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score `values` (shape S) against `baseline` (shape S + (window,)).
+    Returns (z, median); z is NaN where the baseline has fewer than min_periods values.
+    """
+    median, k = _nan_median(baseline)
+    mad, _ = _nan_median(np.abs(baseline - median[..., None]))
+    scale = np.maximum(MAD_TO_SIGMA * mad, scale_floor * np.abs(median))
+    ok = (k >= min_periods) & (scale > 0) & ~np.isnan(values)
+    z = np.divide(values - median, scale, out=np.full(np.shape(values), np.nan), where=ok)
+    return z, median
+
+
+def rolling_robust_z(Y: np.ndarray, window: int, min_periods: int = 7, scale_floor: float = 0.05,
+                     last_days: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Robust z of every day of every row of Y (n_segments, n_days) against the preceding
+    `window` days; `last_days` limits scoring to the most recent days.
+    Returns (z, median), both (n_segments, scored days).
+    """
+    n_days = Y.shape[1]
+    last_days = n_days if last_days is None else min(int(last_days), n_days)
+    # baseline for day t is Y[:, t-window:t]; pad the front so early days get partial windows
+    tail = Y[:, n_days - last_days - min(window, n_days - last_days):]
+    pad = window - (tail.shape[1] - last_days)
+    padded = np.concatenate([np.full((Y.shape[0], pad), np.nan), tail], axis=1)
+    baselines = sliding_window_view(padded, window, axis=1)[:, :last_days]
+    return robust_z(Y[:, n_days - last_days:], baselines, min_periods, scale_floor)
+
+
+def save_state(path: str, state: Dict[str, Any]) -> None:
+    """
+    Persist {"meta": {...}, "arrays": {name: ndarray}} atomically as .npz
+    (no pickled objects: string arrays are stored as unicode).
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", suffix=".npz", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, _meta=np.array(json.dumps(state["meta"])), **state["arrays"])
+        publish_temp_file(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def load_state(path: str) -> Dict[str, Any]:
+    """Inverse of save_state; {} when the file does not exist."""
+    if not os.path.exists(path):
+        return {}
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {k: data[k] for k in data.files if k != "_meta"}
+        meta = json.loads(str(data["_meta"]))
+    return {"meta": meta, "arrays": arrays}
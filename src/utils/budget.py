@@ -0,0 +1,126 @@
+# src/utils/budget.py
+"""
+Diminishing-returns response curves and greedy budget allocation.
+
+Each segment's daily spend -> revenue relation is modelled as
+    revenue = a * spend ** b        (0 < b < 1: every extra dollar earns less)
+fitted by batched least squares on log(revenue) ~ log(spend) over the days with
+both spend and revenue. A fixed total budget is then allocated with a max-heap on
+the marginal revenue of the next budget increment, under per-segment min/max.
+A budget below the sum of the minimums scales the minimums down to fit; a budget
+above the sum of the maximums leaves the excess unallocated (both are logged).
+
+Usage:
+    from src.utils.budget import fit_response_curves, allocate_budget
+    a, b, n = fit_response_curves(spend_matrix, revenue_matrix)
+    alloc = allocate_budget(a, b, budget=10_000, lower=lo, upper=hi)
+"""
+
+import heapq
+import logging
+from typing import Tuple
+
+import numpy as np
+
+logger = logging.getLogger("kasparro")
+
+# elasticity bounds: b >= 1 would mean "no diminishing returns" and send everything to one segment
+MIN_ELASTICITY = 0.05
+MAX_ELASTICITY = 0.95
+
+
+def fit_response_curves(spend: np.ndarray, revenue: np.ndarray, min_points: int = 3) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Batched log-log OLS over (segment x day) matrices.
+    Returns (a, b, n_points). Segments with fewer than `min_points` usable days
+    (or no spread in spend) get the median elasticity of the fitted segments and
+    an `a` that reproduces their average revenue at their average spend.
+    """
+    ok = (spend > 0) & (revenue > 0)
+    n = ok.sum(axis=1)
+    x = np.where(ok, np.log(np.where(ok, spend, 1.0)), 0.0)
+    y = np.where(ok, np.log(np.where(ok, revenue, 1.0)), 0.0)
+    n_safe = np.maximum(n, 1)
+    x_mean = x.sum(axis=1) / n_safe
+    y_mean = y.sum(axis=1) / n_safe
+    xc = np.where(ok, x - x_mean[:, None], 0.0)
+    sxx = (xc * xc).sum(axis=1)
+    sxy = (xc * np.where(ok, y - y_mean[:, None], 0.0)).sum(axis=1)
+
+    fitted = (n >= min_points) & (sxx > 1e-12)
+    b = np.full(len(n), np.nan)
+    b[fitted] = sxy[fitted] / sxx[fitted]
+    fallback = float(np.median(np.clip(b[fitted], MIN_ELASTICITY, MAX_ELASTICITY))) if fitted.any() else 0.5
+    b = np.clip(np.where(fitted, b, fallback), MIN_ELASTICITY, MAX_ELASTICITY)
+
+    # intercept through the (log) means; segments without usable days earn nothing
+    a = np.where(n > 0, np.exp(y_mean - b * x_mean), 0.0)
+    return a, b, n
+
+
+def response(a: np.ndarray, b: np.ndarray, spend: np.ndarray) -> np.ndarray:
+    """Expected revenue a * spend ** b (0 at zero spend)."""
+    spend = np.asarray(spend, dtype=float)
+    return np.where(spend > 0, a * np.power(np.maximum(spend, 0.0), b), 0.0)
+
+
+def allocate_budget(a: np.ndarray, b: np.ndarray, budget: float, lower: np.ndarray, upper: np.ndarray,
+                    steps: int = 0) -> np.ndarray:
+    """
+    Greedy marginal-ROAS allocation of `budget` over segments.
+
+    Every segment starts at its lower bound; the remaining budget is handed out in
+    equal increments, each to the segment whose next increment earns the most
+    (a max-heap keyed on marginal revenue). With concave curves the greedy result
+    is optimal up to the increment size. `steps` defaults to 2 increments per segment
+    (at least 1,000).
+
+    If `budget` cannot cover the lower bounds, they are scaled down proportionally so the
+    allocation spends exactly `budget`. If it exceeds the upper bounds, every segment gets
+    its upper bound and the excess stays unallocated (budget - result.sum()).
+    """
+    lower = np.asarray(lower, dtype=float)
+    upper = np.maximum(np.asarray(upper, dtype=float), lower)
+    budget = max(float(budget), 0.0)
+    floor, cap = float(lower.sum()), float(upper.sum())
+    if budget < floor:
+        logger.warning("Budget %.2f is below the segments' minimum spend %.2f: minimums scaled by %.3f",
+                       budget, floor, budget / floor)
+        return lower * (budget / floor)
+    if budget > cap + 1e-9:
+        logger.warning("Budget %.2f exceeds the segments' maximum spend %.2f: %.2f left unallocated",
+                       budget, cap, budget - cap)
+        return upper.copy()
+    alloc = lower.copy()
+    remaining = budget - floor
+    if remaining <= 0:
+        return alloc
+    steps = steps or max(1_000, 2 * len(a))
+    delta = remaining / steps
+
+    # initial marginal gains, vectorized
+    nxt = np.minimum(alloc + delta, upper)
+    gains = response(a, b, nxt) - response(a, b, alloc)
+    heap = [(-g, i) for i, g in enumerate(gains.tolist()) if nxt[i] > alloc[i]]
+    heapq.heapify(heap)
+
+    # the loop works on plain Python floats: per-element NumPy calls would dominate
+    x, hi, aa, bb = alloc.tolist(), upper.tolist(), np.asarray(a, dtype=float).tolist(), np.asarray(b, dtype=float).tolist()
+    while remaining > 1e-9 and heap:
+        _, i = heapq.heappop(heap)
+        step = min(delta, hi[i] - x[i], remaining)
+        if step <= 0:
+            continue
+        x[i] += step
+        remaining -= step
+        if x[i] < hi[i]:
+            nxt_i = min(x[i] + delta, hi[i])
+            heapq.heappush(heap, (-aa[i] * (nxt_i ** bb[i] - x[i] ** bb[i]), i))
+    return np.asarray(x)
+
+
+def marginal_roas(a: np.ndarray, b: np.ndarray, spend: np.ndarray) -> np.ndarray:
+    """d revenue / d spend = a * b * spend ** (b - 1), 0 at zero spend."""
+    spend = np.asarray(spend, dtype=float)
+    safe = np.where(spend > 0, spend, 1.0)
+    return np.where(spend > 0, a * b * np.power(safe, b - 1.0), 0.0)
@@ -0,0 +1,140 @@
+# src/utils/charts.py
+"""
+Per-campaign ROAS/CTR trend charts for report.md.
+
+Charts are rendered in a process pool with the non-interactive Agg backend.
+Each chart is keyed by a hash of its input series; a manifest in the charts
+directory remembers the hash of every rendered chart, so only campaigns whose
+data changed since the last run are re-rendered.
+
+Usage:
+    from src.utils.charts import render_campaign_charts
+    charts = render_campaign_charts(df, "reports/charts")
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.utils.helpers import available_cores
+from src.utils.metrics import cache_event
+
+logger = logging.getLogger("kasparro")
+
+MANIFEST = "manifest.json"
+# bump when the chart layout changes so every chart is re-rendered once
+CHART_VERSION = "1"
+
+
+def _slug(name: str) -> str:
+    base = re.sub(r"[^a-z0-9]+", "_", str(name).lower()).strip("_")[:40] or "campaign"
+    return f"{base}_{hashlib.sha1(str(name).encode('utf-8')).hexdigest()[:8]}"
+
+
+def campaign_series(df: pd.DataFrame, campaign_col: str = "campaign_name") -> Dict[str, pd.DataFrame]:
+    """Daily ROAS and CTR per campaign, computed from summed base metrics."""
+    daily = (
+        df.groupby([campaign_col, "date"], sort=True)[["spend", "revenue", "clicks", "impressions"]]
+        .sum()
+        .reset_index()
+    )
+    daily["roas"] = (daily["revenue"] / daily["spend"].where(daily["spend"] > 0)).fillna(0.0)
+    daily["ctr"] = (daily["clicks"] / daily["impressions"].where(daily["impressions"] > 0)).fillna(0.0)
+    return {name: g[["date", "roas", "ctr"]].reset_index(drop=True) for name, g in daily.groupby(campaign_col, sort=False)}
+
+
+def series_hash(series: pd.DataFrame) -> str:
+    """Stable hash of a chart's input data (dates + values) and the chart version."""
+    h = hashlib.sha1(CHART_VERSION.encode("utf-8"))
+    h.update(series["date"].astype(str).str.cat(sep="|").encode("utf-8"))
+    h.update(series[["roas", "ctr"]].to_numpy(dtype="float64").tobytes())
+    return h.hexdigest()
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _render_one(job: Tuple[str, str, List[str], List[float], List[float]]) -> str:
+    """Render one chart (runs inside a pool worker). Returns the written path."""
+    campaign, path, dates, roas, ctr = job
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    x = pd.to_datetime(pd.Series(dates))
+    fig, ax1 = plt.subplots(figsize=(8, 3))
+    ax1.plot(x, roas, color="tab:blue", label="ROAS")
+    ax1.set_ylabel("ROAS", color="tab:blue")
+    ax2 = ax1.twinx()
+    ax2.plot(x, ctr, color="tab:orange", label="CTR")
+    ax2.set_ylabel("CTR", color="tab:orange")
+    ax1.set_title(str(campaign))
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    tmp = path + ".tmp.png"
+    fig.savefig(tmp, dpi=80)
+    plt.close(fig)
+    os.replace(tmp, path)
+    return path
+
+
+def render_campaign_charts(df: pd.DataFrame, out_dir: str, max_workers: Optional[int] = None,
+                           max_campaigns: Optional[int] = None, campaign_col: str = "campaign_name") -> List[Dict[str, Any]]:
+    """
+    Render (or reuse) one ROAS/CTR trend chart per campaign.
+    If `max_campaigns` is set, only the highest-spend campaigns get a chart.
+    Returns [{campaign, path, hash, rendered}], ordered by campaign spend (desc).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    manifest: Dict[str, Dict[str, str]] = {}
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as fh:
+                manifest = json.load(fh)
+        except Exception as e:
+            logger.warning("Ignoring unreadable chart manifest %s: %s", manifest_path, e)
+
+    order = df.groupby(campaign_col)["spend"].sum().sort_values(ascending=False).index.tolist()
+    if max_campaigns:
+        order = order[:max_campaigns]
+    series = campaign_series(df[df[campaign_col].isin(order)], campaign_col=campaign_col)
+
+    charts, jobs = [], []
+    for campaign in order:
+        s = series[campaign]
+        digest = series_hash(s)
+        path = os.path.join(out_dir, f"{_slug(campaign)}.png")
+        cached = manifest.get(str(campaign), {})
+        fresh = cached.get("hash") == digest and os.path.exists(path)
+        cache_event("charts", fresh)
+        if not fresh:
+            jobs.append((str(campaign), path, s["date"].astype(str).tolist(), s["roas"].tolist(), s["ctr"].tolist()))
+        charts.append({"campaign": str(campaign), "path": path, "hash": digest, "rendered": not fresh})
+
+    if jobs:
+        workers = max_workers or available_cores()
+        if workers == 1 or len(jobs) == 1:
+            for job in jobs:
+                _render_one(job)
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=_init_worker) as pool:
+                list(pool.map(_render_one, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+    for c in charts:
+        manifest[c["campaign"]] = {"hash": c["hash"], "file": os.path.basename(c["path"])}
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(tmp, manifest_path)
+
+    logger.info("Charts: %d rendered, %d reused", len(jobs), len(charts) - len(jobs))
+    return charts
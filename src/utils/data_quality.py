@@ -0,0 +1,318 @@
+# src/utils/data_quality.py
+"""
+Vectorized data-quality scan with row quarantine.
+
+All row rules are evaluated on arrays extracted once per frame/chunk and fused
+into one per-row bitmask (bit i = rule i violated). Rules whose action is
+"quarantine" remove the row from the analysis and append it (with the violated
+rule names) to a side CSV; "flag" rules are only counted. Rules whose columns
+were not loaded (e.g. under a column projection) are skipped and reported.
+
+Dates are parsed once, through the column dictionary (unique values only). With
+keep_dates=True the parse of the kept rows is handed on by dedupe() to the
+loaded frame, so later stages (frame_guard.parsed_dates) do not parse again.
+
+Duplicate (campaign, adset, date) rows are handled after the row rules:
+exact copies are dropped, conflicting copies are re-aggregated deterministically
+(base metrics summed, other columns taken from the first row in file order,
+ctr/roas recomputed). When chunks are summed to a grain as they stream in,
+drop_exact_duplicates removes the exact copies first, across chunks.
+
+Usage:
+    from src.utils.data_quality import DataQualityScanner
+    scanner = DataQualityScanner(quarantine_path="reports/quarantine.csv")
+    df = scanner.dedupe(scanner.scan_chunk(df, keep_dates=True))     # or scanner.scan_chunks(chunks)
+    scanner.summary()
+"""
+
+import os
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.utils.frame_guard import derived, dictionary
+from src.utils.helpers import account_output_path
+from src.utils.logger import logger
+from src.utils.prefix_sums import BASE_METRICS
+
+# rule -> (columns it needs, default action); missing_key also checks the loaded dedupe keys
+RULES: Dict[str, Any] = {
+    "missing_key": (["date"], "quarantine"),
+    "bad_date": (["date"], "quarantine"),
+    "negative_metric": ([], "quarantine"),
+    "clicks_gt_impressions": (["clicks", "impressions"], "quarantine"),
+    "purchases_gt_clicks": (["purchases", "clicks"], "flag"),
+    "missing_metric": ([], "flag"),
+    "ctr_inconsistent": (["ctr", "clicks", "impressions"], "flag"),
+    "roas_inconsistent": (["roas", "revenue", "spend"], "flag"),
+}
+RULE_SHIFT = {name: i for i, name in enumerate(RULES)}
+RULE_BITS = {name: 1 << i for name, i in RULE_SHIFT.items()}
+DEDUPE_KEYS = ["campaign_name", "adset_name", "date"]
+
+
+class DataQualityScanner:
+    """Accumulates per-rule violation counts over one frame or a stream of chunks."""
+
+    def __init__(self, actions: Optional[Dict[str, str]] = None, ratio_tolerance: float = 0.05,
+                 quarantine_path: Optional[str] = None, dedupe_keys: Sequence[str] = DEDUPE_KEYS):
+        self.actions = {name: action for name, (_, action) in RULES.items()}
+        self.actions.update(actions or {})
+        unknown = set(self.actions) - set(RULES)
+        if unknown:
+            raise ValueError(f"Unknown data quality rules: {sorted(unknown)}")
+        self.ratio_tolerance = float(ratio_tolerance)
+        self.quarantine_path = quarantine_path
+        self.dedupe_keys = list(dedupe_keys)
+        self.quarantine_bits = sum(RULE_BITS[r] for r, a in self.actions.items() if a == "quarantine")
+        self.counts = {name: 0 for name in RULES}
+        self.counts.update({"duplicate_exact": 0, "duplicate_key": 0})
+        self.skipped: List[str] = []
+        self.rows_scanned = 0
+        self.rows_quarantined = 0
+        self.seconds = 0.0
+        self._quarantine_started = False
+        # parsed dates of the rows returned by scans with keep_dates=True, in order (see dedupe)
+        self._kept_dates: List[np.ndarray] = []
+        self._kept_complete = True
+        # a stale side file from an earlier run would be mistaken for this run's quarantine
+        if quarantine_path and os.path.exists(quarantine_path):
+            os.remove(quarantine_path)
+
+    def _flags(self, chunk: pd.DataFrame) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """One pass: every rule's mask OR-ed into a per-row bitmask. Also returns the parsed dates."""
+        n = len(chunk)
+        flags = np.zeros(n, dtype=np.uint16)
+        cols = set(chunk.columns)
+        metrics = [m for m in BASE_METRICS if m in cols]
+        arr = {m: chunk[m].to_numpy(dtype=float, na_value=np.nan) for m in metrics}
+        for extra in ("ctr", "roas"):
+            if extra in cols:
+                arr[extra] = chunk[extra].to_numpy(dtype=float, na_value=np.nan)
+
+        def _set(rule: str, mask: np.ndarray) -> None:
+            # clean data violates nothing: skip the per-row shift / OR for rules that never fire
+            if mask.any():
+                flags[...] |= mask.astype(np.uint16) << RULE_SHIFT[rule]
+
+        dates = None
+        if "date" in cols:
+            # a few hundred distinct days: parse the dictionary, not every row
+            codes, uniques = dictionary(chunk, "date")
+            parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format="%Y-%m-%d", errors="coerce").to_numpy()
+            dates = parsed[codes] if len(parsed) else np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")
+            dates[codes < 0] = np.datetime64("NaT")
+            nat = np.isnat(dates)
+            if nat.any():
+                _set("missing_key", codes < 0)
+                _set("bad_date", nat & (codes >= 0))
+        for key in self.dedupe_keys:
+            if key != "date" and key in cols:
+                # dictionary codes are cached per frame and reused by dedupe() and the segment stages
+                _set("missing_key", dictionary(chunk, key)[0] < 0)
+        if metrics:
+            # column by column: a row-wise any() over a stacked copy costs more than the rules
+            negative = np.zeros(n, dtype=bool)
+            missing = np.zeros(n, dtype=bool)
+            with np.errstate(invalid="ignore"):
+                for m in metrics:
+                    negative |= arr[m] < 0
+                    missing |= np.isnan(arr[m])
+            _set("negative_metric", negative)
+            _set("missing_metric", missing)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if {"clicks", "impressions"} <= arr.keys():
+                _set("clicks_gt_impressions", arr["clicks"] > arr["impressions"])
+            if {"purchases", "clicks"} <= arr.keys():
+                _set("purchases_gt_clicks", arr["purchases"] > arr["clicks"])
+            tol = self.ratio_tolerance
+            if {"ctr", "clicks", "impressions"} <= arr.keys():
+                expected = arr["clicks"] / arr["impressions"]
+                _set("ctr_inconsistent", np.abs(arr["ctr"] - expected) > tol * np.abs(expected) + 1e-4)
+            if {"roas", "revenue", "spend"} <= arr.keys():
+                expected = arr["revenue"] / arr["spend"]
+                # ratio columns are rounded to 2 decimals in the source data
+                _set("roas_inconsistent", np.abs(arr["roas"] - expected) > tol * np.abs(expected) + 0.01)
+        return flags, dates
+
+    def _note_skipped(self, cols) -> None:
+        for rule, (needed, _) in RULES.items():
+            if rule not in self.skipped and any(c not in cols for c in needed):
+                self.skipped.append(rule)
+
+    def scan_chunk(self, chunk: pd.DataFrame, keep_dates: bool = False) -> pd.DataFrame:
+        """
+        Count violations in one chunk; return it without its quarantined rows.
+        keep_dates=True when the returned chunks are concatenated in order and passed
+        to dedupe(), which hands their parsed dates on to the result.
+        """
+        t0 = time.perf_counter()
+        try:
+            return self._scan(chunk, keep_dates)
+        finally:
+            self.seconds += time.perf_counter() - t0
+
+    def _scan(self, chunk: pd.DataFrame, keep_dates: bool) -> pd.DataFrame:
+        self._note_skipped(set(chunk.columns))
+        flags, dates = self._flags(chunk)
+        self.rows_scanned += len(chunk)
+        if flags.any():
+            for rule, bit in RULE_BITS.items():
+                self.counts[rule] += int(np.count_nonzero(flags & bit))
+        bad = (flags & self.quarantine_bits) != 0
+        if keep_dates and dates is not None:
+            kept = dates[~bad] if bad.any() else dates
+            # flagged-only bad dates stay in the frame; parsed_dates then parses them its own way
+            self._kept_complete &= not np.isnat(kept).any()
+            self._kept_dates.append(kept)
+        if not bad.any():
+            return chunk
+        self.rows_quarantined += int(bad.sum())
+        self._quarantine(chunk[bad], flags[bad])
+        return chunk[~bad]
+
+    def scan_chunks(self, chunks: Iterable[pd.DataFrame], keep_dates: bool = False) -> Iterator[pd.DataFrame]:
+        """Streaming variant: scan each chunk as it passes through."""
+        for chunk in chunks:
+            yield self.scan_chunk(chunk, keep_dates=keep_dates)
+
+    def drop_exact_duplicates(self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """
+        Streaming counterpart of dedupe()'s first step: drop rows identical to an earlier row
+        of any chunk, matched by 64-bit row hash. Run it before rows are summed to a grain
+        (memory governor's streaming mode), where a copy could no longer be told apart.
+        """
+        seen = _SeenHashes()
+        for chunk in chunks:
+            t0 = time.perf_counter()
+            hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+            keep = ~pd.Series(hashes).duplicated().to_numpy()
+            keep[keep] = seen.add(hashes[keep])
+            dropped = len(chunk) - int(keep.sum())
+            self.counts["duplicate_exact"] += dropped
+            self.seconds += time.perf_counter() - t0
+            yield chunk[keep] if dropped else chunk
+
+    def _quarantine(self, rows: pd.DataFrame, flags: np.ndarray) -> None:
+        if not self.quarantine_path:
+            return
+        rules = [";".join(r for r, bit in RULE_BITS.items() if f & bit) for f in flags.tolist()]
+        out = rows.assign(dq_rules=rules)
+        os.makedirs(os.path.dirname(self.quarantine_path) or ".", exist_ok=True)
+        out.to_csv(self.quarantine_path, mode="a" if self._quarantine_started else "w",
+                   header=not self._quarantine_started, index=False)
+        self._quarantine_started = True
+
+    def dedupe(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Drop exact duplicate rows and re-aggregate rows sharing a (campaign, adset, date) key.
+        Deterministic: groups keep the position and non-metric values of their first row.
+        If `df` is the concatenation of the chunks scanned with keep_dates=True, their
+        parsed dates are attached to the result (frame_guard.parsed_dates).
+        """
+        t0 = time.perf_counter()
+        dates = None
+        if self._kept_dates and self._kept_complete:
+            dates = np.concatenate(self._kept_dates)
+            if len(dates) != len(df):
+                dates = None
+        self._kept_dates, self._kept_complete = [], True
+        try:
+            out, rows = self._dedupe(df, dates)
+            if dates is not None:
+                kept = dates if rows is None else dates[rows]
+                derived(out, "dates:date", lambda: pd.Series(kept, index=out.index, name="date"))
+            return out
+        finally:
+            self.seconds += time.perf_counter() - t0
+
+    def _dedupe(self, df: pd.DataFrame, dates: Optional[np.ndarray] = None) -> Tuple[pd.DataFrame, Optional[np.ndarray]]:
+        """Returns the deduplicated frame and the input positions of its rows (None: unchanged)."""
+        keys = [k for k in self.dedupe_keys if k in df.columns]
+        if len(keys) != len(self.dedupe_keys) or df.empty:
+            return df, None
+        # integer key from the (cached, shared) dictionary codes instead of hashing strings
+        key = np.zeros(len(df), dtype=np.int64)
+        for k in keys:
+            if k == "date" and dates is not None:
+                # day numbers from the scan's parse stand in for the date dictionary
+                day = dates.astype("datetime64[D]").astype(np.int64)
+                codes, size = day - day.min(), int(day.max() - day.min()) + 1
+            else:
+                codes, uniques = dictionary(df, k)
+                size = len(uniques)
+            key = key * (size + 1) + (codes + 1)
+        # the usual answer is "no duplicates": a sort answers that for less than a hash table
+        ordered = np.sort(key)
+        if not (ordered[1:] == ordered[:-1]).any():
+            return df, None
+        dup_key = pd.Series(key).duplicated(keep=False).to_numpy()
+        exact = df.duplicated(keep="first").to_numpy()
+        self.counts["duplicate_exact"] += int(exact.sum())
+        rows = np.flatnonzero(~exact)
+        df = df[~exact]
+        dup_key = df.duplicated(keys, keep=False).to_numpy()
+        if not dup_key.any():
+            return df.reset_index(drop=True), rows
+
+        dups = df[dup_key]
+        metrics = [m for m in BASE_METRICS if m in df.columns]
+        # groups come out in first-occurrence order, matching drop_duplicates(keep="first")
+        merged = dups.drop_duplicates(keys, keep="first").reset_index(drop=True)
+        sums = dups.groupby(keys, sort=False, dropna=False)[metrics].sum(min_count=1)
+        for m in metrics:
+            merged[m] = sums[m].to_numpy()
+        if "ctr" in merged.columns and {"clicks", "impressions"} <= set(merged.columns):
+            merged["ctr"] = (merged["clicks"] / merged["impressions"].where(merged["impressions"] > 0)).round(4)
+        if "roas" in merged.columns and {"revenue", "spend"} <= set(merged.columns):
+            merged["roas"] = (merged["revenue"] / merged["spend"].where(merged["spend"] > 0)).round(2)
+        self.counts["duplicate_key"] += int(dup_key.sum() - len(merged))
+
+        # put each merged row where its group's first row was
+        first_pos = np.flatnonzero(dup_key)[~dups.duplicated(keys, keep="first").to_numpy()]
+        order = np.concatenate([np.flatnonzero(~dup_key), first_pos])
+        out = pd.concat([df[~dup_key], merged], ignore_index=True)
+        return out.iloc[np.argsort(order, kind="stable")].reset_index(drop=True), rows[np.sort(order)]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "rows_scanned": self.rows_scanned,
+            "rows_quarantined": self.rows_quarantined,
+            "seconds": self.seconds,
+            "violations": dict(self.counts),
+            "actions": {**self.actions, "duplicate_exact": "drop", "duplicate_key": "re-aggregate"},
+            "skipped_rules": list(self.skipped),
+            "quarantine_file": self.quarantine_path if self._quarantine_started else None,
+        }
+
+
+class _SeenHashes:
+    """Set of uint64 hashes kept as a few sorted arrays merged by size (8 bytes per row, O(n log n))."""
+
+    def __init__(self):
+        self.levels: List[np.ndarray] = []
+
+    def add(self, hashes: np.ndarray) -> np.ndarray:
+        """Add distinct `hashes`; returns the mask of those not seen before."""
+        new = np.ones(len(hashes), dtype=bool)
+        for level in self.levels:
+            pos = np.minimum(np.searchsorted(level, hashes), len(level) - 1)
+            new &= level[pos] != hashes
+        added = np.sort(hashes[new])
+        while self.levels and len(self.levels[-1]) <= len(added):
+            added = np.union1d(self.levels.pop(), added)
+        self.levels.append(added)
+        return new
+
+
+def scanner_from_config(cfg: Dict[str, Any], out_dir: Optional[str] = None) -> Optional[DataQualityScanner]:
+    """Build the configured scanner (None when the stage is disabled)."""
+    dq = cfg.get("data_quality", {})
+    if not dq.get("enabled", False):
+        return None
+    path = account_output_path(cfg, dq.get("quarantine_file", "reports/quarantine.csv"), out_dir)
+    logger.info("Data quality scan enabled; quarantine file: %s", path)
+    return DataQualityScanner(actions=dq.get("rules"), ratio_tolerance=dq.get("ratio_tolerance", 0.05),
+                              quarantine_path=path)
@@ -0,0 +1,220 @@
+# src/utils/date_index.py
+"""
+Sidecar date offset index for date-ordered CSV files.
+
+For a file sorted by date the index maps every date to the byte range (and row
+range) holding its rows, so a date-range query reads only that slice of the file.
+Unsorted files (or files with multi-line records) are indexed as not seekable and
+date-range reads fall back to a chunked full scan with the filter applied per chunk;
+so are compressed files, which are scanned as decompressed streams.
+
+The index lives next to the data file (<file>.dateidx.json) and is rebuilt
+automatically whenever the file fingerprint changes.
+
+Usage:
+    from src.utils.date_index import read_date_range
+    df = read_date_range("data/ads.csv", "2025-03-01", "2025-03-31", columns=["date", "spend"])
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+import re
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from src.utils.helpers import file_fingerprint
+from src.utils.ingest import head, is_plain_csv, iter_csv, iter_lines
+from src.utils.metrics import cache_event
+
+logger = logging.getLogger("kasparro")
+
+INDEX_SUFFIX = ".dateidx.json"
+INDEX_VERSION = 1
+ISO_DATE = re.compile(rb"^\d{4}-\d{2}-\d{2}")
+
+
+def index_path(path: str) -> str:
+    return str(path) + INDEX_SUFFIX
+
+
+def _date_field(line: bytes, pos: int) -> Optional[bytes]:
+    """Extract the date field of one CSV line; fast split unless quotes precede it."""
+    parts = line.split(b",", pos + 1)
+    if len(parts) > pos and b'"' not in b",".join(parts[:pos]):
+        return parts[pos].strip().strip(b'"')
+    try:
+        row = next(csv.reader([line.decode("utf-8")]))
+        return row[pos].encode("utf-8") if len(row) > pos else None
+    except Exception:
+        return None
+
+
+def build_date_index(path: str, date_col: str = "date") -> Dict[str, Any]:
+    """
+    Scan the file once (line by line, no parsing of other fields) and build the index.
+    dates: {date: [start_byte, end_byte, first_row, n_rows]} - only kept when the file is seekable.
+    """
+    dates: Dict[str, List[int]] = {}
+    # compressed parts are scanned for bounds and row counts but can never be sliced by offset
+    seekable = is_plain_csv(path)
+    min_date = max_date = None
+    prev = None
+
+    lines = iter_lines(path)
+    header = next(lines, b"")
+    columns = next(csv.reader([header.decode("utf-8-sig")]))
+    if date_col not in columns:
+        raise ValueError(f"Date column '{date_col}' not found in {path}")
+    pos = columns.index(date_col)
+
+    offset = len(header)
+    row = 0
+    for line in lines:
+        start = offset
+        offset += len(line)
+        if not line.strip():
+            continue
+        # an odd number of quotes means a record spans several lines: offsets are unusable
+        if line.count(b'"') % 2:
+            seekable = False
+        value = _date_field(line, pos)
+        if value is None or not ISO_DATE.match(value):
+            seekable = False
+            row += 1
+            continue
+        key = value[:10].decode("ascii")
+        min_date = key if min_date is None or key < min_date else min_date
+        max_date = key if max_date is None or key > max_date else max_date
+        if prev is not None and key < prev:
+            seekable = False
+        prev = key
+        if seekable:
+            entry = dates.get(key)
+            if entry is None:
+                dates[key] = [start, offset, row, 1]
+            else:
+                entry[1] = offset
+                entry[3] += 1
+        row += 1
+
+    return {
+        "version": INDEX_VERSION,
+        "fingerprint": file_fingerprint(path),
+        "date_col": date_col,
+        "header_bytes": len(header),
+        "rows": row,
+        "seekable": seekable,
+        "min_date": min_date,
+        "max_date": max_date,
+        "dates": dates if seekable else {},
+    }
+
+
+def load_or_build_index(path: str, date_col: str = "date") -> Dict[str, Any]:
+    """Return the sidecar index for `path`, rebuilding it if missing or stale."""
+    ip = index_path(path)
+    if os.path.exists(ip):
+        try:
+            with open(ip, "r", encoding="utf-8") as fh:
+                idx = json.load(fh)
+            if (idx.get("version") == INDEX_VERSION and idx.get("date_col") == date_col
+                    and idx.get("fingerprint") == file_fingerprint(path)):
+                cache_event("date_index", True)
+                return idx
+        except Exception as e:
+            logger.warning("Ignoring unreadable date index %s: %s", ip, e)
+
+    cache_event("date_index", False)
+    logger.info("Building date index for %s", path)
+    idx = build_date_index(path, date_col=date_col)
+    try:
+        tmp = ip + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(idx, fh)
+        os.replace(tmp, ip)
+    except OSError as e:
+        # read-only data dirs still work, the index just is not cached
+        logger.warning("Could not write date index %s: %s", ip, e)
+    return idx
+
+
+class _SliceReader(io.RawIOBase):
+    """Read-only stream of `header` followed by `length` bytes of `fh` starting at `offset`."""
+
+    def __init__(self, fh, header: bytes, offset: int, length: int):
+        self._fh = fh
+        self._header = memoryview(header)
+        self._remaining = length
+        fh.seek(offset)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buf) -> int:
+        if len(self._header):
+            n = min(len(buf), len(self._header))
+            buf[:n] = self._header[:n]
+            self._header = self._header[n:]
+            return n
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(buf)[:min(len(buf), self._remaining)]
+        n = self._fh.readinto(view)
+        self._remaining -= n or 0
+        return n or 0
+
+
+def iter_date_range(path: str, start: Optional[str], end: Optional[str], columns: Optional[List[str]] = None,
+                    date_col: str = "date", chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+    """
+    Yield chunks holding only the rows with start <= date <= end (ISO date strings,
+    inclusive; None = open). Seeks straight to the byte slice for sorted files,
+    otherwise scans the file in chunks and filters each one.
+    """
+    idx = load_or_build_index(path, date_col=date_col)
+    usecols = None
+    if columns is not None:
+        usecols = list(columns) if date_col in columns else list(columns) + [date_col]
+    drop = [date_col] if columns is not None and date_col not in columns else []
+
+    if idx["seekable"] and idx["dates"]:
+        keys = sorted(idx["dates"])
+        lo = bisect_left(keys, start) if start else 0
+        hi = bisect_right(keys, end) if end else len(keys)
+        with open(path, "rb") as fh:
+            header = fh.read(idx["header_bytes"])
+            if lo >= hi:
+                offset = length = 0
+            else:
+                first, last = idx["dates"][keys[lo]], idx["dates"][keys[hi - 1]]
+                offset, length = first[0], last[1] - first[0]
+            # the slice is streamed to the parser: only one chunk of it is ever held
+            reader = io.BufferedReader(_SliceReader(fh, header, offset, length))
+            for chunk in pd.read_csv(reader, usecols=usecols, chunksize=chunksize):
+                yield chunk.drop(columns=drop)
+        return
+
+    logger.info("Date index for %s is not seekable; scanning in chunks", path)
+    for chunk in iter_csv(path, usecols=usecols, chunksize=chunksize):
+        d = chunk[date_col].astype(str).str[:10]
+        mask = pd.Series(True, index=chunk.index)
+        if start:
+            mask &= d >= start
+        if end:
+            mask &= d <= end
+        yield chunk[mask].drop(columns=drop)
+
+
+def read_date_range(path: str, start: Optional[str], end: Optional[str], columns: Optional[List[str]] = None,
+                    date_col: str = "date", chunksize: int = 100_000) -> pd.DataFrame:
+    """Read only the rows with start <= date <= end into one frame (see iter_date_range)."""
+    parts = list(iter_date_range(path, start, end, columns=columns, date_col=date_col, chunksize=chunksize))
+    if not parts:
+        df = head(path, 0)
+        return df[columns] if columns is not None else df
+    return pd.concat(parts, ignore_index=True)
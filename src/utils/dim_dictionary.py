@@ -0,0 +1,173 @@
+# src/utils/dim_dictionary.py
+"""
+Sidecar dictionary of known dimension values, matched against query text.
+
+The distinct values of the filterable dimensions (campaign, platform, country,
+audience) are collected once per data file and stored next to it
+(<file>.dimdict.json, rebuilt whenever the file fingerprint changes). Values are
+normalized to lowercase alphanumeric token tuples, so spelling variants such as
+"Men_ComfortMax_Launch" and "men  comfortmax launch" share one key, and indexed
+by their full token tuple and by their leading token prefixes (2+ tokens).
+Matching a query is a greedy longest-n-gram scan with one hash lookup per
+candidate n-gram: cost depends on the query length, not on the number of values.
+
+Usage:
+    from src.utils.dim_dictionary import load_or_build_dictionary
+    dims = load_or_build_dictionary("data/ads.csv", ["campaign_name", "platform", "country"])
+    dims.filters("ROAS for Men ComfortMax on Instagram in US")
+    # {"campaign_name": ["Men ComfortMax Launch", ...], "platform": ["Instagram"], "country": ["US"]}
+"""
+
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.utils.helpers import file_fingerprint
+from src.utils.ingest import expand_parts, head, iter_csv
+from src.utils.metrics import cache_event
+
+logger = logging.getLogger("kasparro")
+
+DICT_SUFFIX = ".dimdict.json"
+DICT_VERSION = 1
+DEFAULT_DIMS = ["campaign_name", "platform", "country", "audience_type"]
+_TOKEN = re.compile(r"[A-Za-z0-9]+")
+# values this short (e.g. country codes) only match when written in capitals ("US", not "us")
+SHORT_CODE_LEN = 3
+
+
+def normalize(text: Any) -> Tuple[str, ...]:
+    return tuple(t.lower() for t in _TOKEN.findall(str(text)))
+
+
+class DimensionDictionary:
+    """In-memory n-gram index over known dimension values."""
+
+    def __init__(self, values: Dict[str, List[str]], min_prefix_tokens: int = 2):
+        self.values = values
+        self.exact: Dict[Tuple[str, ...], Tuple[str, List[str]]] = {}
+        self.prefix: Dict[Tuple[str, ...], Tuple[str, List[str]]] = {}
+        self.max_ngram = 1
+        # earlier dims win when one phrase names values of several dims
+        for dim, vals in values.items():
+            for v in vals:
+                key = normalize(v)
+                if not key:
+                    continue
+                self.max_ngram = max(self.max_ngram, len(key))
+                self._add(self.exact, key, dim, v)
+                for k in range(min_prefix_tokens, len(key)):
+                    self._add(self.prefix, key[:k], dim, v)
+
+    @staticmethod
+    def _add(index: Dict, key: Tuple[str, ...], dim: str, value: str) -> None:
+        entry = index.get(key)
+        if entry is None:
+            index[key] = (dim, [value])
+        elif entry[0] == dim:
+            entry[1].append(value)
+
+    def match(self, text: str) -> List[Dict[str, Any]]:
+        """Greedy longest matches, left to right: [{"text", "dim", "values", "exact"}]."""
+        raw = _TOKEN.findall(text)
+        tokens = [t.lower() for t in raw]
+        out = []
+        i, n = 0, len(tokens)
+        while i < n:
+            for k in range(min(self.max_ngram, n - i), 0, -1):
+                key = tuple(tokens[i:i + k])
+                entry = self.exact.get(key)
+                exact = entry is not None
+                if entry is None:
+                    entry = self.prefix.get(key)
+                if entry is None:
+                    continue
+                if k == 1 and len(key[0]) <= SHORT_CODE_LEN and not raw[i].isupper():
+                    continue
+                out.append({"text": " ".join(raw[i:i + k]), "dim": entry[0], "values": list(entry[1]), "exact": exact})
+                i += k
+                break
+            else:
+                i += 1
+        return out
+
+    def filters(self, text: str) -> Dict[str, List[str]]:
+        """Row filters named by `text` (see filters_from_matches)."""
+        return filters_from_matches(self.match(text))
+
+
+def filters_from_matches(matches: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """{dim: matched raw values}; values of one dim are alternatives, dims are combined."""
+    out: Dict[str, List[str]] = {}
+    for m in matches:
+        vals = out.setdefault(m["dim"], [])
+        vals.extend(v for v in m["values"] if v not in vals)
+    return out
+
+
+def dictionary_path(path: str) -> str:
+    return str(path) + DICT_SUFFIX
+
+
+def build_dictionary(path: str, dims: Sequence[str] = DEFAULT_DIMS, chunksize: int = 100_000) -> Dict[str, Any]:
+    """Scan the dimension columns once (chunked) and collect their distinct values."""
+    header = head(path, 0).columns
+    present = [d for d in dims if d in header]
+    seen: Dict[str, set] = {d: set() for d in present}
+    if present:
+        for chunk in iter_csv(path, usecols=present, chunksize=chunksize, dtype=str):
+            for d in present:
+                seen[d].update(chunk[d].dropna().unique().tolist())
+    return {
+        "version": DICT_VERSION,
+        "fingerprint": file_fingerprint(path),
+        "dims": list(dims),  # requested; dims missing from the file simply have no values
+        "values": {d: sorted(v) for d, v in seen.items()},
+    }
+
+
+def _load_or_build_values(path: str, dims: List[str]) -> Dict[str, List[str]]:
+    """Known values of one data file, from its sidecar when fresh, rebuilt otherwise."""
+    dp = dictionary_path(path)
+    if os.path.exists(dp):
+        try:
+            with open(dp, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+            if (data.get("version") == DICT_VERSION and data.get("fingerprint") == file_fingerprint(path)
+                    and set(dims) <= set(data.get("dims", []))):
+                cache_event("dim_dictionary", True)
+                return data["values"]
+        except Exception as e:
+            logger.warning("Ignoring unreadable dimension dictionary %s: %s", dp, e)
+
+    cache_event("dim_dictionary", False)
+    logger.info("Building dimension dictionary for %s", path)
+    data = build_dictionary(path, dims)
+    try:
+        tmp = dp + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(data, fh)
+        os.replace(tmp, dp)
+    except OSError as e:
+        # read-only data dirs still work, the dictionary just is not cached
+        logger.warning("Could not write dimension dictionary %s: %s", dp, e)
+    return data["values"]
+
+
+def load_or_build_dictionary(path: str, dims: Optional[Sequence[str]] = None) -> DimensionDictionary:
+    """
+    The dimension dictionary of `path` (a file or a glob of part files). Every part keeps
+    its own sidecar, so a new part only scans itself; the parts' values are merged.
+    """
+    dims = list(dims or DEFAULT_DIMS)
+    parts = expand_parts(path)
+    if len(parts) == 1:
+        values = _load_or_build_values(parts[0], dims)
+        return DimensionDictionary({d: values[d] for d in dims if d in values})
+    merged: Dict[str, set] = {}
+    for part in parts:
+        for d, vals in _load_or_build_values(part, dims).items():
+            merged.setdefault(d, set()).update(vals)
+    return DimensionDictionary({d: sorted(merged[d]) for d in dims if d in merged})
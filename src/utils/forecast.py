@@ -0,0 +1,142 @@
+# src/utils/forecast.py
+"""
+Batched time-series forecasting over a (segment x day) matrix.
+
+Every model is fitted to all series at once: the linear trend is a closed-form
+least-squares fit on the shared day axis, Holt's exponential smoothing is a
+recursion over days with every series updated in one vectorized step. Cost is
+O(n_series * n_days) NumPy work with a Python loop over days only.
+
+Usage:
+    from src.utils.forecast import segment_matrix, fit_linear_trend, fit_holt
+    segments, days, Y = segment_matrix(df, ["campaign_name"], ["spend", "revenue"])
+    fc = fit_holt(Y["revenue"], horizon=7)    # {"point", "lower", "upper"}: (n_series, horizon)
+"""
+
+from statistics import NormalDist
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.utils.frame_guard import factorized, parsed_dates
+
+
+def segment_matrix(df: pd.DataFrame, dims: Sequence[str], metrics: Sequence[str],
+                   date_col: str = "date") -> Tuple[pd.DataFrame, pd.DatetimeIndex, Dict[str, np.ndarray]]:
+    """
+    Daily totals per segment as dense matrices.
+    Returns (segments, days, {metric: array (n_segments, n_days)}); days without
+    rows are 0. `segments` holds one row of dimension values per matrix row.
+    Rows with a missing dimension value are left out.
+    """
+    dates = parsed_dates(df, date_col)
+    start = dates.min()
+    day = ((dates - start).dt.days).to_numpy(dtype=np.int64)
+    n_days = int(day.max()) + 1 if len(day) else 0
+
+    key = np.zeros(len(df), dtype=np.int64)
+    valid = np.ones(len(df), dtype=bool)
+    labels = []
+    for d in dims:
+        codes, uniq = factorized(df, d)
+        valid &= codes >= 0
+        key = key * (len(uniq) + 1) + codes
+        labels.append((codes, uniq))
+    seg_keys, seg = np.unique(key[valid], return_inverse=True)
+    seg = seg.ravel()
+    n_seg = len(seg_keys)
+
+    first = np.zeros(n_seg, dtype=np.int64)
+    first[seg[::-1]] = np.flatnonzero(valid)[::-1]  # any row of each segment, to read its labels
+    segments = pd.DataFrame({d: np.asarray(uniq)[codes[first]] for d, (codes, uniq) in zip(dims, labels)})
+
+    flat = seg * n_days + day[valid]
+    matrices = {}
+    for m in metrics:
+        values = df[m].fillna(0).to_numpy(dtype=float)[valid]
+        matrices[m] = np.bincount(flat, weights=values, minlength=n_seg * n_days).reshape(n_seg, n_days)
+    return segments, pd.date_range(start, periods=n_days, freq="D"), matrices
+
+
+def _z(interval: float) -> float:
+    return NormalDist().inv_cdf(0.5 + interval / 2.0)
+
+
+def fit_linear_trend(Y: np.ndarray, horizon: int, interval: float = 0.9) -> Dict[str, np.ndarray]:
+    """
+    OLS line per series (rows of Y) on the shared day axis, closed form:
+        slope = sum((x - x̄)(y - ȳ)) / Sxx,  intercept = ȳ - slope x̄
+    Prediction intervals use the standard OLS formula s * sqrt(1 + 1/T + (x0 - x̄)² / Sxx).
+    """
+    n, T = Y.shape
+    x = np.arange(T, dtype=float)
+    xc = x - x.mean()
+    sxx = float(xc @ xc) or 1.0
+    y_mean = Y.mean(axis=1)
+    slope = ((Y - y_mean[:, None]) @ xc) / sxx
+    intercept = y_mean - slope * x.mean()
+    resid = Y - (intercept[:, None] + slope[:, None] * x)
+    s = np.sqrt((resid ** 2).sum(axis=1) / max(T - 2, 1))
+
+    x0 = np.arange(T, T + horizon, dtype=float)
+    point = intercept[:, None] + slope[:, None] * x0
+    half = _z(interval) * s[:, None] * np.sqrt(1.0 + 1.0 / T + (x0 - x.mean()) ** 2 / sxx)
+    return {"point": point, "lower": point - half, "upper": point + half, "slope": slope}
+
+
+def fit_holt(Y: np.ndarray, horizon: int, alpha: float = 0.3, beta: float = 0.1,
+             interval: float = 0.9) -> Dict[str, np.ndarray]:
+    """
+    Holt's linear exponential smoothing for every series at once:
+        level_t = alpha * y_t + (1 - alpha) * (level_{t-1} + trend_{t-1})
+        trend_t = beta * (level_t - level_{t-1}) + (1 - beta) * trend_{t-1}
+    Intervals come from the one-step-ahead error variance,
+        var_h = sigma² * (1 + sum_{j<h} alpha² (1 + j beta)²).
+    """
+    n, T = Y.shape
+    level = Y[:, 0].astype(float).copy()
+    trend = (Y[:, 1] - Y[:, 0]).astype(float) if T > 1 else np.zeros(n)
+    sq_err = np.zeros(n)
+    for t in range(1, T):
+        predicted = level + trend
+        err = Y[:, t] - predicted
+        sq_err += err * err
+        new_level = predicted + alpha * err
+        trend = beta * (new_level - level) + (1.0 - beta) * trend
+        level = new_level
+    sigma = np.sqrt(sq_err / max(T - 1, 1))
+
+    h = np.arange(1, horizon + 1, dtype=float)
+    point = level[:, None] + h * trend[:, None]
+    j = np.arange(horizon, dtype=float)
+    var_factor = 1.0 + np.concatenate([[0.0], np.cumsum(alpha ** 2 * (1.0 + j[1:] * beta) ** 2)])
+    half = _z(interval) * sigma[:, None] * np.sqrt(var_factor)
+    return {"point": point, "lower": point - half, "upper": point + half, "slope": trend}
+
+
+MODELS = {"linear": fit_linear_trend, "holt": fit_holt}
+
+
+def forecast_totals(Y: np.ndarray, horizon: int, method: str = "holt", interval: float = 0.9,
+                    **params) -> Dict[str, np.ndarray]:
+    """
+    Next-`horizon`-day total per series with an interval. Daily forecasts are
+    floored at 0; the total's interval sums the daily bounds (errors treated as
+    fully correlated, i.e. conservative).
+    """
+    if method not in MODELS:
+        raise ValueError(f"Unknown forecast method: {method} (expected one of {sorted(MODELS)})")
+    fit = MODELS[method](Y, horizon, interval=interval, **params)
+    return {
+        "point": np.clip(fit["point"], 0, None).sum(axis=1),
+        "lower": np.clip(fit["lower"], 0, None).sum(axis=1),
+        "upper": np.clip(fit["upper"], 0, None).sum(axis=1),
+        "slope": fit["slope"],
+    }
+
+
+def active_days(Y: np.ndarray) -> np.ndarray:
+    """Number of days with a non-zero value, per series."""
+    return (Y != 0).sum(axis=1)
+
@@ -0,0 +1,177 @@
+# src/utils/frame_guard.py
+"""
+Read-only handling of shared input frames.
+
+Agents treat their input DataFrames as read-only so several analyses (threads)
+can share one in-memory frame without defensive copies. Derived columns are
+computed lazily into separate arrays and cached per frame instead of being
+assigned back into the frame.
+
+- derived(df, key, fn): thread-safe per-frame cache of derived Series/arrays
+- parsed_dates(df): the date column parsed once, never written back
+- dictionary(df, col): dictionary codes of a column in first-seen order, computed once
+- factorized(df, col): the same codes renumbered in sorted order, computed once
+- readonly(df): guard that raises FrameMutationError if the frame is mutated
+- guard_inputs: decorator applying readonly() to DataFrame args when
+  KASPARRO_READONLY_GUARD=1 (used in tests; zero cost otherwise)
+
+Usage:
+    with readonly(df):
+        InsightAgent(cfg).analyze(df)
+"""
+
+import functools
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.utils.metrics import cache_event
+
+GUARD_ENV = "KASPARRO_READONLY_GUARD"
+
+
+class FrameMutationError(RuntimeError):
+    """Raised when a frame under a read-only guard was modified."""
+
+
+_cache_lock = threading.Lock()
+_cache: Dict[int, Dict[str, Any]] = {}
+
+
+def _evict(frame_id: int) -> None:
+    with _cache_lock:
+        _cache.pop(frame_id, None)
+
+
+def derived(df: pd.DataFrame, key: str, fn: Callable[[], Any]) -> Any:
+    """
+    Return fn() computed once per (frame, key) and cached for the frame's lifetime.
+    The result is stored next to the frame, never inside it.
+    """
+    fid = id(df)
+    with _cache_lock:
+        entry = _cache.get(fid)
+        if entry is not None and key in entry:
+            hit = entry[key]
+            cache_event("frame_derived", True)
+            return hit
+    cache_event("frame_derived", False)
+    value = fn()
+    with _cache_lock:
+        entry = _cache.get(fid)
+        if entry is None:
+            entry = _cache[fid] = {}
+            weakref.finalize(df, _evict, fid)
+        return entry.setdefault(key, value)
+
+
+def parsed_dates(df: pd.DataFrame, col: str = "date") -> pd.Series:
+    """The date column as datetime64, parsed once per frame (the frame itself is untouched)."""
+    return derived(df, f"dates:{col}", lambda: pd.to_datetime(df[col]))
+
+
+def dictionary(df: pd.DataFrame, col: str) -> Tuple[np.ndarray, np.ndarray]:
+    """pd.factorize(df[col]) (first-seen order, the cheap one), computed once per frame."""
+    return derived(df, f"dict:{col}", lambda: pd.factorize(df[col].to_numpy()))
+
+
+def factorized(df: pd.DataFrame, col: str) -> Tuple[np.ndarray, pd.Index]:
+    """pd.factorize(df[col], sort=True), computed once per frame and shared by every stage."""
+    return derived(df, f"codes:{col}", lambda: _sorted_dictionary(df, col))
+
+
+def _sorted_dictionary(df: pd.DataFrame, col: str) -> Tuple[np.ndarray, pd.Index]:
+    # sorting the (few) dictionary values and renumbering the codes is cheaper than a sorted
+    # factorize of the column, and reuses the first-seen dictionary when a scan already built it
+    codes, uniques = dictionary(df, col)
+    try:
+        order = np.argsort(uniques, kind="stable")
+    except TypeError:  # mixed types: leave the ordering to pandas
+        return pd.factorize(df[col], sort=True)
+    rank = np.empty(len(order) + 1, dtype=np.intp)
+    rank[order] = np.arange(len(order))
+    rank[-1] = -1  # missing values keep code -1
+    return rank[codes], pd.Index(uniques[order])
+
+
+def _signature(df: pd.DataFrame) -> Tuple:
+    return (
+        tuple(df.columns),
+        tuple(str(t) for t in df.dtypes),
+        df.shape,
+        int(pd.util.hash_pandas_object(df, index=True).sum()),
+    )
+
+
+_guard_lock = threading.Lock()
+_guards: Dict[int, Dict[str, Any]] = {}
+
+
+@contextmanager
+def readonly(df: pd.DataFrame) -> Iterator[pd.DataFrame]:
+    """
+    Guard a frame against mutation for the duration of the block.
+    In-place writes to existing arrays raise immediately (arrays are made non-writeable);
+    structural changes (new/replaced columns) are detected on exit. Nested and
+    concurrent guards on the same frame are reference-counted.
+    """
+    fid = id(df)
+    with _guard_lock:
+        state = _guards.get(fid)
+        if state is None:
+            # signature first: hashing may consolidate blocks, which replaces their arrays
+            signature = _signature(df)
+            arrays = [blk.values for blk in df._mgr.blocks if hasattr(blk.values, "flags")]
+            # cached column Series hold views created earlier, which keep their own (writeable) flags
+            if hasattr(df, "_clear_item_cache"):
+                df._clear_item_cache()
+            state = _guards[fid] = {
+                "count": 0,
+                "signature": signature,
+                "arrays": [(a, a.flags.writeable) for a in arrays],
+            }
+            for a, _ in state["arrays"]:
+                a.flags.writeable = False
+        state["count"] += 1
+    try:
+        yield df
+    finally:
+        with _guard_lock:
+            state["count"] -= 1
+            last = state["count"] == 0
+            if last:
+                _guards.pop(fid, None)
+                for a, writeable in state["arrays"]:
+                    try:
+                        a.flags.writeable = writeable
+                    except ValueError:
+                        pass
+        if last and _signature(df) != state["signature"]:
+            raise FrameMutationError("DataFrame was modified inside a read-only section")
+
+
+def guard_inputs(fn: Callable) -> Callable:
+    """Apply readonly() to every DataFrame argument when KASPARRO_READONLY_GUARD=1."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if os.environ.get(GUARD_ENV) != "1":
+            return fn(*args, **kwargs)
+        frames = [a for a in list(args) + list(kwargs.values()) if isinstance(a, pd.DataFrame)]
+        with _nested(frames):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def _nested(frames):
+    if not frames:
+        yield
+        return
+    with readonly(frames[0]):
+        with _nested(frames[1:]):
+            yield
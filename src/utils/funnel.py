@@ -0,0 +1,97 @@
+# src/utils/funnel.py
+"""
+Multiplicative funnel decomposition of ROAS.
+
+From the five base sums, ROAS factors exactly into four funnel ratios:
+    ROAS = revenue / spend
+         = CTR * CVR * AOV / CPM * 1000
+    CTR = clicks / impressions,  CVR = purchases / clicks,
+    AOV = revenue / purchases,   CPM = spend / impressions * 1000
+so the log change of ROAS between two windows is the exact sum of the factors'
+log changes (CPM enters with a negative sign: costlier impressions lower ROAS).
+Each factor's contribution is its signed log change; the dominant driver is the
+factor with the largest absolute contribution.
+
+Because the contributions add up to the ROAS change by construction, they are no
+evidence on their own: change_noise measures each factor's day-to-day noise in
+the segment, so a driver can be checked against it.
+
+Usage:
+    from src.utils.funnel import decompose_log_change, FACTORS
+    out = decompose_log_change(recent_sums, previous_sums)    # dicts of base-metric arrays
+    out["contributions"][:, FACTORS.index("cvr")]             # log-points per segment
+    se = change_noise(daily, keys=["campaign_name"])          # per-day sums -> (segments x factors)
+"""
+
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+FACTORS = ("ctr", "cvr", "aov", "cpm")
+# +1: factor rising raises ROAS, -1: factor rising lowers it
+FACTOR_SIGNS = np.array([1.0, 1.0, 1.0, -1.0])
+FACTOR_LABELS = {
+    "ctr": "click-through rate (CTR)",
+    "cvr": "conversion rate (CVR)",
+    "aov": "average order value (AOV)",
+    "cpm": "cost per 1000 impressions (CPM)",
+}
+
+
+def funnel_factors(sums: Dict[str, np.ndarray]) -> np.ndarray:
+    """(n_segments, 4) matrix of CTR, CVR, AOV, CPM; NaN where a denominator is 0."""
+    num = np.column_stack([sums["clicks"], sums["purchases"], sums["revenue"], sums["spend"] * 1000.0]).astype(float)
+    den = np.column_stack([sums["impressions"], sums["clicks"], sums["purchases"], sums["impressions"]]).astype(float)
+    return np.divide(num, den, out=np.full(num.shape, np.nan), where=den > 0)
+
+
+def decompose_log_change(recent: Dict[str, np.ndarray], previous: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Decompose the recent-vs-previous ROAS change of every segment at once.
+    Returns arrays over segments:
+      contributions (n, 4)  signed log change of each factor (sums to log_change)
+      log_change            log(recent ROAS / previous ROAS)
+      roas_change_pct       the same change as a percentage
+      dominant              index into FACTORS of the largest |contribution| (-1 if undefined)
+      share                 |dominant contribution| / sum of |contributions|
+      valid                 every factor is positive in both windows
+    """
+    f_recent = funnel_factors(recent)
+    f_previous = funnel_factors(previous)
+    valid = ((f_recent > 0) & (f_previous > 0)).all(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        contributions = FACTOR_SIGNS * (np.log(f_recent) - np.log(f_previous))
+    contributions[~valid] = np.nan
+
+    log_change = contributions.sum(axis=1)
+    magnitude = np.abs(np.where(valid[:, None], contributions, 0.0))
+    dominant = np.where(valid, magnitude.argmax(axis=1), -1)
+    total = magnitude.sum(axis=1)
+    share = np.divide(magnitude.max(axis=1), total, out=np.zeros(len(total)), where=total > 0)
+    return {
+        "contributions": contributions,
+        "log_change": log_change,
+        "roas_change_pct": np.expm1(log_change) * 100.0,
+        "dominant": dominant,
+        "share": share,
+        "valid": valid,
+    }
+
+
+def change_noise(daily: pd.DataFrame, keys: List[str], window_col: str = "_window") -> pd.DataFrame:
+    """
+    Day-to-day noise of every factor's log change per segment, in log-points (x100).
+    `daily` holds the base sums per (keys, window_col, day), windows labelled "recent" and
+    "previous". The noise is the standard error of the difference between the windows'
+    mean daily log factor, sqrt(s_r^2 / n_r + s_p^2 / n_p); NaN where a window has fewer
+    than two days with the factor defined. Indexed by `keys`, one column per factor.
+    """
+    with np.errstate(divide="ignore"):
+        logs = np.log(funnel_factors({m: daily[m].to_numpy() for m in ("spend", "impressions", "clicks", "purchases", "revenue")}))
+    logs[~np.isfinite(logs)] = np.nan
+    frame = pd.DataFrame(logs * 100.0, columns=list(FACTORS), index=daily.index)
+    groups = frame.groupby([daily[k] for k in keys] + [daily[window_col]], sort=False)
+    var = (groups.var(ddof=1) / groups.count()).unstack(window_col)
+    var = var.reindex(columns=pd.MultiIndex.from_product([list(FACTORS), ["recent", "previous"]]))
+    return np.sqrt(var.xs("recent", axis=1, level=1) + var.xs("previous", axis=1, level=1))
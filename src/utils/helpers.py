@@ -5,10 +5,15 @@ General helpers used across agents:
 - ensure_dir
 - save_json, load_json
 - iso_utc_now
+- file_fingerprint
+- publish_temp_file (mkstemp file -> final path with the normal file mode)
+- account_output_path (a path configured under the reports dir, re-rooted in an account's reports dir)
 - validate_schema (lightweight)
-- small backoff helper (calls retry.retry if you have that module)
+- compute_kpis, summarize_df (used by DataAgent)
+- safe_read_csv (retried with jittered backoff via retry.retry_on_exception)
 """
 
+import hashlib
 import json
 import os
 from datetime import datetime, timezone
@@ -17,15 +22,7 @@ from typing import Any, Dict, Optional
 from pathlib import Path
 from pprint import pformat
 
-# Try to import project retry utility if present (you said you added retry.py)
-try:
-    from src.utils.retry import retry_on_exception  # type: ignore
-except Exception:
-    # fallback no-op decorator
-    def retry_on_exception(*args, **kwargs):
-        def _inner(fn):
-            return fn
-        return _inner
+from src.utils.retry import retry_on_exception
 
 
 def load_config(path: str = "config/config.yaml") -> Dict[str, Any]:
@@ -53,6 +50,64 @@ def iso_utc_now() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+def file_fingerprint(path: str, probe_bytes: int = 65536) -> Dict[str, Any]:
+    """
+    Cheap identity of a data file: size, mtime and a hash of its first/last bytes.
+    Used to invalidate sidecar caches (e.g. the date offset index) when the file changes.
+    """
+    st = os.stat(path)
+    h = hashlib.sha1()
+    with open(path, "rb") as fh:
+        h.update(fh.read(probe_bytes))
+        if st.st_size > probe_bytes:
+            fh.seek(max(probe_bytes, st.st_size - probe_bytes))
+            h.update(fh.read(probe_bytes))
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "probe_sha1": h.hexdigest()}
+
+
+def available_cores() -> int:
+    """Cores this process may run on (its CPU affinity), which default pool sizes follow."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # no affinity API (macOS, Windows)
+        return os.cpu_count() or 1
+
+
+def _umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# read once at import: os.umask can only be read by setting it
+UMASK = _umask()
+
+
+def publish_temp_file(tmp: str, path: str) -> None:
+    """
+    Atomically move a tempfile.mkstemp file into place. mkstemp creates files 0600 and
+    os.replace keeps that mode, so the umask-derived mode a plain open() would have
+    given the file is applied first.
+    """
+    os.chmod(tmp, 0o666 & ~UMASK)
+    os.replace(tmp, path)
+
+
+def account_output_path(cfg: Dict[str, Any], path: str, out_dir: Optional[str]) -> str:
+    """
+    Side outputs (quarantine file, anomaly state, charts, profiles) are configured relative to
+    outputs.reports_dir; re-root them in `out_dir` so each account gets its own. Absolute paths
+    are used as configured; relative paths outside the reports dir raise ValueError instead of
+    landing next to (or above) the account's directory.
+    """
+    if out_dir is None or os.path.isabs(path):
+        return path
+    rel = os.path.relpath(path, cfg.get("outputs", {}).get("reports_dir", "reports"))
+    if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+        raise ValueError(f"{path!r} is outside outputs.reports_dir; configure it under the reports dir or as an absolute path")
+    return os.path.join(out_dir, rel)
+
+
 def save_json(obj: Any, path: str, pretty: bool = True):
     ensure_dir(os.path.dirname(path) or ".")
     with open(path, "w", encoding="utf-8") as fh:
@@ -77,22 +132,43 @@ def validate_schema(df_columns: list, required: Optional[list] = None) -> Dict[s
     """
     Lightweight schema check — returns summary dict:
     {ok: bool, missing: [...], extra: [...]}
+    Same rules as src.utils.schema (one implementation, see schema.check_schema).
+    """
+    from src.utils.schema import check_schema
+
+    return check_schema(df_columns, required)
+
+
+def compute_kpis(df):
+    """
+    Return a copy of df with row-level ctr, cpc, cpa, roas columns added if missing.
+    Zero denominators give NaN rather than inf.
     """
-    required = required or [
-        "campaign_name",
-        "adset_name",
-        "date",
-        "spend",
-        "impressions",
-        "clicks",
-        "purchases",
-        "revenue",
-    ]
-    present = set(df_columns)
-    required_set = set(required)
-    missing = sorted(list(required_set - present))
-    extra = sorted(list(present - required_set))
-    return {"ok": len(missing) == 0, "missing": missing, "extra": extra}
+    import numpy as np
+
+    out = df.copy()
+    ratios = {
+        "ctr": ("clicks", "impressions"),
+        "cpc": ("spend", "clicks"),
+        "cpa": ("spend", "purchases"),
+        "roas": ("revenue", "spend"),
+    }
+    for col, (num, den) in ratios.items():
+        if col not in out.columns and num in out.columns and den in out.columns:
+            out[col] = out[num] / out[den].replace({0: np.nan})
+    return out
+
+
+def summarize_df(df) -> Dict[str, Any]:
+    """Small JSON-friendly summary: row count, date span and base metric totals."""
+    summary: Dict[str, Any] = {"rows": int(len(df))}
+    if "date" in df.columns and len(df):
+        summary["date_min"] = str(df["date"].min())
+        summary["date_max"] = str(df["date"].max())
+    for col in ("spend", "impressions", "clicks", "purchases", "revenue"):
+        if col in df.columns:
+            summary[f"total_{col}"] = float(df[col].sum())
+    return summary
 
 
 # Example wrapper used by DataAgent to add retries for load_data
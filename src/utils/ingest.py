@@ -0,0 +1,182 @@
+# src/utils/ingest.py
+"""
+Streaming ingestion of compressed and multi-part CSV exports.
+
+A dataset spec is one file or a glob of part files (e.g. "exports/2025-03-*/part-*.csv.gz").
+Parts may be plain CSV or gzip / bz2 / xz / zip compressed; they are decompressed as
+streams while pandas parses them (no intermediate files). A zip part is read member by
+member, in name order.
+
+read_parts runs one reader per part on a thread pool (zlib/bz2 and the pandas C parser
+release the GIL) and yields the chunks in part order. Read-ahead is bounded: at most
+`workers` parts are in flight and each buffers at most `read_ahead` chunks, so memory
+stays at workers x read_ahead chunks whatever the number or size of the parts.
+
+Usage:
+    from src.utils.ingest import expand_parts, iter_csv, read_parts
+    parts = expand_parts("exports/part-*.csv.gz")
+    for chunk in read_parts(parts, lambda p: iter_csv(p, usecols=["date", "spend"]), workers=4):
+        ...
+"""
+
+import bz2
+import glob
+import gzip
+import lzma
+import os
+import queue
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+DATA_SUFFIXES = (".csv", ".gz", ".bz2", ".xz", ".zip")
+_DONE = object()
+
+
+def compression(path: str) -> Optional[str]:
+    """Compression suffix of a part (".gz", ".bz2", ".xz", ".zip"), None for plain files."""
+    ext = os.path.splitext(str(path))[1].lower()
+    return ext if ext in OPENERS or ext == ".zip" else None
+
+
+def is_plain_csv(path: str) -> bool:
+    return compression(path) is None
+
+
+def expand_parts(spec: str) -> List[str]:
+    """The data files of a spec: the file itself, or the sorted data files matched by a glob."""
+    spec = str(spec)
+    if glob.has_magic(spec):
+        parts = sorted(p for p in glob.glob(spec) if os.path.isfile(p) and p.lower().endswith(DATA_SUFFIXES))
+        if not parts:
+            raise FileNotFoundError(f"No dataset parts match: {spec}")
+        return parts
+    if not os.path.exists(spec):
+        raise FileNotFoundError(f"Dataset not found: {os.path.abspath(spec)}")
+    return [spec]
+
+
+def _zip_members(zf: zipfile.ZipFile) -> List[str]:
+    names = sorted(n for n in zf.namelist() if not n.endswith("/"))
+    csvs = [n for n in names if n.lower().endswith(".csv")]
+    return csvs or names
+
+
+def iter_csv(part: str, usecols: Optional[List[str]] = None, chunksize: int = 50_000, **kwargs) -> Iterator[pd.DataFrame]:
+    """Parse one (possibly compressed) part in chunks, decompressing as a stream."""
+    if compression(part) == ".zip":
+        with zipfile.ZipFile(part) as zf:
+            for member in _zip_members(zf):
+                with zf.open(member) as fh:
+                    yield from pd.read_csv(fh, usecols=usecols, chunksize=chunksize, **kwargs)
+        return
+    with pd.read_csv(part, usecols=usecols, chunksize=chunksize, compression="infer", **kwargs) as reader:
+        yield from reader
+
+
+def head(part: str, nrows: int, usecols: Optional[List[str]] = None) -> pd.DataFrame:
+    """The first `nrows` rows of a part (nrows=0: just the columns)."""
+    if compression(part) == ".zip":
+        with zipfile.ZipFile(part) as zf:
+            members = _zip_members(zf)
+            if members:
+                with zf.open(members[0]) as fh:
+                    return pd.read_csv(fh, nrows=nrows, usecols=usecols)
+    return pd.read_csv(part, nrows=nrows, usecols=usecols, compression="infer")
+
+
+def iter_lines(part: str) -> Iterator[bytes]:
+    """Raw (decompressed) lines of a part: one header line, then the data lines of every member."""
+    kind = compression(part)
+    if kind == ".zip":
+        with zipfile.ZipFile(part) as zf:
+            for i, member in enumerate(_zip_members(zf)):
+                with zf.open(member) as fh:
+                    lines = iter(fh)
+                    header = next(lines, None)
+                    if i == 0 and header is not None:
+                        yield header
+                    yield from lines
+        return
+    with (OPENERS[kind] if kind else open)(part, "rb") as fh:
+        yield from fh
+
+
+def read_parts(parts: Iterable[str], read_part: Callable[[str], Iterable[pd.DataFrame]],
+               workers: int = 4, read_ahead: int = 4) -> Iterator[pd.DataFrame]:
+    """
+    Chunks of every part, in part order, read concurrently by `workers` threads with at most
+    `read_ahead` chunks buffered per part. Closing the iterator early stops the readers.
+    """
+    parts = list(parts)
+    if len(parts) <= 1 or workers <= 1:
+        for part in parts:
+            yield from read_part(part)
+        return
+
+    stop = threading.Event()
+
+    def _put(q: queue.Queue, item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(part: str, q: queue.Queue) -> None:
+        chunks = iter(read_part(part))
+        try:
+            for chunk in chunks:
+                if not _put(q, chunk):
+                    return
+            _put(q, _DONE)
+        except BaseException as e:  # handed to the consumer, raised there
+            _put(q, e)
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    pending: deque = deque()
+    remaining = iter(parts)
+
+    def _submit(pool: ThreadPoolExecutor) -> None:
+        part = next(remaining, None)
+        if part is not None:
+            q: queue.Queue = queue.Queue(maxsize=max(1, int(read_ahead)))
+            pool.submit(_produce, part, q)
+            pending.append(q)
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+    try:
+        for _ in range(workers):
+            _submit(pool)
+        while pending:
+            q = pending.popleft()
+            while True:
+                item = q.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+            _submit(pool)
+    finally:
+        stop.set()
+        pool.shutdown(wait=True)
+
+
+def read_csv_any(spec: str, usecols: Optional[List[str]] = None, chunksize: int = 50_000,
+                 workers: int = 4, read_ahead: int = 4) -> pd.DataFrame:
+    """Whole dataset of a spec (file or glob, compressed or not) as one frame."""
+    parts = expand_parts(spec)
+    chunks = list(read_parts(parts, lambda p: iter_csv(p, usecols=usecols, chunksize=chunksize),
+                             workers=workers, read_ahead=read_ahead))
+    return pd.concat(chunks, ignore_index=True) if chunks else head(parts[0], 0, usecols=usecols)
@@ -1,8 +1,18 @@
 # src/utils/loader.py
+import io
+import os
+import time
+from itertools import islice
+
 import yaml
 import pandas as pd
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.utils.date_index import iter_date_range, load_or_build_index, read_date_range
+from src.utils.ingest import expand_parts, head, is_plain_csv, iter_csv, iter_lines, read_parts
+from src.utils.memory_budget import aggregate_chunks
+from src.utils.sampling import filter_chunks, sample_csv, stratified_stream_sample
 
 
 def load_config(path: str) -> Dict[str, Any]:
@@ -21,24 +31,183 @@ def load_config(path: str) -> Dict[str, Any]:
     if "data" in cfg:
         cfg["data"].setdefault("sample", cfg["data"].get("sample_mode", False))
         cfg["data"].setdefault("sample_n", cfg["data"].get("sample_n", 500))
+        cfg["data"].setdefault("sample_strata", ["campaign_name", "date"])
+        cfg["data"].setdefault("sample_chunksize", 50_000)
         # keep both keys for convenience
         cfg["data"].setdefault("dataset_path", cfg["data"].get("dataset_path", cfg["data"].get("path", "data/synthetic_fb_ads_undergarments.csv")))
 
     return cfg
 
 
-def load_data(path: str, sample: bool = False, sample_n: int = 500) -> pd.DataFrame:
+def projection_savings(path: str, columns: List[str], sample_rows: int = 2000) -> Dict[str, float]:
+    """
+    Estimate what a column projection saves, from a small head sample of the file.
+    The sample is read from disk once and parsed twice from memory (all columns, then
+    the projection). Returns the projected share of in-memory bytes and of parse time (0-1).
+    """
+    lines = iter_lines(path)
+    try:
+        sample = b"".join(islice(lines, sample_rows + 1))
+    finally:
+        lines.close()
+
+    t0 = time.perf_counter()
+    full = pd.read_csv(io.BytesIO(sample))
+    t_full = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    pd.read_csv(io.BytesIO(sample), usecols=columns)
+    t_proj = time.perf_counter() - t0
+    parse_share = min(1.0, t_proj / t_full) if t_full > 0 else 1.0
+
+    mem = full.memory_usage(index=False, deep=True)
+    memory_share = float(mem[columns].sum() / mem.sum()) if mem.sum() else 1.0
+
+    return {"memory_share": memory_share, "parse_share": parse_share, "columns_total": len(full.columns)}
+
+
+def dataset_date_bounds(path: str, date_col: str = "date") -> Tuple[Optional[str], Optional[str]]:
+    """(min_date, max_date) of a dataset (file or glob of parts) as ISO strings, from the parts' sidecar date indexes."""
+    indexes = [load_or_build_index(part, date_col=date_col) for part in expand_parts(path)]
+    mins = [i["min_date"] for i in indexes if i["min_date"]]
+    maxs = [i["max_date"] for i in indexes if i["max_date"]]
+    return (min(mins) if mins else None), (max(maxs) if maxs else None)
+
+
+def _load_parts(parts: List[str], sample: bool, sample_n: int, columns: Optional[List[str]],
+                date_range: Optional[Tuple[Optional[str], Optional[str]]], seed: int, strata: List[str],
+                chunksize: int, quality, filters: Optional[Dict[str, List[str]]], aggregate: bool,
+                workers: int, read_ahead: int) -> pd.DataFrame:
+    """load_data over compressed and/or multi-part inputs: one concurrent chunk stream for every mode."""
+    read_cols = columns
+    if sample and columns is not None:
+        read_cols = list(columns) + [c for c in strata if c not in columns]
+
+    def read_part(part: str):
+        if date_range is not None:
+            # plain date-sorted parts are still sliced through their own date index
+            return iter_date_range(part, date_range[0], date_range[1], columns=read_cols, chunksize=chunksize)
+        return iter_csv(part, usecols=read_cols, chunksize=chunksize)
+
+    chunks = filter_chunks(read_parts(parts, read_part, workers=workers, read_ahead=read_ahead), filters)
+    if quality is not None:
+        # only the full in-order concatenation below keeps the scan's date parse
+        chunks = quality.scan_chunks(chunks, keep_dates=not sample and not aggregate)
+    if sample:
+        df = stratified_stream_sample(chunks, n=sample_n, strata=strata, seed=seed)
+        return df[[c for c in df.columns if c in columns]] if columns is not None else df
+    if aggregate:
+        # exact copies must go before rows are summed to the grain, as dedupe() does in memory
+        return aggregate_chunks(quality.drop_exact_duplicates(chunks) if quality is not None else chunks)
+    frames = list(chunks)
+    return pd.concat(frames, ignore_index=True) if frames else head(parts[0], 0, usecols=columns)
+
+
+def load_data(path: str, sample: bool = False, sample_n: int = 500,
+              columns: Optional[List[str]] = None, stats: Optional[Dict[str, Any]] = None,
+              date_range: Optional[Tuple[Optional[str], Optional[str]]] = None,
+              seed: int = 42, strata: Optional[List[str]] = None, chunksize: int = 50_000,
+              quality=None, filters: Optional[Dict[str, List[str]]] = None, aggregate: bool = False,
+              workers: int = 4, read_ahead: int = 4) -> pd.DataFrame:
     """
     Load dataset CSV using pandas and return a DataFrame.
-    If `sample` is True, returns top `sample_n` rows (deterministic).
+    `path` may be a gzip/bz2/xz/zip file or a glob of part files: parts are decompressed as
+    streams and read concurrently by `workers` threads, each buffering at most `read_ahead`
+    chunks (see src/utils/ingest.py); all options below apply the same way.
+    If `sample` is True, streams the file once and returns a seeded `sample_n`-row sample
+    stratified by `strata` (default campaign_name x date); only the sample plus one
+    chunk of `chunksize` rows is ever held in memory.
+    If `columns` is given, only those columns are parsed (e.g. the planner's projection).
+    If `date_range` is given as (start, end) ISO dates (inclusive), only those rows are read;
+    date-sorted files are sliced through the sidecar date index, others are scanned in chunks.
+    If `filters` ({column: allowed values}, e.g. the planner's compiled query filters) is given,
+    rows are filtered per chunk as they are read, before any other work; filter columns must
+    be among `columns` when a projection is used.
+    If `quality` (a DataQualityScanner) is given, rows are scanned as they are read (per chunk
+    when streaming), quarantined rows are dropped and duplicates are re-aggregated.
+    If `aggregate` is True (the memory governor's streaming mode), the file is streamed in
+    `chunksize` chunks and rows are summed to the grain of their non-metric columns as they
+    are read, so only one chunk plus the aggregate is ever held (ignored in sample mode).
+    If `stats` is a dict, it is filled with parse time, memory and projection savings.
     """
-    p = Path(path)
-    if not p.exists():
-        raise FileNotFoundError(f"Dataset not found: {p.resolve()}")
+    parts = expand_parts(str(path))
+    p = Path(parts[0])
 
     # read CSV with pandas
-    df = pd.read_csv(p)
+    t0 = time.perf_counter()
+    strata = ["campaign_name", "date"] if strata is None else list(strata)
+    if len(parts) > 1 or not is_plain_csv(parts[0]):
+        df = _load_parts(parts, sample=sample, sample_n=sample_n, columns=columns, date_range=date_range, seed=seed,
+                         strata=strata, chunksize=chunksize, quality=quality, filters=filters, aggregate=aggregate,
+                         workers=workers, read_ahead=read_ahead)
+    elif sample and date_range is not None:
+        read_cols = None if columns is None else list(columns) + [c for c in strata if c not in columns]
+        chunks = filter_chunks(iter_date_range(str(p), date_range[0], date_range[1], columns=read_cols, chunksize=chunksize),
+                               filters)
+        if quality is not None:
+            chunks = quality.scan_chunks(chunks)
+        df = stratified_stream_sample(chunks, n=sample_n, strata=strata, seed=seed)
+        if columns is not None:
+            df = df[[c for c in df.columns if c in columns]]
+    elif sample:
+        df = sample_csv(str(p), n=sample_n, strata=strata, seed=seed, chunksize=chunksize, usecols=columns,
+                        scanner=quality, filters=filters)
+    elif aggregate:
+        chunks = (iter_date_range(str(p), date_range[0], date_range[1], columns=columns, chunksize=chunksize)
+                  if date_range is not None else pd.read_csv(p, usecols=columns, chunksize=chunksize))
+        chunks = filter_chunks(chunks, filters)
+        if quality is not None:
+            # exact copies must go before rows are summed to the grain, as dedupe() does in memory
+            chunks = quality.drop_exact_duplicates(quality.scan_chunks(chunks))
+        df = aggregate_chunks(chunks)
+    elif date_range is not None and filters:
+        chunks = filter_chunks(iter_date_range(str(p), date_range[0], date_range[1], columns=columns), filters)
+        frames = list(quality.scan_chunks(chunks, keep_dates=True) if quality is not None else chunks)
+        df = pd.concat(frames, ignore_index=True) if frames else read_date_range(str(p), date_range[0], date_range[1], columns=columns)
+    elif date_range is not None:
+        # the slice is held whole either way: scan it in one piece, like a whole-file load
+        df = read_date_range(str(p), date_range[0], date_range[1], columns=columns)
+        if quality is not None:
+            df = quality.scan_chunk(df, keep_dates=True)
+    elif filters:
+        frames = list(filter_chunks(pd.read_csv(p, usecols=columns, chunksize=chunksize), filters))
+        df = pd.concat(frames, ignore_index=True)
+        if quality is not None:
+            df = quality.scan_chunk(df, keep_dates=True)
+    else:
+        df = pd.read_csv(p, usecols=columns)
+        if quality is not None:
+            df = quality.scan_chunk(df, keep_dates=True)
+    if quality is not None:
+        df = quality.dedupe(df)
+    parse_seconds = time.perf_counter() - t0
 
-    if sample:
-        return df.head(sample_n).copy()
+    if stats is not None:
+        memory_bytes = int(df.memory_usage(index=False, deep=True).sum())
+        input_bytes = sum(os.path.getsize(part) for part in parts)
+        stats.update({"columns_read": len(df.columns), "parse_seconds": parse_seconds, "memory_bytes": memory_bytes,
+                      "parts": len(parts), "input_bytes": input_bytes,
+                      "input_mb_per_s": input_bytes / 1024 ** 2 / parse_seconds if parse_seconds > 0 else 0.0})
+        if quality is not None:
+            stats["quality_seconds"] = quality.seconds
+        if columns:
+            savings = projection_savings(str(p), list(df.columns))
+            stats.update({
+                "columns_total": savings["columns_total"],
+                "memory_saved_pct": (1.0 - savings["memory_share"]) * 100.0,
+                "parse_time_saved_pct": (1.0 - savings["parse_share"]) * 100.0,
+            })
     return df
+
+
+def lookup_first_value(path: str, key_col: str, key: Any, value_col: str, chunksize: int = 50_000) -> Optional[Any]:
+    """
+    Return the first non-null `value_col` of the rows where `key_col == key`.
+    Streams only the two columns (part by part) and stops at the first match, so
+    deferred columns (e.g. creative_message) never have to be loaded in full.
+    """
+    for part in expand_parts(path):
+        for chunk in iter_csv(part, usecols=[key_col, value_col], chunksize=chunksize):
+            hits = chunk.loc[chunk[key_col] == key, value_col].dropna()
+            if not hits.empty:
+                return hits.iloc[0]
+    return None
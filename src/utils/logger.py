@@ -8,19 +8,27 @@ Features:
 - Optional debug_mode (set via config)
 - get_logger(name) to use per-module loggers
 - tail_log(file, lines) helper for quick checks (returns last n lines)
+- timed_agent(name, meta) context manager that logs start/finish and duration of an agent step
 """
 
 import logging
 import logging.handlers
 import os
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Dict, Iterator, Optional, List
+
+from src.utils.retry import retry_stats
 
 LOG_DIR = os.getenv("KASPARRO_LOG_DIR", "logs")
 LOG_FILE = os.path.join(LOG_DIR, "run.log")
 MAX_BYTES = 5 * 1024 * 1024  # 5 MB
 BACKUP_COUNT = 5
 
+# shared project logger (same name as the one used in retry.py / schema.py)
+logger = logging.getLogger("kasparro")
+
 
 def ensure_log_dir():
     os.makedirs(LOG_DIR, exist_ok=True)
@@ -95,6 +103,45 @@ def tail_log(path: Optional[str] = None, lines: int = 50) -> List[str]:
         return text.strip().splitlines()[-lines:]
 
 
+@contextmanager
+def timed_agent(name: str, meta: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Log start/finish of an agent step with its wall time.
+    Yields a dict the caller may enrich (e.g. rows processed); it gains "seconds" on exit,
+    plus "retries" / "retry_wait_seconds" when retries happened during the step
+    (process-wide counters, so concurrent steps share them).
+
+    Usage:
+        with timed_agent("data_agent", {"path": path}) as t:
+            ...
+    """
+    info: Dict[str, Any] = dict(meta or {})
+    logger.info("%s started %s", name, info)
+    before = retry_stats()
+    t0 = time.perf_counter()
+    try:
+        yield info
+    except Exception:
+        info["seconds"] = time.perf_counter() - t0
+        _add_retries(info, before)
+        logger.exception("%s failed after %.3fs", name, info["seconds"])
+        raise
+    info["seconds"] = time.perf_counter() - t0
+    _add_retries(info, before)
+    if info.get("retries"):
+        logger.info("%s finished in %.3fs (%d retries, %.3fs waiting)", name, info["seconds"],
+                    info["retries"], info["retry_wait_seconds"])
+    else:
+        logger.info("%s finished in %.3fs", name, info["seconds"])
+
+
+def _add_retries(info: Dict[str, Any], before: Dict[str, Any]) -> None:
+    after = retry_stats()
+    if after["retries"] > before["retries"] or after["gave_up"] > before["gave_up"]:
+        info["retries"] = after["retries"] - before["retries"]
+        info["retry_wait_seconds"] = after["wait_seconds"] - before["wait_seconds"]
+
+
 # Small convenience for quick CLI usage
 if __name__ == "__main__":
     configure_root_logger()
@@ -0,0 +1,216 @@
+# src/utils/memory_budget.py
+"""
+Memory-budget governor: pick how a dataset is loaded before any of it is parsed.
+
+The in-memory footprint is estimated from the file size (row counts of the date
+index for compressed parts), the on-disk width of a head sample of rows and the deep memory usage of that sample parsed with the
+planner's projection (i.e. the real dtypes); the sidecar date index narrows the
+estimate to the requested date range. Against `memory.budget_mb` (the frame times
+`working_set_factor`, the agents' working copies) the run is executed as:
+- "in_memory":   the frame fits - load it as today.
+- "streaming":   stream chunks and sum rows to the grain of their non-metric columns
+                 (aggregate_chunks), holding one chunk plus the aggregate.
+- "partitioned": not even the aggregate fits - split the file on disk by a hash of
+                 `partition_col` (whole campaigns per part, partition_csv) and run
+                 each part as its own account.
+Peak RSS (getrusage) is reported with the chosen mode in the run summary.
+
+Usage:
+    from src.utils.memory_budget import plan_memory, peak_rss_mb
+    memory = plan_memory(cfg, "data/ads.csv", columns=["date", "spend"], date_range=("2025-03-01", "2025-03-31"))
+    memory["mode"]  # "in_memory" | "streaming" | "partitioned"
+"""
+
+import math
+import os
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.utils.date_index import iter_date_range, load_or_build_index
+from src.utils.ingest import expand_parts, head, is_plain_csv, iter_lines, read_parts
+from src.utils.prefix_sums import BASE_METRICS
+from src.utils.sampling import filter_chunks
+
+MODES = ("in_memory", "streaming", "partitioned")
+# ratio columns recomputed from the summed metrics (same rounding as the source exports)
+RATIOS = {"ctr": ("clicks", "impressions", 4), "roas": ("revenue", "spend", 2)}
+MB = 1024.0 * 1024.0
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None where getrusage is unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / MB if os.uname().sysname == "Darwin" else peak / 1024.0
+
+
+def grain_columns(columns: Iterable[str]) -> List[str]:
+    """Non-metric columns: rows sharing all of them are summed in streaming mode."""
+    return [c for c in columns if c not in BASE_METRICS and c not in RATIOS]
+
+
+def estimate_footprint(path: str, columns: Optional[List[str]] = None,
+                       date_range: Optional[Tuple[Optional[str], Optional[str]]] = None,
+                       sample_rows: int = 2000) -> Dict[str, Any]:
+    """
+    Estimated rows and MB of the frame `load_data` would build, and of its streaming aggregate.
+    """
+    parts = expand_parts(path)
+    file_bytes = sum(os.path.getsize(p) for p in parts)
+    lines = iter_lines(parts[0])
+    try:
+        sampled = list(islice(lines, 1, sample_rows + 1))
+    finally:
+        lines.close()
+    disk_row = sum(map(len, sampled)) / len(sampled) if sampled else 1.0
+    if all(is_plain_csv(p) for p in parts):
+        rows = file_bytes / disk_row if sampled else 0.0
+    else:
+        # compressed sizes say nothing about row counts: use the parts' (cached) date indexes
+        rows = float(sum(load_or_build_index(p)["rows"] for p in parts))
+
+    sample = head(parts[0], sample_rows, usecols=columns)
+    mem_row = float(sample.memory_usage(index=False, deep=True).sum()) / len(sample) if len(sample) else 0.0
+
+    if date_range is not None:
+        start, end = date_range
+        indexes = [load_or_build_index(p) for p in parts]
+        total = sum(i["rows"] for i in indexes)
+        if all(i["seekable"] and i["dates"] for i in indexes) and total:
+            in_range = sum(v[3] for i in indexes for d, v in i["dates"].items()
+                           if (not start or d >= start) and (not end or d <= end))
+            rows *= in_range / total
+        else:
+            # unsorted or compressed data: the sampled rows' dates stand in for the whole dataset
+            date_col = indexes[0]["date_col"]
+            dates = head(parts[0], sample_rows, usecols=[date_col])[date_col].astype(str).str[:10]
+            if len(dates):
+                rows *= float(((dates >= (start or "")) & (dates <= (end or "9999"))).mean())
+
+    keys = grain_columns(sample.columns)
+    # distinct grain keys per row in the sample ~ how much streaming aggregation shrinks the frame
+    grain_ratio = float(len(sample.drop_duplicates(keys))) / len(sample) if len(sample) and keys else 1.0
+    return {
+        "file_mb": file_bytes / MB,
+        "rows": int(rows),
+        "row_bytes_disk": disk_row,
+        "row_bytes_memory": mem_row,
+        "frame_mb": rows * mem_row / MB,
+        "aggregate_mb": rows * grain_ratio * mem_row / MB,
+    }
+
+
+def choose_mode(estimate: Dict[str, Any], budget_mb: Optional[float], working_set_factor: float = 3.0,
+                chunk_mb: float = 0.0, allow_partition: bool = True, max_partitions: int = 64) -> Tuple[str, int]:
+    """(mode, partitions) for an estimate; no budget means in_memory."""
+    if not budget_mb:
+        return "in_memory", 1
+    if estimate["frame_mb"] * working_set_factor <= budget_mb:
+        return "in_memory", 1
+    aggregate_need = estimate["aggregate_mb"] * working_set_factor + chunk_mb
+    if aggregate_need <= budget_mb or not allow_partition:
+        return "streaming", 1
+    return "partitioned", int(min(max_partitions, max(2, math.ceil(aggregate_need / budget_mb))))
+
+
+def plan_memory(cfg: Dict[str, Any], path: str, columns: Optional[List[str]] = None,
+                date_range: Optional[Tuple[Optional[str], Optional[str]]] = None) -> Dict[str, Any]:
+    """
+    The governor's decision for one dataset under config `memory`:
+    {"mode", "partitions", "budget_mb", "estimate"}. A forced `memory.mode` wins over the estimate.
+    """
+    mem = cfg.get("memory", {})
+    data = cfg.get("data", {})
+    budget = mem.get("budget_mb")
+    estimate = estimate_footprint(path, columns=columns, date_range=date_range, sample_rows=mem.get("sample_rows", 2000))
+    if data.get("sample", False):
+        # sample mode never holds more than sample_n rows plus one chunk
+        estimate["rows"] = min(estimate["rows"], int(data.get("sample_n", 500)))
+        estimate["frame_mb"] = estimate["aggregate_mb"] = estimate["rows"] * estimate["row_bytes_memory"] / MB
+        return {"mode": "in_memory", "partitions": 1, "budget_mb": budget, "estimate": estimate}
+
+    allow_partition = mem.get("allow_partition", True)
+    forced = mem.get("mode", "auto")
+    if forced in MODES:
+        mode = "streaming" if forced == "partitioned" and not allow_partition else forced
+        parts = int(mem.get("partitions", 2)) if mode == "partitioned" else 1
+    else:
+        chunk_mb = data.get("sample_chunksize", 50_000) * estimate["row_bytes_memory"] / MB
+        mode, parts = choose_mode(estimate, budget, mem.get("working_set_factor", 3.0), chunk_mb,
+                                  allow_partition, mem.get("max_partitions", 64))
+    return {"mode": mode, "partitions": parts, "budget_mb": budget, "estimate": estimate}
+
+
+def _sum_by(df: pd.DataFrame, keys: List[str], metrics: List[str]) -> pd.DataFrame:
+    """Sum `metrics` over rows sharing `keys` (first-occurrence order), recomputing ratio columns."""
+    out = df.groupby(keys, sort=False, dropna=False)[metrics].sum(min_count=1).reset_index()
+    for col, (num, den, digits) in RATIOS.items():
+        if col in df.columns and num in out.columns and den in out.columns:
+            out[col] = (out[num] / out[den].where(out[den] > 0)).round(digits)
+    return out[list(df.columns)]
+
+
+def aggregate_chunks(chunks: Iterable[pd.DataFrame], compact_rows: int = 1_000_000) -> pd.DataFrame:
+    """
+    Streaming aggregation: every chunk is summed to its grain (grain_columns) and the partial
+    aggregates are re-compacted whenever they outgrow `compact_rows`, so memory stays at one
+    chunk plus the aggregate. Rows that are already unique on the grain come out unchanged.
+    Exact duplicate rows are summed like any other: drop them first
+    (DataQualityScanner.drop_exact_duplicates), as the loader does.
+    """
+    parts: List[pd.DataFrame] = []
+    keys = metrics = None
+    empty = pd.DataFrame()
+    pending, limit = 0, compact_rows
+    for chunk in chunks:
+        if keys is None:
+            empty = chunk.iloc[:0]
+            keys = grain_columns(chunk.columns)
+            metrics = [m for m in BASE_METRICS if m in chunk.columns]
+            if not keys or not metrics:
+                raise ValueError("Streaming aggregation needs grain and metric columns")
+        if chunk.empty:
+            continue
+        parts.append(_sum_by(chunk, keys, metrics))
+        pending += len(parts[-1])
+        if pending > limit and len(parts) > 1:
+            parts = [_sum_by(pd.concat(parts, ignore_index=True), keys, metrics)]
+            pending = len(parts[0])
+            # keep compaction amortized when the aggregate itself is large
+            limit = max(compact_rows, 2 * pending)
+    if not parts:
+        return empty
+    if len(parts) == 1:
+        return parts[0]
+    return _sum_by(pd.concat(parts, ignore_index=True), keys, metrics)
+
+
+def partition_csv(path: str, out_dir: str, n_parts: int, partition_col: str = "campaign_name",
+                  date_range: Optional[Tuple[Optional[str], Optional[str]]] = None,
+                  filters: Optional[Dict[str, List[str]]] = None, chunksize: int = 50_000) -> List[str]:
+    """
+    Split `path` (a file or a glob of parts) into `n_parts` CSV files by a stable hash of
+    `partition_col`, streaming one chunk at a time (all columns kept, rows outside `date_range` /
+    `filters` dropped). Input order is kept within each part, so date-sorted inputs give
+    date-sorted parts. Returns the non-empty parts.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = [os.path.join(out_dir, f"part-{i:02d}.csv") for i in range(n_parts)]
+    written = [False] * n_parts
+    start, end = date_range if date_range is not None else (None, None)
+    chunks = read_parts(expand_parts(path), lambda p: iter_date_range(p, start, end, chunksize=chunksize))
+    for chunk in filter_chunks(chunks, filters):
+        part = pd.util.hash_array(chunk[partition_col].astype(str).to_numpy()) % np.uint64(n_parts)
+        for i in np.unique(part):
+            rows = chunk[part == i]
+            rows.to_csv(paths[i], mode="a" if written[i] else "w", header=not written[i], index=False)
+            written[i] = True
+    return [p for p, w in zip(paths, written) if w]
+
@@ -0,0 +1,277 @@
+# src/utils/metrics.py
+"""
+Cumulative run metrics, exported in Prometheus textfile-collector format.
+
+Every run records per-stage wall time, rows processed and rows/sec into fixed-bucket
+histograms, plus counters for runs, rows, cache hits/misses and retries, and its
+peak memory. Recording is in memory and O(1) (a bisect into a short bucket list and
+a few dict updates, a few microseconds per stage). At the end of the run flush()
+merges the run into a JSON state file under outputs.logs_dir - under an exclusive
+flock, written to a temp file and atomically replaced, so concurrent runs never
+lose updates - and rewrites the textfile (<logs_dir>/kasparro.prom) for
+node_exporter's textfile collector. p50/p95/p99 come from histogram_quantile().
+
+Caches report through cache_event(name, hit), counted process-wide.
+
+Usage:
+    from src.utils.metrics import metrics_from_config
+    metrics = metrics_from_config(cfg)
+    with metrics.stage("load_data") as rec:
+        df = load_data(...)
+        rec["rows"] = len(df)
+    metrics.finish(peak_rss_mb=512.0)     # or finish(status="error") when the run failed
+    metrics.flush()
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.utils.helpers import publish_temp_file
+from src.utils.retry import retry_stats
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): updates are still atomic, just not serialized
+    fcntl = None
+
+logger = logging.getLogger("kasparro")
+
+PREFIX = "kasparro"
+STATE_VERSION = 1
+MB = 1024.0 * 1024.0
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+THROUGHPUT_BUCKETS = (1e2, 1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 1e8)
+MEMORY_BUCKETS = tuple(MB * 2 ** k for k in range(6, 16))  # 64 MB .. 32 GB
+HISTOGRAMS = {
+    "stage_duration_seconds": ("Wall time of a pipeline stage.", LATENCY_BUCKETS),
+    "stage_rows_per_second": ("Rows processed per second by a pipeline stage.", THROUGHPUT_BUCKETS),
+    "run_duration_seconds": ("Wall time of a pipeline run.", LATENCY_BUCKETS),
+    "run_peak_rss_bytes": ("Peak resident memory of a pipeline run.", MEMORY_BUCKETS),
+}
+COUNTERS = {
+    "runs_total": "Completed pipeline runs.",
+    "stage_runs_total": "Completed executions of a pipeline stage.",
+    "stage_rows_total": "Rows processed by a pipeline stage.",
+    "cache_hits_total": "Cache lookups served from the cache.",
+    "cache_misses_total": "Cache lookups that had to compute or rebuild.",
+    "retries_total": "Retried calls (src/utils/retry.py).",
+    "retry_wait_seconds_total": "Seconds spent waiting between retries.",
+}
+GAUGES = {
+    "last_run_timestamp_seconds": "Unix time the last run finished.",
+    "last_run_peak_rss_bytes": "Peak resident memory of the last run.",
+}
+
+_cache_lock = threading.Lock()
+_cache_events: Counter = Counter()
+
+
+def cache_event(cache: str, hit: bool) -> None:
+    """Count one lookup of `cache` (process-wide)."""
+    with _cache_lock:
+        _cache_events[(cache, bool(hit))] += 1
+
+
+def cache_events() -> Dict[Tuple[str, bool], int]:
+    with _cache_lock:
+        return dict(_cache_events)
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    """Prometheus label body, e.g. stage="load_data" (sorted, escaped)."""
+    def esc(v: Any) -> str:
+        return str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return ",".join(f'{k}="{esc(v)}"' for k, v in sorted(labels.items()))
+
+
+class RunMetrics:
+    """Histograms, counters and gauges of one run, merged into the shared state by flush()."""
+
+    def __init__(self, state_file: str, textfile: Optional[str] = None, enabled: bool = True):
+        self.state_file = state_file
+        self.textfile = textfile
+        self.enabled = enabled
+        # default rows for stages that do not set their own (the loaded frame's length)
+        self.rows: Optional[int] = None
+        self.histograms: Dict[str, Dict[str, List[float]]] = {}
+        self.counters: Dict[str, Dict[str, float]] = {}
+        self.gauges: Dict[str, Dict[str, float]] = {}
+        self._stage_keys: Dict[str, str] = {}
+        self._t0 = time.perf_counter()
+        self._cache_start = cache_events()
+        self._retry_start = retry_stats()
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        self._observe(name, _labels(labels), value)
+
+    def _observe(self, name: str, key: str, value: float) -> None:
+        buckets = HISTOGRAMS[name][1]
+        series = self.histograms.setdefault(name, {})
+        h = series.get(key)
+        if h is None:
+            # bucket counts (last slot: +Inf), then sum and count
+            h = series[key] = [0.0] * (len(buckets) + 3)
+        h[bisect_left(buckets, value)] += 1
+        h[-2] += value
+        h[-1] += 1
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        self._inc(name, _labels(labels), value)
+
+    def _inc(self, name: str, key: str, value: float) -> None:
+        series = self.counters.setdefault(name, {})
+        series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels: Any) -> None:
+        self.gauges.setdefault(name, {})[_labels(labels)] = value
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Dict[str, Any]]:
+        """Time a stage; the yielded dict may carry "rows" (default: self.rows). A stage that raises is still recorded."""
+        rec: Dict[str, Any] = {}
+        t0 = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            self.record_stage(name, time.perf_counter() - t0, rec.get("rows", self.rows))
+
+    def record_stage(self, name: str, seconds: float, rows: Optional[int] = None) -> None:
+        key = self._stage_keys.get(name)
+        if key is None:
+            key = self._stage_keys[name] = _labels({"stage": name})
+        self._observe("stage_duration_seconds", key, seconds)
+        self._inc("stage_runs_total", key, 1.0)
+        if rows:
+            self._inc("stage_rows_total", key, rows)
+            if seconds > 0:
+                self._observe("stage_rows_per_second", key, rows / seconds)
+
+    def finish(self, peak_rss_mb: Optional[float] = None, status: str = "ok") -> None:
+        """Run-level metrics: duration, peak memory, this run's cache events and retries."""
+        self.observe("run_duration_seconds", time.perf_counter() - self._t0)
+        self.inc("runs_total", status=status)
+        self.set("last_run_timestamp_seconds", time.time())
+        if peak_rss_mb is not None:
+            self.observe("run_peak_rss_bytes", peak_rss_mb * MB)
+            self.set("last_run_peak_rss_bytes", peak_rss_mb * MB)
+        for (cache, hit), n in cache_events().items():
+            delta = n - self._cache_start.get((cache, hit), 0)
+            if delta:
+                self.inc("cache_hits_total" if hit else "cache_misses_total", delta, cache=cache)
+        retries = retry_stats()
+        self.inc("retries_total", retries["retries"] - self._retry_start["retries"])
+        self.inc("retry_wait_seconds_total", retries["wait_seconds"] - self._retry_start["wait_seconds"])
+
+    def flush(self) -> Optional[str]:
+        """Merge into the state file (locked, atomic) and rewrite the textfile; returns its path."""
+        if not self.enabled:
+            return None
+        directory = os.path.dirname(self.state_file) or "."
+        os.makedirs(directory, exist_ok=True)
+        with open(self.state_file + ".lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = merge_state(load_state(self.state_file), self)
+                _atomic_write(self.state_file, json.dumps(state, sort_keys=True))
+                if self.textfile:
+                    _atomic_write(self.textfile, render_textfile(state))
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        return self.textfile
+
+
+def load_state(path: str) -> Dict[str, Any]:
+    """The cumulative state; empty when missing, unreadable or of another version."""
+    empty = {"version": STATE_VERSION, "histograms": {}, "counters": {}, "gauges": {}}
+    if not os.path.exists(path):
+        return empty
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            state = json.load(fh)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable metrics state %s: %s", path, e)
+        return empty
+    return state if state.get("version") == STATE_VERSION else empty
+
+
+def merge_state(state: Dict[str, Any], run: RunMetrics) -> Dict[str, Any]:
+    """Add a run's histograms and counters to the state, overwrite its gauges."""
+    for name, series in run.histograms.items():
+        buckets = list(HISTOGRAMS[name][1])
+        hist = state["histograms"].get(name)
+        if hist is None or hist["buckets"] != buckets:
+            # bucket layout changed: the series restart rather than mix layouts
+            hist = state["histograms"][name] = {"buckets": buckets, "series": {}}
+        for key, h in series.items():
+            old = hist["series"].get(key)
+            hist["series"][key] = h[:] if old is None else [a + b for a, b in zip(old, h)]
+    for name, series in run.counters.items():
+        merged = state["counters"].setdefault(name, {})
+        for key, v in series.items():
+            merged[key] = merged.get(key, 0.0) + v
+    for name, series in run.gauges.items():
+        state["gauges"].setdefault(name, {}).update(series)
+    return state
+
+
+def _number(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() and abs(v) < 1e15 else repr(float(v))
+
+
+def render_textfile(state: Dict[str, Any]) -> str:
+    """Prometheus text exposition format (cumulative buckets, _sum, _count)."""
+    lines = []
+    for name, hist in sorted(state["histograms"].items()):
+        metric = f"{PREFIX}_{name}"
+        lines += [f"# HELP {metric} {HISTOGRAMS.get(name, ('',))[0]}", f"# TYPE {metric} histogram"]
+        bounds = [repr(float(b)) for b in hist["buckets"]] + ["+Inf"]
+        for key, h in sorted(hist["series"].items()):
+            sep = "," if key else ""
+            cumulative = 0.0
+            for bound, n in zip(bounds, h[:-2]):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{{key}{sep}le="{bound}"}} {_number(cumulative)}')
+            lines.append(f"{metric}_sum{{{key}}} {_number(h[-2])}" if key else f"{metric}_sum {_number(h[-2])}")
+            lines.append(f"{metric}_count{{{key}}} {_number(h[-1])}" if key else f"{metric}_count {_number(h[-1])}")
+    for kind, helps, section in (("counter", COUNTERS, "counters"), ("gauge", GAUGES, "gauges")):
+        for name, series in sorted(state[section].items()):
+            metric = f"{PREFIX}_{name}"
+            lines += [f"# HELP {metric} {helps.get(name, '')}", f"# TYPE {metric} {kind}"]
+            for key, v in sorted(series.items()):
+                lines.append(f"{metric}{{{key}}} {_number(v)}" if key else f"{metric} {_number(v)}")
+    return "\n".join(lines) + "\n"
+
+
+def _atomic_write(path: str, text: str) -> None:
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        # textfile collectors read with the file's mode: give it the mode a plain open() would
+        publish_temp_file(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def metrics_from_config(cfg: Dict[str, Any]) -> RunMetrics:
+    """Recorder for one run; state file and textfile live under outputs.logs_dir (flush is a no-op when disabled)."""
+    mc = cfg.get("metrics", {})
+    logs_dir = cfg.get("outputs", {}).get("logs_dir", "logs")
+    textfile = mc.get("textfile", "kasparro.prom")
+    return RunMetrics(os.path.join(logs_dir, mc.get("state_file", "metrics_state.json")),
+                      textfile=os.path.join(logs_dir, textfile) if textfile else None,
+                      enabled=mc.get("enabled", False))
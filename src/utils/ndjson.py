@@ -0,0 +1,98 @@
+# src/utils/ndjson.py
+"""
+Streaming newline-delimited JSON (NDJSON) output.
+
+Records are serialized one per line as they are produced, so large result sets
+(per-segment hypotheses) are never held in memory as one document. Writes go to
+a temp file in the target directory and are renamed into place on success, so
+readers never see a half-written file. Paths ending in ".gz" (or compress=True)
+are gzip-compressed; the reader detects gzip from the file's magic bytes.
+
+Usage:
+    from src.utils.ndjson import NDJSONWriter, iter_ndjson, top_n
+    with NDJSONWriter("reports/insights.ndjson.gz") as w:
+        for rec in records:
+            w.write(rec)
+    worst = top_n(iter_ndjson("reports/insights.ndjson.gz"), 10, key=lambda r: -r["confidence"])
+"""
+
+import gzip
+import heapq
+import io
+import json
+import os
+import tempfile
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from src.utils.helpers import publish_temp_file
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class NDJSONWriter:
+    """Atomic, optionally gzip-compressed NDJSON writer (use as a context manager)."""
+
+    def __init__(self, path: str, compress: Optional[bool] = None):
+        self.path = path
+        self.compress = path.endswith(".gz") if compress is None else bool(compress)
+        self.count = 0
+        self._tmp: Optional[str] = None
+        self._fh = None
+
+    def __enter__(self) -> "NDJSONWriter":
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, self._tmp = tempfile.mkstemp(prefix=".tmp-", suffix=".ndjson", dir=directory)
+        raw = os.fdopen(fd, "wb")
+        if self.compress:
+            raw = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0)
+            # GzipFile does not close the underlying file object: keep both
+            self._raw = raw.fileobj
+        else:
+            self._raw = raw
+        self._fh = io.TextIOWrapper(raw, encoding="utf-8", newline="\n")
+        return self
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._fh.write(json.dumps(record, default=str, ensure_ascii=False, separators=(",", ":")))
+        self._fh.write("\n")
+        self.count += 1
+
+    def write_all(self, records: Iterable[Dict[str, Any]]) -> int:
+        for record in records:
+            self.write(record)
+        return self.count
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            self._fh.flush()
+            self._fh.close()  # closes the gzip stream too
+            if self.compress:
+                self._raw.close()
+        finally:
+            if exc_type is None:
+                publish_temp_file(self._tmp, self.path)
+            elif os.path.exists(self._tmp):
+                os.remove(self._tmp)
+
+
+def write_ndjson(path: str, records: Iterable[Dict[str, Any]], compress: Optional[bool] = None) -> int:
+    """Write an iterable of records atomically; returns the number of records written."""
+    with NDJSONWriter(path, compress=compress) as writer:
+        return writer.write_all(records)
+
+
+def iter_ndjson(path: str) -> Iterator[Dict[str, Any]]:
+    """Lazily yield the records of an NDJSON file (plain or gzip, detected by content)."""
+    with open(path, "rb") as probe:
+        gz = probe.read(2) == GZIP_MAGIC
+    opener = gzip.open if gz else open
+    with opener(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def top_n(records: Iterable[Dict[str, Any]], n: int, key: Callable[[Dict[str, Any]], Any]) -> List[Dict[str, Any]]:
+    """The n records with the smallest key, in order, holding at most n records in memory."""
+    return heapq.nsmallest(n, records, key=key)
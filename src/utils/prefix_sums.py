@@ -0,0 +1,143 @@
+# src/utils/prefix_sums.py
+"""
+Per-day prefix sums of the base metrics, globally and per segment.
+
+Once built, the totals (and derived KPIs) of any date range cost O(1):
+    sum(days a..b-1) = prefix[b] - prefix[a]
+
+Usage:
+    from src.utils.prefix_sums import PrefixSumIndex
+    idx = PrefixSumIndex(df, segment_cols=["campaign_name"])
+    recent = idx.window(idx.n_days - 7, idx.n_days)
+    per_campaign = idx.segment_totals("campaign_name", 0, idx.n_days)
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.utils.frame_guard import factorized, parsed_dates
+
+BASE_METRICS: List[str] = ["spend", "impressions", "clicks", "purchases", "revenue"]
+
+
+def derive_kpis(totals: Dict[str, float]) -> Dict[str, float]:
+    """
+    Add ctr/cpc/cpa/roas to a dict of base metric totals.
+    Ratios are computed from sums (never averaged), with 0 for empty denominators.
+    """
+    spend = totals.get("spend", 0)
+    impressions = totals.get("impressions", 0)
+    clicks = totals.get("clicks", 0)
+    purchases = totals.get("purchases", 0)
+    revenue = totals.get("revenue", 0)
+    out = dict(totals)
+    out["ctr"] = (clicks / impressions) if impressions > 0 else 0
+    out["cpc"] = (spend / clicks) if clicks > 0 else 0
+    out["cpa"] = (spend / purchases) if purchases > 0 else 0
+    out["roas"] = (revenue / spend) if spend > 0 else 0
+    return out
+
+
+def derive_kpi_arrays(sums: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Vectorized derive_kpis over arrays of base metric sums (one element per segment)."""
+    def _ratio(num, den):
+        num = np.asarray(num, dtype=float)
+        den = np.asarray(den, dtype=float)
+        out = np.zeros(np.broadcast(num, den).shape, dtype=float)
+        np.divide(num, den, out=out, where=den > 0)
+        return out
+
+    out = dict(sums)
+    out["ctr"] = _ratio(sums["clicks"], sums["impressions"])
+    out["cpc"] = _ratio(sums["spend"], sums["clicks"])
+    out["cpa"] = _ratio(sums["spend"], sums["purchases"])
+    out["roas"] = _ratio(sums["revenue"], sums["spend"])
+    return out
+
+
+def percent_change_arrays(new: np.ndarray, old: np.ndarray) -> np.ndarray:
+    """Vectorized percent change; 0 where the old value is 0 (same rule as InsightAgent)."""
+    new = np.asarray(new, dtype=float)
+    old = np.asarray(old, dtype=float)
+    out = np.zeros(np.broadcast(new, old).shape, dtype=float)
+    np.divide((new - old) * 100.0, old, out=out, where=old != 0)
+    return out
+
+
+class PrefixSumIndex:
+    """
+    Range-query structure over the daily base metrics of a frame.
+
+    Day 0 is the earliest date in the frame; ranges are half-open [start_day, end_day)
+    and are clipped to the data, so callers can pass out-of-range bounds freely.
+    The input frame is never modified.
+    """
+
+    def __init__(self, df: pd.DataFrame, segment_cols: Optional[Sequence[str]] = None,
+                 date_col: str = "date", metrics: Sequence[str] = BASE_METRICS):
+        self.metrics = list(metrics)
+        dates = parsed_dates(df, date_col)
+        self.min_date = dates.min()
+        self.max_date = dates.max()
+        day = (dates - self.min_date).dt.days.to_numpy(dtype=np.int64)
+        self.n_days = int(day.max()) + 1 if len(day) else 0
+
+        values = df[self.metrics].fillna(0).to_numpy(dtype=float)
+        # global prefix: shape (n_days + 1, n_metrics)
+        daily = np.column_stack([
+            np.bincount(day, weights=values[:, m], minlength=self.n_days)
+            for m in range(len(self.metrics))
+        ]) if self.n_days else np.zeros((0, len(self.metrics)))
+        self._prefix = np.vstack([np.zeros((1, len(self.metrics))), np.cumsum(daily, axis=0)])
+
+        # per-segment prefix: shape (n_metrics, n_segments, n_days + 1)
+        self._segments: Dict[str, pd.Index] = {}
+        self._seg_prefix: Dict[str, np.ndarray] = {}
+        for col in segment_cols or []:
+            codes, uniques = factorized(df, col)
+            n_seg = len(uniques)
+            valid = codes >= 0
+            flat = codes[valid] * self.n_days + day[valid]
+            seg = np.zeros((len(self.metrics), n_seg, self.n_days + 1))
+            for m in range(len(self.metrics)):
+                counts = np.bincount(flat, weights=values[valid, m], minlength=n_seg * self.n_days)
+                seg[m, :, 1:] = np.cumsum(counts.reshape(n_seg, self.n_days), axis=1)
+            self._segments[col] = uniques
+            self._seg_prefix[col] = seg
+
+    def _clip(self, start_day: int, end_day: int):
+        start = min(max(int(start_day), 0), self.n_days)
+        end = min(max(int(end_day), start), self.n_days)
+        return start, end
+
+    def day_of(self, ts) -> int:
+        """Day offset of a timestamp relative to the earliest date."""
+        return int((pd.Timestamp(ts) - self.min_date).days)
+
+    def totals(self, start_day: int, end_day: int) -> Dict[str, float]:
+        """Base metric totals for [start_day, end_day)."""
+        a, b = self._clip(start_day, end_day)
+        diff = self._prefix[b] - self._prefix[a]
+        return {m: float(diff[i]) for i, m in enumerate(self.metrics)}
+
+    def window(self, start_day: int, end_day: int) -> Dict[str, float]:
+        """Totals plus derived KPIs for [start_day, end_day)."""
+        return derive_kpis(self.totals(start_day, end_day))
+
+    def segments(self, col: str) -> pd.Index:
+        """Segment values (sorted) for an indexed segment column."""
+        return self._segments[col]
+
+    def segment_sums(self, col: str, start_day: int, end_day: int) -> Dict[str, np.ndarray]:
+        """Base metric totals for every segment of `col` over [start_day, end_day), as arrays."""
+        a, b = self._clip(start_day, end_day)
+        seg = self._seg_prefix[col]
+        diff = seg[:, :, b] - seg[:, :, a]
+        return {m: diff[i] for i, m in enumerate(self.metrics)}
+
+    def segment_totals(self, col: str, start_day: int, end_day: int) -> pd.DataFrame:
+        """Per-segment totals and derived KPIs over [start_day, end_day), indexed by segment value."""
+        sums = derive_kpi_arrays(self.segment_sums(col, start_day, end_day))
+        return pd.DataFrame(sums, index=self._segments[col])
@@ -0,0 +1,241 @@
+# src/utils/profiler.py
+"""
+On-demand per-stage profiling of a pipeline run.
+
+Each pipeline stage runs inside `profiler.stage(name)`. For the stages selected
+(config `profiling.stages`, the KASPARRO_PROFILE environment variable or
+`run.py --profile`) one of two engines runs around the stage:
+- "sampler": a SIGPROF interval timer samples the Python stack every
+  `interval_ms` of CPU time (low overhead, full stacks). Samples are weighted by
+  the CPU time since the previous one, so long NumPy/pandas calls that hold off
+  the signal are not undercounted.
+- "cprofile": the stdlib deterministic profiler (exact call counts, higher
+  overhead). Its collapsed output has caller;callee pairs only.
+Per stage it writes <stage>.collapsed (flamegraph.pl / speedscope input) and
+<stage>.top.txt (the top-N hot functions); summary.json lists every stage.
+Stages that are not selected run under a no-op context.
+
+Both engines see only the thread that runs the stage (SIGPROF is delivered to
+the main thread; cProfile hooks the thread that enabled it). Stages that hand
+work to thread or process pools (`pooled_stages`: load_data with multi-part
+ingest, segments, charts) profile the dispatch and the waits, not the workers;
+their summary entry says so in "coverage".
+
+Usage:
+    from src.utils.profiler import profiler_from_config
+    profiler = profiler_from_config(cfg, out_dir="reports")
+    with profiler.stage("load_data"):
+        df = load_data(...)
+    profiler.write_summary()
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import signal
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.utils.helpers import account_output_path
+
+ENV_VAR = "KASPARRO_PROFILE"
+ALL_STAGES = ("*", "all", "1", "true", "yes")
+# stages whose work partly runs in thread / process pool workers, which neither engine samples
+POOLED_STAGES = ("load_data", "segments", "charts")
+COVERAGE_FULL = "stage thread"
+COVERAGE_POOLED = "stage thread only: work in pool workers is not profiled"
+
+
+def parse_stages(spec: Any) -> Optional[Iterable[str]]:
+    """None = profiling off, "*" = every stage, otherwise a set of stage names (list or comma string)."""
+    if spec is None or spec is False:
+        return None
+    if spec is True:
+        return "*"
+    if isinstance(spec, str):
+        spec = [s.strip() for s in spec.split(",") if s.strip()]
+    spec = [str(s) for s in spec]
+    if not spec or spec == ["0"] or spec == ["false"]:
+        return None
+    if any(s.lower() in ALL_STAGES for s in spec):
+        return "*"
+    return set(spec)
+
+
+class _StackSampler:
+    """SIGPROF-driven Python stack sampler (main thread, POSIX)."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[Any, str] = {}
+        self._last = 0.0
+        self._previous_handler = None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _handle(self, signum, frame) -> None:
+        now = time.process_time()
+        weight = max(1, int(round((now - self._last) / self.interval)))
+        self._last = now
+        stack = []
+        while frame is not None:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        self.counts[";".join(reversed(stack))] += weight
+        self.samples += 1
+
+    def start(self) -> None:
+        self._last = time.process_time()
+        self._previous_handler = signal.signal(signal.SIGPROF, self._handle)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+
+    def collapsed(self) -> List[str]:
+        return [f"{stack} {n}" for stack, n in self.counts.most_common()]
+
+    def top(self, n: int) -> List[Dict[str, Any]]:
+        total = sum(self.counts.values()) or 1
+        own: Counter = Counter()
+        inclusive: Counter = Counter()
+        for stack, count in self.counts.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for f in set(frames):
+                inclusive[f] += count
+        return [
+            {"function": f, "self_pct": own[f] / total * 100.0, "inclusive_pct": inclusive[f] / total * 100.0,
+             "self_seconds": own[f] * self.interval}
+            for f, _ in own.most_common(n)
+        ]
+
+
+class _CProfileEngine:
+    """Deterministic cProfile engine; collapsed output is caller;callee pairs weighted in µs."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.samples = 0
+
+    def start(self) -> None:
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+        self._stats = pstats.Stats(self.profile).stats
+        self.samples = sum(v[1] for v in self._stats.values())
+
+    @staticmethod
+    def _label(func: Tuple[str, int, str]) -> str:
+        filename, line, name = func
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    def collapsed(self) -> List[str]:
+        lines = []
+        for func, (_, _, _, _, callers) in self._stats.items():
+            for caller, (_, _, tt, _) in callers.items():
+                weight = int(round(tt * 1e6))
+                if weight > 0:
+                    lines.append(f"{self._label(caller)};{self._label(func)} {weight}")
+        return sorted(lines, key=lambda l: -int(l.rsplit(" ", 1)[1]))
+
+    def top(self, n: int) -> List[Dict[str, Any]]:
+        total = sum(v[2] for v in self._stats.values()) or 1.0
+        rows = sorted(self._stats.items(), key=lambda kv: -kv[1][2])[:n]
+        return [
+            {"function": self._label(func), "calls": nc, "self_pct": tt / total * 100.0,
+             "self_seconds": tt, "inclusive_seconds": ct}
+            for func, (_, nc, tt, ct, _) in rows
+        ]
+
+
+class StageProfiler:
+    """Profiles the selected stages of one run and writes their reports to `out_dir`."""
+
+    def __init__(self, out_dir: str, stages: Any = None, engine: str = "sampler",
+                 interval_ms: float = 5.0, top_n: int = 25, pooled_stages: Iterable[str] = POOLED_STAGES):
+        self.out_dir = out_dir
+        self.stages = parse_stages(stages)
+        self.pooled_stages = set(pooled_stages)
+        # the signal sampler needs SIGPROF (POSIX); fall back to cProfile elsewhere
+        self.engine = engine if engine == "cprofile" or hasattr(signal, "setitimer") else "cprofile"
+        self.interval = float(interval_ms) / 1000.0
+        self.top_n = int(top_n)
+        self.results: List[Dict[str, Any]] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.stages is not None
+
+    def selected(self, name: str) -> bool:
+        return self.stages == "*" or (self.stages is not None and name in self.stages)
+
+    def stage(self, name: str):
+        """Context manager profiling `name` when it is selected (a no-op otherwise)."""
+        return self._profile(name) if self.selected(name) else nullcontext()
+
+    @contextmanager
+    def _profile(self, name: str) -> Iterator[None]:
+        engine = _StackSampler(self.interval) if self.engine == "sampler" else _CProfileEngine()
+        t0 = time.perf_counter()
+        engine.start()
+        try:
+            yield
+        finally:
+            engine.stop()
+            self._write(name, engine, time.perf_counter() - t0)
+
+    def _write(self, name: str, engine, seconds: float) -> None:
+        os.makedirs(self.out_dir, exist_ok=True)
+        collapsed_path = os.path.join(self.out_dir, f"{name}.collapsed")
+        top_path = os.path.join(self.out_dir, f"{name}.top.txt")
+        with open(collapsed_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(engine.collapsed()) + "\n")
+        top = engine.top(self.top_n)
+        coverage = COVERAGE_POOLED if name in self.pooled_stages else COVERAGE_FULL
+        with open(top_path, "w", encoding="utf-8") as f:
+            f.write(f"# {name}: {seconds:.3f}s wall, engine={self.engine}, coverage: {coverage}\n")
+            f.write(f"{'self %':>7} {'self s':>8}  function\n")
+            for r in top:
+                f.write(f"{r['self_pct']:7.2f} {r['self_seconds']:8.3f}  {r['function']}\n")
+        self.results.append({
+            "stage": name, "seconds": seconds, "engine": self.engine, "coverage": coverage, "samples": engine.samples,
+            "collapsed": collapsed_path, "top": top_path, "hot": top[:5],
+        })
+
+    def write_summary(self) -> Optional[str]:
+        """summary.json over every profiled stage (slowest first); None when nothing was profiled."""
+        if not self.results:
+            return None
+        path = os.path.join(self.out_dir, "summary.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(sorted(self.results, key=lambda r: -r["seconds"]), f, indent=2)
+        return path
+
+
+def profiler_from_config(cfg: Dict[str, Any], out_dir: Optional[str] = None) -> StageProfiler:
+    """
+    Build the run's profiler. KASPARRO_PROFILE (e.g. "1" or "load_data,forecast")
+    overrides config `profiling.stages`; profiling is off unless one of them selects stages.
+    """
+    prof = cfg.get("profiling", {})
+    stages = prof.get("stages", "*") if prof.get("enabled", False) else None
+    env = os.environ.get(ENV_VAR)
+    if env is not None and env.strip():
+        stages = env
+    directory = account_output_path(cfg, prof.get("dir", "reports/profile"), out_dir)
+    return StageProfiler(directory, stages=stages, engine=prof.get("engine", "sampler"),
+                         interval_ms=prof.get("interval_ms", 5.0), top_n=prof.get("top_n", 25),
+                         pooled_stages=prof.get("pooled_stages", POOLED_STAGES))
@@ -1,10 +1,162 @@
 # src/utils/retry.py
-import time
+"""
+Retries with full-jitter exponential backoff, deadlines and a shared retry budget.
+
+- Backoff: attempt k waits uniform(0, min(max_delay, base_delay * backoff_factor**(k-1)))
+  ("full jitter"), so parallel readers failing together do not retry in lockstep.
+- Deadlines: a call may get its own deadline, and configure_retry / set_run_deadline
+  set one for the whole run; a retry whose wait would end past a deadline is not made.
+- Budget: every retry takes a token from a token bucket shared by all threads of the
+  process (RetryBudget); when a flaky mount makes everything fail, retries stop once
+  the bucket is empty instead of multiplying the load.
+- Forms: retry(func, ...) call, @retry_on_exception decorator (sync or async functions)
+  and async_retry for coroutines (waits with asyncio.sleep, never blocks the loop).
+- Stats: retries, give-ups and seconds spent waiting are counted process-wide
+  (retry_stats()); logger.timed_agent attaches each step's share to its record.
+
+Usage:
+    from src.utils.retry import retry, retry_on_exception
+    df = retry(pd.read_csv, args=(path,), kwargs={"encoding":"utf-8"}, retries=3)
+
+    @retry_on_exception(max_attempts=3, initial_wait=0.5, backoff_factor=2)
+    def read(path): ...
+"""
+
+import asyncio
+import functools
+import inspect
 import logging
-from typing import Callable, Any, Tuple
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
 
 logger = logging.getLogger("kasparro")
 
+
+class RetryBudget:
+    """Thread-safe token bucket: `capacity` retries in a burst, refilled at `refill_per_second`."""
+
+    def __init__(self, capacity: float = 20.0, refill_per_second: float = 1.0):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self._tokens = float(capacity)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.refill_per_second)
+            self._stamp = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            return min(self.capacity, self._tokens + (time.monotonic() - self._stamp) * self.refill_per_second)
+
+
+class RetryStats:
+    """Process-wide retry counters (thread-safe), overall and per function."""
+
+    FIELDS = ("retries", "gave_up", "budget_exhausted", "deadline_exceeded", "wait_seconds")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals: Dict[str, float] = dict.fromkeys(self.FIELDS, 0)
+            self._by_function: Dict[str, Dict[str, float]] = {}
+
+    def record(self, name: str, **deltas: float) -> None:
+        with self._lock:
+            per_fn = self._by_function.setdefault(name, dict.fromkeys(self.FIELDS, 0))
+            for k, v in deltas.items():
+                self._totals[k] += v
+                per_fn[k] += v
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._totals, "by_function": {k: dict(v) for k, v in self._by_function.items()}}
+
+
+STATS = RetryStats()
+_default_budget: Optional[RetryBudget] = RetryBudget()
+_run_deadline: Optional[float] = None  # time.monotonic() value
+
+
+def retry_stats() -> Dict[str, Any]:
+    """Snapshot of the process-wide counters: retries, gave_up, budget_exhausted, deadline_exceeded, wait_seconds."""
+    return STATS.snapshot()
+
+
+def reset_retry_stats() -> None:
+    STATS.reset()
+
+
+def set_run_deadline(seconds: Optional[float]) -> None:
+    """No retry of this process may wait past `seconds` from now (None clears the deadline)."""
+    global _run_deadline
+    _run_deadline = None if seconds is None else time.monotonic() + float(seconds)
+
+
+def configure_retry(cfg: Dict[str, Any]) -> None:
+    """Shared budget and run deadline from config `runtime.retry`."""
+    global _default_budget
+    rc = cfg.get("runtime", {}).get("retry", {})
+    capacity = rc.get("budget_tokens", 20)
+    _default_budget = RetryBudget(capacity, rc.get("budget_refill_per_s", 1.0)) if capacity is not None else None
+    set_run_deadline(rc.get("run_deadline_s"))
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float, backoff_factor: float = 2.0,
+                  jitter: bool = True) -> float:
+    """Wait before retry number `attempt` (1-based): capped exponential, full jitter by default."""
+    ceiling = min(max_delay, base_delay * backoff_factor ** (attempt - 1))
+    return random.uniform(0.0, ceiling) if jitter else ceiling
+
+
+class _Attempts:
+    """Retry bookkeeping shared by the sync and async loops."""
+
+    def __init__(self, func: Callable, retries: int, base_delay: float, max_delay: float, backoff_factor: float,
+                 jitter: bool, deadline: Optional[float], budget: Optional[RetryBudget]):
+        self.name = getattr(func, "__qualname__", getattr(func, "__name__", str(func)))
+        self.retries = retries
+        self.base_delay, self.max_delay, self.backoff_factor, self.jitter = base_delay, max_delay, backoff_factor, jitter
+        deadlines = [d for d in (_run_deadline, None if deadline is None else time.monotonic() + deadline) if d is not None]
+        self.deadline = min(deadlines) if deadlines else None
+        self.budget = _default_budget if budget is None else budget
+        self.attempt = 0
+
+    def on_failure(self, error: BaseException) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None to give up (the caller re-raises)."""
+        self.attempt += 1
+        if self.attempt > self.retries:
+            logger.error("Retry: all %d attempts failed for %s. Raising.", self.retries, self.name)
+            STATS.record(self.name, gave_up=1)
+            return None
+        wait = backoff_delay(self.attempt, self.base_delay, self.max_delay, self.backoff_factor, self.jitter)
+        if self.deadline is not None and time.monotonic() + wait > self.deadline:
+            logger.error("Retry: deadline reached for %s after %d attempts. Raising.", self.name, self.attempt)
+            STATS.record(self.name, gave_up=1, deadline_exceeded=1)
+            return None
+        if self.budget is not None and not self.budget.try_acquire():
+            logger.error("Retry: retry budget exhausted for %s after %d attempts. Raising.", self.name, self.attempt)
+            STATS.record(self.name, gave_up=1, budget_exhausted=1)
+            return None
+        logger.warning("Retry attempt %d/%d for %s after error: %s. Waiting %.2fs",
+                       self.attempt, self.retries, self.name, error, wait)
+        STATS.record(self.name, retries=1, wait_seconds=wait)
+        return wait
+
+
 def retry(
     func: Callable,
     args: Tuple = (),
@@ -13,9 +165,14 @@ def retry(
     base_delay: float = 1.0,
     max_delay: float = 10.0,
     exceptions: Tuple = (Exception,),
+    *,
+    backoff_factor: float = 2.0,
+    jitter: bool = True,
+    deadline: Optional[float] = None,
+    budget: Optional[RetryBudget] = None,
 ) -> Any:
     """
-    Simple retry with exponential backoff.
+    Call func(*args, **kwargs), retrying on `exceptions` with full-jitter exponential backoff.
 
     Usage:
         from src.utils.retry import retry
@@ -29,20 +186,75 @@ def retry(
     - base_delay: initial backoff in seconds
     - max_delay: maximum backoff in seconds
     - exceptions: tuple of exception classes to catch and retry on
+    - backoff_factor: growth of the backoff ceiling per attempt
+    - jitter: full jitter (False: wait the ceiling itself)
+    - deadline: seconds from now after which no retry is made (the run deadline also applies)
+    - budget: token bucket to draw retries from (default: the process-wide shared budget)
+    The last error is re-raised when retries, the deadline or the budget run out.
     """
     if kwargs is None:
         kwargs = {}
-
-    attempt = 0
+    attempts = _Attempts(func, retries, base_delay, max_delay, backoff_factor, jitter, deadline, budget)
     while True:
         try:
             return func(*args, **kwargs)
         except exceptions as e:
-            attempt += 1
-            if attempt > retries:
-                logger.error("Retry: all %d attempts failed for %s. Raising.", retries, getattr(func, "__name__", str(func)))
+            wait = attempts.on_failure(e)
+            if wait is None:
                 raise
-            wait = min(max_delay, base_delay * (2 ** (attempt - 1)))
-            logger.warning("Retry attempt %d/%d for %s after error: %s. Waiting %.1fs",
-                           attempt, retries, getattr(func, "__name__", str(func)), e, wait)
             time.sleep(wait)
+
+
+async def async_retry(
+    func: Callable[..., Awaitable[Any]],
+    args: Tuple = (),
+    kwargs: dict = None,
+    retries: int = 3,
+    base_delay: float = 1.0,
+    max_delay: float = 10.0,
+    exceptions: Tuple = (Exception,),
+    *,
+    backoff_factor: float = 2.0,
+    jitter: bool = True,
+    deadline: Optional[float] = None,
+    budget: Optional[RetryBudget] = None,
+) -> Any:
+    """retry() for coroutine functions: awaits func(*args, **kwargs) and waits with asyncio.sleep."""
+    if kwargs is None:
+        kwargs = {}
+    attempts = _Attempts(func, retries, base_delay, max_delay, backoff_factor, jitter, deadline, budget)
+    while True:
+        try:
+            return await func(*args, **kwargs)
+        except exceptions as e:
+            wait = attempts.on_failure(e)
+            if wait is None:
+                raise
+            await asyncio.sleep(wait)
+
+
+def retry_on_exception(max_attempts: int = 3, initial_wait: float = 0.5, backoff_factor: float = 2.0,
+                       max_wait: float = 10.0, exceptions: Tuple = (Exception,), jitter: bool = True,
+                       deadline: Optional[float] = None, budget: Optional[RetryBudget] = None):
+    """
+    Decorator form: at most `max_attempts` calls in total. Works on plain and async functions.
+
+        @retry_on_exception(max_attempts=3, initial_wait=0.5, backoff_factor=2)
+        def safe_read_csv(path): ...
+    """
+    options = dict(retries=max(0, int(max_attempts) - 1), base_delay=initial_wait, max_delay=max_wait,
+                   exceptions=exceptions, backoff_factor=backoff_factor, jitter=jitter, deadline=deadline, budget=budget)
+
+    def _decorate(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def _async_wrapper(*args, **kwargs):
+                return await async_retry(fn, args, kwargs, **options)
+            return _async_wrapper
+
+        @functools.wraps(fn)
+        def _wrapper(*args, **kwargs):
+            return retry(fn, args, kwargs, **options)
+        return _wrapper
+
+    return _decorate
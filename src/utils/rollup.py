@@ -0,0 +1,158 @@
+# src/utils/rollup.py
+"""
+Single-pass multi-dimensional rollup (GROUPING SETS / CUBE / ROLLUP) engine.
+
+All dimension columns are dictionary-encoded once. One pass over the rows
+aggregates the five base metrics at the finest grain (the union of all requested
+dimensions); every requested grouping set is then derived from that much smaller
+finest-grain aggregate. Ratios (ctr/cpc/cpa/roas) are computed from the sums.
+
+Usage:
+    from src.utils.rollup import compute_grouping_sets, cube, rollup
+    sets = [("campaign_name",), ("platform", "country")] + cube(["audience_type", "creative_type"])
+    out = compute_grouping_sets(df, sets)
+    out["platform x country"]   # DataFrame: platform, country, spend, ..., roas, rows
+"""
+
+from itertools import combinations
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.utils.frame_guard import factorized
+from src.utils.prefix_sums import BASE_METRICS, derive_kpi_arrays
+
+TOTAL = "total"
+
+# finest-grain key spaces up to this size are aggregated densely (no sort)
+DENSE_KEY_LIMIT = 1 << 16
+
+
+def cube(dims: Sequence[str]) -> List[Tuple[str, ...]]:
+    """Every subset of dims (CUBE), including the grand total ()."""
+    dims = list(dims)
+    return [tuple(c) for r in range(len(dims), -1, -1) for c in combinations(dims, r)]
+
+
+def rollup(dims: Sequence[str]) -> List[Tuple[str, ...]]:
+    """Hierarchical prefixes of dims (ROLLUP), down to the grand total ()."""
+    dims = list(dims)
+    return [tuple(dims[:i]) for i in range(len(dims), -1, -1)]
+
+
+def parse_grouping_sets(spec: Sequence[Any]) -> List[Tuple[str, ...]]:
+    """
+    Config spec -> list of grouping sets. Entries are lists of dims, or
+    {"cube": [...]} / {"rollup": [...]}. Duplicates are removed, order kept.
+    """
+    out: List[Tuple[str, ...]] = []
+    for entry in spec or []:
+        if isinstance(entry, Mapping):
+            if "cube" in entry:
+                sets = cube(entry["cube"])
+            elif "rollup" in entry:
+                sets = rollup(entry["rollup"])
+            else:
+                raise ValueError(f"Unknown grouping set spec: {entry}")
+        elif isinstance(entry, str):
+            sets = [(entry,)]
+        else:
+            sets = [tuple(entry)]
+        for s in sets:
+            if s not in out:
+                out.append(s)
+    return out
+
+
+def set_name(dims: Sequence[str]) -> str:
+    return " x ".join(dims) if dims else TOTAL
+
+
+def _bincount_all(inverse: np.ndarray, values: np.ndarray, metrics: List[str], n_groups: int):
+    sums = {m: np.bincount(inverse, weights=values[:, i], minlength=n_groups) for i, m in enumerate(metrics)}
+    return sums, np.bincount(inverse, minlength=n_groups).astype(np.int64)
+
+
+def compute_grouping_sets(df: pd.DataFrame, grouping_sets: Sequence[Sequence[str]],
+                          metrics: Sequence[str] = BASE_METRICS,
+                          extra_dims: Optional[Dict[str, pd.Series]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Aggregate `metrics` for every grouping set in one pass over the rows.
+
+    `extra_dims` adds dimensions that are not columns of df (e.g. a window label),
+    so callers never have to modify the input frame. Rows whose extra dimension is
+    missing are excluded everywhere; missing values of regular dimensions are
+    dropped only from the sets that group by them (like pandas groupby).
+    """
+    extra_dims = extra_dims or {}
+    metrics = list(metrics)
+    dims: List[str] = []
+    for s in grouping_sets:
+        for d in s:
+            if d not in dims:
+                dims.append(d)
+
+    # 1) encode every dimension once (missing -> its own code, flagged)
+    n_rows = len(df)
+    keep = np.ones(n_rows, dtype=bool)
+    codes, labels, missing_code = {}, {}, {}
+    for d in dims:
+        c, uniq = pd.factorize(extra_dims[d], sort=True) if d in extra_dims else factorized(df, d)
+        if d in extra_dims:
+            keep &= c >= 0
+        missing_code[d] = len(uniq)
+        codes[d] = np.where(c >= 0, c, len(uniq)).astype(np.int64)
+        labels[d] = uniq
+
+    # 2) one pass at the finest grain: mixed-radix key over all dims
+    radix = [missing_code[d] + 1 for d in dims]
+    values = df[metrics].fillna(0).to_numpy(dtype=float)[keep]
+    key_space = float(np.prod([float(r) for r in radix]))
+    if key_space < 2 ** 62:
+        key = np.zeros(int(keep.sum()), dtype=np.int64)
+        for d, r in zip(dims, radix):
+            key = key * r + codes[d][keep]
+        if key_space <= max(DENSE_KEY_LIMIT, 2 * len(key)):
+            # dense key space: bincount straight over the key, no sort
+            counts = np.bincount(key, minlength=int(key_space))
+            group_keys = np.flatnonzero(counts)
+            fine_sums = {m: np.bincount(key, weights=values[:, i], minlength=int(key_space))[group_keys]
+                         for i, m in enumerate(metrics)}
+            fine_rows = counts[group_keys].astype(np.int64)
+        else:
+            group_keys, inverse = np.unique(key, return_inverse=True)
+            fine_sums, fine_rows = _bincount_all(inverse, values, metrics, len(group_keys))
+        fine_codes = {}
+        rest = group_keys.copy()
+        for d, r in reversed(list(zip(dims, radix))):
+            fine_codes[d] = rest % r
+            rest //= r
+    else:
+        stacked = np.column_stack([codes[d][keep] for d in dims])
+        group_rows, inverse = np.unique(stacked, axis=0, return_inverse=True)
+        fine_codes = {d: group_rows[:, i] for i, d in enumerate(dims)}
+        fine_sums, fine_rows = _bincount_all(inverse.ravel(), values, metrics, len(group_rows))
+    n_fine = len(fine_rows)
+
+    # 3) every grouping set from the finest-grain aggregate
+    out: Dict[str, pd.DataFrame] = {}
+    for s in grouping_sets:
+        s = tuple(s)
+        mask = np.ones(n_fine, dtype=bool)
+        for d in s:
+            if d not in extra_dims:
+                mask &= fine_codes[d] != missing_code[d]
+        if s:
+            sub = np.column_stack([fine_codes[d][mask] for d in s])
+            uniq_rows, inv = np.unique(sub, axis=0, return_inverse=True)
+            inv = inv.ravel()
+        else:
+            uniq_rows, inv = np.zeros((1 if mask.any() else 0, 0), dtype=np.int64), np.zeros(int(mask.sum()), dtype=np.int64)
+        n_groups = len(uniq_rows)
+        sums = {m: np.bincount(inv, weights=fine_sums[m][mask], minlength=n_groups) for m in metrics}
+        frame = {d: np.asarray(labels[d])[uniq_rows[:, i]] for i, d in enumerate(s)}
+        frame.update(derive_kpi_arrays(sums) if set(BASE_METRICS) <= set(metrics) else sums)
+        frame["rows"] = np.bincount(inv, weights=fine_rows[mask], minlength=n_groups).astype(np.int64)
+        out[set_name(s)] = pd.DataFrame(frame)
+    return out
@@ -0,0 +1,285 @@
+# src/utils/run_history.py
+"""
+Indexed SQLite run-history store.
+
+Every run appends its plan, window metrics, validated hypotheses and creatives
+in a single transaction. Indexes on run time, dataset fingerprint, campaign and
+metric keep history and diff queries in the millisecond range over thousands of runs.
+
+Usage:
+    from src.utils.run_history import RunHistory
+    history = RunHistory("reports/run_history.sqlite")
+    run_id = history.record_run(query, dataset_path, plan, insight_result, validated, creatives)
+    history.hypothesis_history("CTR fell")
+
+CLI:
+    python -m src.utils.run_history runs
+    python -m src.utils.run_history history "CTR fell" [--campaign NAME]
+    python -m src.utils.run_history diff RUN_A RUN_B
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.utils.helpers import file_fingerprint
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_at TEXT NOT NULL,
+    query TEXT,
+    dataset_path TEXT,
+    dataset_fingerprint TEXT,
+    plan_json TEXT
+);
+CREATE TABLE IF NOT EXISTS window_metrics (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    horizon TEXT NOT NULL,
+    campaign TEXT,
+    metric TEXT NOT NULL,
+    recent REAL,
+    previous REAL,
+    pct_change REAL
+);
+CREATE TABLE IF NOT EXISTS hypotheses (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    hypothesis TEXT NOT NULL,
+    metric TEXT,
+    campaign TEXT,
+    confidence REAL,
+    validated INTEGER,
+    evidence TEXT,
+    type TEXT
+);
+CREATE TABLE IF NOT EXISTS creatives (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    campaign TEXT,
+    rank INTEGER,
+    idea TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_runs_run_at ON runs(run_at);
+CREATE INDEX IF NOT EXISTS ix_runs_fingerprint ON runs(dataset_fingerprint, run_at);
+CREATE INDEX IF NOT EXISTS ix_metrics_run ON window_metrics(run_id, horizon, metric);
+CREATE INDEX IF NOT EXISTS ix_metrics_metric ON window_metrics(metric, campaign, run_id);
+CREATE INDEX IF NOT EXISTS ix_hyp_text ON hypotheses(hypothesis, run_id);
+CREATE INDEX IF NOT EXISTS ix_hyp_campaign_metric ON hypotheses(campaign, metric, run_id);
+CREATE INDEX IF NOT EXISTS ix_creatives_campaign ON creatives(campaign, run_id);
+"""
+
+# hypotheses are compared across runs by text and by what they are about
+HYPOTHESIS_KEY = ("hypothesis", "campaign", "metric", "type")
+
+
+def dataset_fingerprint(path: str) -> str:
+    """Content-based fingerprint (size + head/tail hash); mtime is ignored on purpose."""
+    fp = file_fingerprint(path)
+    return f"{fp['size']}:{fp['probe_sha1']}"
+
+
+class RunHistory:
+    def __init__(self, db_path: str = "reports/run_history.sqlite"):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        # WAL lets readers (CLI) run while a pipeline is writing
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        # databases created before hypotheses carried their type
+        if "type" not in {r["name"] for r in self.conn.execute("PRAGMA table_info(hypotheses)")}:
+            with self.conn:
+                self.conn.execute("ALTER TABLE hypotheses ADD COLUMN type TEXT")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def record_run(self, query: str, dataset_path: str, plan: Dict[str, Any], insight_result: Dict[str, Any],
+                   validated: Iterable[Dict[str, Any]], creatives: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Append one run; all rows are written in a single transaction. Returns the run_id.
+        `validated` may be a stream (e.g. iter_ndjson of insights.ndjson): it is consumed once.
+        """
+        fingerprint = dataset_fingerprint(dataset_path) if os.path.exists(dataset_path) else None
+        run_at = datetime.now(timezone.utc).isoformat()
+
+        metric_rows = []
+        windows = {"lookback": insight_result}
+        windows.update(insight_result.get("horizons", {}))
+        for horizon, w in windows.items():
+            recent, previous = w.get("recent_window", {}), w.get("previous_window", {})
+            for metric, change in w.get("percent_changes", {}).items():
+                metric_rows.append((horizon, None, metric, _num(recent.get(metric)), _num(previous.get(metric)), _num(change)))
+            for campaign, changes in (w.get("segments") or {}).items():
+                for metric, change in changes.items():
+                    metric_rows.append((horizon, str(campaign), metric, None, None, _num(change)))
+
+        hyp_rows = [
+            (h.get("hypothesis"), h.get("metric"), h.get("campaign"), _num(h.get("confidence")),
+             int(bool(h.get("validated"))), h.get("evidence") if isinstance(h.get("evidence"), str) else json.dumps(h.get("evidence"), default=str),
+             h.get("type"))
+            for h in validated
+        ]
+        creative_rows = []
+        if creatives and creatives.get("ideas"):
+            creative_rows = [(creatives.get("campaign_name"), i, idea) for i, idea in enumerate(creatives["ideas"], 1)]
+
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO runs (run_at, query, dataset_path, dataset_fingerprint, plan_json) VALUES (?, ?, ?, ?, ?)",
+                (run_at, query, dataset_path, fingerprint, json.dumps(plan, default=str)),
+            )
+            run_id = cur.lastrowid
+            self.conn.executemany(
+                "INSERT INTO window_metrics VALUES (?, ?, ?, ?, ?, ?, ?)", [(run_id,) + r for r in metric_rows]
+            )
+            self.conn.executemany(
+                "INSERT INTO hypotheses (run_id, hypothesis, metric, campaign, confidence, validated, evidence, type) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [(run_id,) + r for r in hyp_rows]
+            )
+            self.conn.executemany(
+                "INSERT INTO creatives VALUES (?, ?, ?, ?)", [(run_id,) + r for r in creative_rows]
+            )
+        return int(run_id)
+
+    def runs(self, limit: int = 20, fingerprint: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most recent runs, optionally restricted to one dataset fingerprint."""
+        sql = "SELECT run_id, run_at, query, dataset_path, dataset_fingerprint FROM runs"
+        args: List[Any] = []
+        if fingerprint:
+            sql += " WHERE dataset_fingerprint = ?"
+            args.append(fingerprint)
+        sql += " ORDER BY run_at DESC LIMIT ?"
+        args.append(limit)
+        return [dict(r) for r in self.conn.execute(sql, args)]
+
+    def hypothesis_history(self, hypothesis: str, campaign: Optional[str] = None,
+                           limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        How the confidence of a hypothesis evolved across runs (newest first).
+        `hypothesis` is an exact text or a case-sensitive prefix ending in '%'; both are
+        answered from the text index (a prefix becomes a range, LIKE would scan the table).
+        """
+        sql = (
+            "SELECT r.run_id, r.run_at, h.hypothesis, h.campaign, h.metric, h.type, h.confidence, h.validated, "
+            "h.evidence FROM hypotheses h JOIN runs r ON r.run_id = h.run_id"
+        )
+        args: List[Any] = []
+        if not hypothesis.endswith("%"):
+            sql += " WHERE h.hypothesis = ?"
+            args.append(hypothesis)
+        else:
+            prefix = hypothesis[:-1]
+            upper = _prefix_upper_bound(prefix)
+            sql += " WHERE h.hypothesis >= ?"
+            args.append(prefix)
+            if upper is not None:
+                sql += " AND h.hypothesis < ?"
+                args.append(upper)
+        if campaign is not None:
+            sql += " AND h.campaign = ?"
+            args.append(campaign)
+        sql += " ORDER BY r.run_at DESC LIMIT ?"
+        args.append(limit)
+        return [dict(r) for r in self.conn.execute(sql, args)]
+
+    def diff_runs(self, run_a: int, run_b: int) -> Dict[str, Any]:
+        """Metric and hypothesis differences between two runs (b relative to a)."""
+        metrics = [
+            dict(r) for r in self.conn.execute(
+                """
+                SELECT b.horizon, b.campaign, b.metric, a.pct_change AS pct_change_a, b.pct_change AS pct_change_b,
+                       b.pct_change - a.pct_change AS delta
+                FROM window_metrics b
+                JOIN window_metrics a ON a.run_id = ? AND a.horizon = b.horizon AND a.metric = b.metric
+                     AND a.campaign IS b.campaign
+                WHERE b.run_id = ? AND b.campaign IS NULL
+                ORDER BY b.horizon, b.metric
+                """,
+                (run_a, run_b),
+            )
+        ]
+        # the same text can be about different campaigns / metrics (e.g. one funnel driver per segment)
+        rows_a, rows_b = self._hypotheses(run_a), self._hypotheses(run_b)
+        changed = [
+            {**_key_dict(k), "confidence_a": rows_a[k]["confidence"], "confidence_b": rows_b[k]["confidence"],
+             "validated_a": bool(rows_a[k]["validated"]), "validated_b": bool(rows_b[k]["validated"])}
+            for k in rows_a.keys() & rows_b.keys()
+            if rows_a[k]["confidence"] != rows_b[k]["confidence"] or rows_a[k]["validated"] != rows_b[k]["validated"]
+        ]
+        return {
+            "metrics": metrics,
+            "hypotheses_added": [_key_dict(k) for k in sorted(rows_b.keys() - rows_a.keys(), key=_sort_key)],
+            "hypotheses_removed": [_key_dict(k) for k in sorted(rows_a.keys() - rows_b.keys(), key=_sort_key)],
+            "hypotheses_changed": sorted(changed, key=lambda d: _sort_key(tuple(d[c] for c in HYPOTHESIS_KEY))),
+        }
+
+    def _hypotheses(self, run_id: int) -> Dict[tuple, Dict[str, Any]]:
+        cols = ", ".join(HYPOTHESIS_KEY)
+        return {
+            tuple(r[c] for c in HYPOTHESIS_KEY): dict(r)
+            for r in self.conn.execute(f"SELECT {cols}, confidence, validated FROM hypotheses WHERE run_id = ?", (run_id,))
+        }
+
+
+def _key_dict(key: tuple) -> Dict[str, Any]:
+    return dict(zip(HYPOTHESIS_KEY, key))
+
+
+def _sort_key(key: tuple) -> tuple:
+    return tuple("" if v is None else str(v) for v in key)
+
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """Smallest string greater than every string starting with `prefix` (None: no upper bound)."""
+    while prefix and prefix[-1] == chr(0x10FFFF):
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    nxt = ord(prefix[-1]) + 1
+    if 0xD800 <= nxt <= 0xDFFF:  # surrogates cannot be stored; UTF-8 order continues at U+E000
+        nxt = 0xE000
+    return prefix[:-1] + chr(nxt)
+
+
+def _num(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Query the pipeline run history")
+    parser.add_argument("--db", default="reports/run_history.sqlite")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_runs = sub.add_parser("runs", help="list recent runs")
+    p_runs.add_argument("--limit", type=int, default=20)
+    p_hist = sub.add_parser("history", help="confidence of a hypothesis over time (use a trailing %% for prefix match)")
+    p_hist.add_argument("hypothesis")
+    p_hist.add_argument("--campaign")
+    p_hist.add_argument("--limit", type=int, default=100)
+    p_diff = sub.add_parser("diff", help="diff two runs")
+    p_diff.add_argument("run_a", type=int)
+    p_diff.add_argument("run_b", type=int)
+    args = parser.parse_args(argv)
+
+    history = RunHistory(args.db)
+    try:
+        if args.cmd == "runs":
+            out: Any = history.runs(limit=args.limit)
+        elif args.cmd == "history":
+            out = history.hypothesis_history(args.hypothesis, campaign=args.campaign, limit=args.limit)
+        else:
+            out = history.diff_runs(args.run_a, args.run_b)
+    finally:
+        history.close()
+    print(json.dumps(out, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# src/utils/sampling.py
+"""
+Single-pass stratified reservoir sampling over a stream of DataFrame chunks.
+
+Every row gets a seeded random key. Two bounded reservoirs are kept while streaming:
+- the lowest-key row of each stratum (one representative per stratum, at most n strata)
+- the n lowest-key rows overall (a uniform bottom-k reservoir)
+The final sample takes all representatives first, so every stratum is covered when
+there are no more strata than n, and fills up to n from the uniform reservoir, which
+keeps strata roughly proportional to their size. Memory stays at O(n) plus one chunk.
+
+Usage:
+    from src.utils.sampling import sample_csv
+    df = sample_csv("data/ads.csv", n=1000, strata=["campaign_name", "date"], seed=42)
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.utils.ingest import expand_parts, iter_csv, read_parts
+
+_KEY = "_sample_key"
+_ROW = "_sample_row"
+_STRATUM = "_sample_stratum"
+
+
+def filter_chunks(chunks: Iterable[pd.DataFrame], filters: Optional[Dict[str, List[str]]]) -> Iterator[pd.DataFrame]:
+    """Keep only the rows whose value of every filtered column is one of its listed values."""
+    for chunk in chunks:
+        if filters:
+            mask = np.ones(len(chunk), dtype=bool)
+            for col, values in filters.items():
+                mask &= chunk[col].isin(values).to_numpy()
+            chunk = chunk[mask]
+        yield chunk
+
+
+def stratified_stream_sample(chunks: Iterable[pd.DataFrame], n: int, strata: Sequence[str],
+                             seed: int = 42) -> pd.DataFrame:
+    """
+    Sample `n` rows from an iterable of chunks in one pass, stratified by `strata` columns.
+    Deterministic for a given seed and chunk sequence; rows keep their original order.
+    """
+    rng = np.random.default_rng(seed)
+    strata = list(strata)
+    kept: Optional[pd.DataFrame] = None
+    offset = 0
+
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        chunk = chunk.copy()
+        chunk[_KEY] = rng.random(len(chunk))
+        chunk[_ROW] = np.arange(offset, offset + len(chunk))
+        chunk[_STRATUM] = pd.util.hash_pandas_object(chunk[strata], index=False).to_numpy() if strata else 0
+        offset += len(chunk)
+
+        candidates = chunk if kept is None else pd.concat([kept, chunk], ignore_index=True)
+        reps = candidates.loc[candidates.groupby(_STRATUM)[_KEY].idxmin()]
+        if len(reps) > n:
+            reps = reps.nsmallest(n, _KEY)
+        bottom = candidates.nsmallest(n, _KEY)
+        kept = pd.concat([reps, bottom]).drop_duplicates(_ROW).reset_index(drop=True)
+
+    if kept is None:
+        return pd.DataFrame()
+
+    reps = kept.loc[kept.groupby(_STRATUM)[_KEY].idxmin()].nsmallest(n, _KEY)
+    fill = kept[~kept[_ROW].isin(reps[_ROW])].nsmallest(max(0, n - len(reps)), _KEY)
+    out = pd.concat([reps, fill]).sort_values(_ROW)
+    return out.drop(columns=[_KEY, _ROW, _STRATUM]).reset_index(drop=True)
+
+
+def sample_csv(path: str, n: int, strata: Optional[Sequence[str]] = None, seed: int = 42,
+               chunksize: int = 50_000, usecols: Optional[List[str]] = None, scanner=None,
+               filters: Optional[Dict[str, List[str]]] = None) -> pd.DataFrame:
+    """
+    Stream a CSV (or compressed file / glob of parts, see src/utils/ingest.py) in chunks and
+    return a stratified sample of `n` rows.
+    Strata columns are read even when they are not part of `usecols`, then dropped.
+    If `filters` ({column: allowed values}) is given, only matching rows are sampled.
+    If `scanner` (a DataQualityScanner) is given, every chunk is scanned before sampling.
+    """
+    strata = list(strata or [])
+    read_cols = None
+    if usecols is not None:
+        read_cols = list(usecols) + [c for c in list(strata) + list(filters or {}) if c not in usecols]
+    chunks = filter_chunks(read_parts(expand_parts(path), lambda p: iter_csv(p, usecols=read_cols, chunksize=chunksize)),
+                           filters)
+    if scanner is not None:
+        chunks = scanner.scan_chunks(chunks)
+    df = stratified_stream_sample(chunks, n=n, strata=strata, seed=seed)
+    if usecols is not None:
+        df = df[[c for c in df.columns if c in usecols]]
+    return df
@@ -1,5 +1,5 @@
 # src/utils/schema.py
-from typing import Set
+from typing import Any, Dict, Iterable, Optional, Set
 import logging
 
 logger = logging.getLogger("kasparro")
@@ -14,16 +14,28 @@ REQUIRED_COLUMNS: Set[str] = {
     "revenue"
 }
 
-def validate_schema(df_columns) -> None:
+def check_schema(df_columns, required: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Non-raising schema check (the single implementation; helpers.validate_schema delegates here).
+    Returns {ok: bool, missing: [...], extra: [...]}.
+    """
+    required_set = set(required) if required is not None else REQUIRED_COLUMNS
+    present = set(df_columns)
+    missing = sorted(required_set - present)
+    return {"ok": not missing, "missing": missing, "extra": sorted(present - required_set)}
+
+
+def validate_schema(df_columns, required: Optional[Iterable[str]] = None) -> None:
     """
     Validates whether the dataset contains the required columns.
     Raises ValueError if columns are missing.
     Logs success when everything matches.
+    Row-level checks (value ranges, duplicates) live in src.utils.data_quality.
 
     Usage:
         validate_schema(df.columns)
     """
-    missing = REQUIRED_COLUMNS - set(df_columns)
+    missing = set(check_schema(df_columns, required)["missing"])
 
     if missing:
         logger.error("Schema validation failed. Missing columns: %s", missing)
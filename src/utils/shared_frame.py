@@ -0,0 +1,186 @@
+# src/utils/shared_frame.py
+"""
+Shared-memory execution backend for per-segment analysis.
+
+The parent publishes the numeric columns, the segment dictionary codes and a day
+index of the loaded frame ONCE into multiprocessing.shared_memory blocks (rows
+sorted by segment, so each segment is a contiguous row range). Workers attach
+zero-copy NumPy views, run the InsightAgent/EvaluatorAgent logic on their
+assigned segment ranges and send back only small result records.
+
+Usage:
+    from src.utils.shared_frame import analyze_segments
+    records = analyze_segments(df, "campaign_name", cfg, workers=4)
+    for record in iter_segments(df, "campaign_name", cfg):   # streamed as workers finish
+        ...
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.utils.frame_guard import factorized, parsed_dates
+from src.utils.helpers import available_cores
+from src.utils.prefix_sums import BASE_METRICS, derive_kpis
+
+
+class SharedFrame:
+    """Column arrays of a frame published in shared memory, described by a picklable spec."""
+
+    def __init__(self, spec: Dict[str, Any], blocks: List[shared_memory.SharedMemory], owner: bool):
+        self.spec = spec
+        self._blocks = blocks
+        self._owner = owner
+        self.arrays = {
+            name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            for (name, (_, shape, dtype)), block in zip(spec["arrays"].items(), blocks)
+        }
+
+    @classmethod
+    def publish(cls, arrays: Dict[str, np.ndarray]) -> "SharedFrame":
+        """Copy each array once into its own shared memory block."""
+        blocks, spec = [], {"arrays": {}}
+        for name, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            block = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)[...] = arr
+            blocks.append(block)
+            spec["arrays"][name] = (block.name, arr.shape, arr.dtype.str)
+        return cls(spec, blocks, owner=True)
+
+    @classmethod
+    def attach(cls, spec: Dict[str, Any]) -> "SharedFrame":
+        """Attach zero-copy views in a worker process."""
+        blocks = []
+        for block_name, _, _ in spec["arrays"].values():
+            # workers share the parent's resource tracker, and only the owner unlinks
+            blocks.append(shared_memory.SharedMemory(name=block_name))
+        return cls(spec, blocks, owner=False)
+
+    def close(self) -> None:
+        self.arrays = {}
+        for block in self._blocks:
+            block.close()
+            if self._owner:
+                block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_segment_arrays(df: pd.DataFrame, segment_col: str, metrics: Sequence[str] = BASE_METRICS):
+    """
+    Encode the frame for publishing: rows sorted by segment code, a day index,
+    the base metrics as float64 and per-segment row offsets.
+    Returns (arrays, segment_values).
+    """
+    codes, uniques = factorized(df, segment_col)
+    # rows without a segment value (code -1) are left out
+    order = np.flatnonzero(codes >= 0)
+    order = order[np.argsort(codes[order], kind="stable")]
+    codes = codes[order]
+    all_dates = parsed_dates(df).to_numpy()
+    day = ((all_dates[order] - all_dates.min()) // np.timedelta64(1, "D")).astype(np.int32)
+    arrays = {"day": day, "codes": codes.astype(np.int32)}
+    for m in metrics:
+        arrays[m] = df[m].to_numpy(dtype=float)[order]
+    arrays["offsets"] = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(uniques)))]).astype(np.int64)
+    return arrays, uniques
+
+
+def _analyze_range(arrays: Dict[str, np.ndarray], seg_lo: int, seg_hi: int, config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """InsightAgent + EvaluatorAgent logic over segments [seg_lo, seg_hi); returns compact records."""
+    from src.agents.insight_agent import InsightAgent
+    from src.agents.evaluator_agent import EvaluatorAgent
+
+    insight = InsightAgent(config)
+    evaluator = EvaluatorAgent(config)
+    lookback = int(insight.lookback_days)
+    last = int(arrays["day"].max()) if arrays["day"].size else 0
+    offsets = arrays["offsets"]
+    records = []
+
+    for seg in range(seg_lo, seg_hi):
+        a, b = int(offsets[seg]), int(offsets[seg + 1])
+        day = arrays["day"][a:b]
+        recent_mask = day >= last - lookback
+        prev_mask = (day < last - lookback) & (day >= last - 2 * lookback)
+        recent = derive_kpis({m: float(np.nansum(arrays[m][a:b][recent_mask])) for m in BASE_METRICS})
+        previous = derive_kpis({m: float(np.nansum(arrays[m][a:b][prev_mask])) for m in BASE_METRICS})
+        changes = {k: insight._percent_change(recent[k], previous[k]) for k in recent}
+        validated = evaluator.validate({
+            "recent_window": recent,
+            "previous_window": previous,
+            "percent_changes": changes,
+            "hypotheses": insight._generate_hypotheses(recent, previous),
+        })
+        hits = [v for v in validated if v["validated"]]
+        records.append({
+            "segment_code": seg,
+            "rows": b - a,
+            "recent_roas": recent["roas"],
+            "previous_roas": previous["roas"],
+            "roas_change_pct": changes["roas"],
+            "ctr_change_pct": changes["ctr"],
+            "spend_change_pct": changes["spend"],
+            "validated": [v["hypothesis"] for v in hits],
+            "top_confidence": max((v["confidence"] for v in validated), default=0.0),
+        })
+    return records
+
+
+def _worker(job) -> List[Dict[str, Any]]:
+    spec, seg_lo, seg_hi, config = job
+    frame = SharedFrame.attach(spec)
+    try:
+        return _analyze_range(frame.arrays, seg_lo, seg_hi, config)
+    finally:
+        frame.close()
+
+
+def iter_segments(df: pd.DataFrame, segment_col: str, config: Dict[str, Any],
+                  workers: Optional[int] = None, ranges_per_worker: int = 4) -> Iterator[Dict[str, Any]]:
+    """
+    Per-segment window comparison + hypothesis validation, yielded range by range
+    as workers finish (so results can be streamed out, see src.utils.ndjson).
+    workers=1 runs serially in-process (no shared memory); otherwise the frame is
+    published once and segment ranges are spread over a process pool (default: one
+    worker per core this process may run on).
+    """
+    arrays, segments = build_segment_arrays(df, segment_col)
+    n_seg = len(segments)
+    workers = workers or available_cores()
+
+    def _label(records):
+        for r in records:
+            r["segment"] = str(segments[r.pop("segment_code")])
+            r["segment_col"] = segment_col
+            yield r
+
+    if workers == 1 or n_seg < 2:
+        n_ranges = min(n_seg, ranges_per_worker) or 1
+        bounds = np.linspace(0, n_seg, n_ranges + 1).astype(int)
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            yield from _label(_analyze_range(arrays, int(lo), int(hi), config))
+        return
+
+    n_ranges = min(n_seg, workers * ranges_per_worker)
+    bounds = np.linspace(0, n_seg, n_ranges + 1).astype(int)
+    with SharedFrame.publish(arrays) as frame:
+        jobs = [(frame.spec, int(lo), int(hi), config) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for part in pool.map(_worker, jobs):
+                yield from _label(part)
+
+
+def analyze_segments(df: pd.DataFrame, segment_col: str, config: Dict[str, Any],
+                     workers: Optional[int] = None, ranges_per_worker: int = 4) -> List[Dict[str, Any]]:
+    """All per-segment records as a list (see iter_segments)."""
+    return list(iter_segments(df, segment_col, config, workers=workers, ranges_per_worker=ranges_per_worker))
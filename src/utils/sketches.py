@@ -0,0 +1,289 @@
+# src/utils/sketches.py
+"""
+Mergeable streaming sketches for summary statistics.
+
+- TDigest: approximate quantiles (merging t-digest, vectorized compression)
+- HyperLogLog: approximate distinct counts
+- Moments: exact count/mean/variance/min/max/nulls (Chan's parallel merge)
+- SegmentTotals: exact per-segment sums (one value per segment), thresholded with
+  the exact quantile of the totals
+
+Every sketch can be built per chunk (possibly in parallel) and merged afterwards;
+merge(a, b) gives the same answer as sketching the concatenated data (exactly for
+Moments, within the sketch error for TDigest and HyperLogLog).
+
+Usage:
+    from src.utils.sketches import SummarySketch, sketch_frame
+    s = sketch_frame(df, quantile_cols=["spend", "roas"], distinct_cols=["campaign_name"])
+    s.quantile("spend", 0.9), s.distinct("campaign_name")
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class TDigest:
+    """
+    Merging t-digest with the k1 (arcsine) scale function.
+    Centroids are (mean, weight) pairs; compression keeps ~`delta` centroids with
+    small ones near the tails, so extreme quantiles stay accurate.
+    """
+
+    def __init__(self, delta: float = 200.0):
+        self.delta = float(delta)
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        order = np.argsort(means, kind="mergesort")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        if total == 0:
+            self.means, self.weights = np.empty(0), np.empty(0)
+            return
+        # bucket = floor of the k-scale value at each centroid's left quantile edge
+        q_left = (np.cumsum(weights) - weights) / total
+        k = self.delta / (2 * np.pi) * np.arcsin(2 * np.clip(q_left, 0, 1) - 1)
+        bucket = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        w = np.add.reduceat(weights, starts)
+        m = np.add.reduceat(means * weights, starts) / w
+        self.means, self.weights = m, w
+
+    def update(self, values: Iterable[float]) -> "TDigest":
+        v = np.asarray(values, dtype=float)
+        v = v[np.isfinite(v)]
+        if v.size:
+            self._compress(np.concatenate([self.means, v]), np.concatenate([self.weights, np.ones(v.size)]))
+        return self
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        out = TDigest(max(self.delta, other.delta))
+        out._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+        return out
+
+    def quantile(self, q: float) -> float:
+        if self.weights.size == 0:
+            return float("nan")
+        if self.weights.size == 1:
+            return float(self.means[0])
+        total = self.weights.sum()
+        centers = (np.cumsum(self.weights) - self.weights / 2) / total
+        return float(np.interp(q, centers, self.means))
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter with 2**p registers (p=12 -> ~1.6% standard error)."""
+
+    def __init__(self, p: int = 12):
+        self.p = int(p)
+        self.m = 1 << self.p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    @staticmethod
+    def _bit_length(x: np.ndarray) -> np.ndarray:
+        """Vectorized bit length of uint64 values (exact, no float rounding)."""
+        x = x.copy()
+        n = np.zeros(x.shape, dtype=np.int64)
+        for shift in (32, 16, 8, 4, 2, 1):
+            big = x >= (np.uint64(1) << np.uint64(shift))
+            n[big] += shift
+            x[big] >>= np.uint64(shift)
+        return n + (x > 0)
+
+    def update(self, values: Iterable[Any]) -> "HyperLogLog":
+        s = pd.Series(values).dropna()
+        if s.empty:
+            return self
+        h = pd.util.hash_pandas_object(s.astype(str), index=False).to_numpy(dtype=np.uint64)
+        idx = (h >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = h & np.uint64((1 << (64 - self.p)) - 1)
+        rank = ((64 - self.p) - self._bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        out = HyperLogLog(self.p)
+        out.registers = np.maximum(self.registers, other.registers)
+        return out
+
+    def estimate(self) -> float:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m * self.m / np.sum(np.power(2.0, -self.registers.astype(float)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * self.m and zeros:
+            # small-range correction: linear counting
+            return float(self.m * np.log(self.m / zeros))
+        return float(raw)
+
+
+class Moments:
+    """Exact count, mean, variance (M2), min, max, sum and null count; mergeable."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.nulls = 0
+
+    def update(self, values: Iterable[float]) -> "Moments":
+        v = np.asarray(values, dtype=float)
+        finite = v[np.isfinite(v)]
+        other = Moments()
+        other.nulls = int(v.size - finite.size)
+        if finite.size:
+            other.n = int(finite.size)
+            other.mean = float(finite.mean())
+            other.m2 = float(((finite - other.mean) ** 2).sum())
+            other.min = float(finite.min())
+            other.max = float(finite.max())
+        merged = self.merge(other)
+        self.__dict__.update(merged.__dict__)
+        return self
+
+    def merge(self, other: "Moments") -> "Moments":
+        out = Moments()
+        out.nulls = self.nulls + other.nulls
+        out.n = self.n + other.n
+        out.min = min(self.min, other.min)
+        out.max = max(self.max, other.max)
+        if out.n:
+            delta = other.mean - self.mean
+            out.mean = self.mean + delta * other.n / out.n
+            out.m2 = self.m2 + other.m2 + delta * delta * self.n * other.n / out.n
+        return out
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.n,
+            "nulls": self.nulls,
+            "mean": self.mean if self.n else float("nan"),
+            "std": float(np.sqrt(self.m2 / (self.n - 1))) if self.n > 1 else float("nan"),
+            "min": self.min if self.n else float("nan"),
+            "max": self.max if self.n else float("nan"),
+            "sum": self.mean * self.n,
+        }
+
+
+class SummarySketch:
+    """Moments + t-digest per numeric column and HyperLogLog per categorical column."""
+
+    def __init__(self, quantile_cols: Sequence[str] = (), distinct_cols: Sequence[str] = (),
+                 delta: float = 200.0, hll_p: int = 12):
+        self.moments: Dict[str, Moments] = {c: Moments() for c in quantile_cols}
+        self.digests: Dict[str, TDigest] = {c: TDigest(delta) for c in quantile_cols}
+        self.hlls: Dict[str, HyperLogLog] = {c: HyperLogLog(hll_p) for c in distinct_cols}
+
+    def update(self, df: pd.DataFrame) -> "SummarySketch":
+        for c in self.moments:
+            if c in df.columns:
+                values = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float)
+                self.moments[c].update(values)
+                self.digests[c].update(values)
+        for c in self.hlls:
+            if c in df.columns:
+                self.hlls[c].update(df[c])
+        return self
+
+    def merge(self, other: "SummarySketch") -> "SummarySketch":
+        out = SummarySketch()
+        out.moments = {c: self.moments[c].merge(other.moments[c]) for c in self.moments}
+        out.digests = {c: self.digests[c].merge(other.digests[c]) for c in self.digests}
+        out.hlls = {c: self.hlls[c].merge(other.hlls[c]) for c in self.hlls}
+        return out
+
+    def quantile(self, col: str, q: float) -> float:
+        return self.digests[col].quantile(q)
+
+    def distinct(self, col: str) -> int:
+        return int(round(self.hlls[col].estimate()))
+
+    def to_dict(self, quantiles: Sequence[float] = (0.05, 0.25, 0.5, 0.75, 0.95)) -> Dict[str, Any]:
+        numeric = {}
+        for c, m in self.moments.items():
+            stats = m.to_dict()
+            for q in quantiles:
+                stats[f"p{int(round(q * 100))}"] = self.quantile(c, q)
+            numeric[c] = stats
+        return {"numeric": numeric, "distinct": {c: self.distinct(c) for c in self.hlls}}
+
+
+def _sketch_chunk(chunk: pd.DataFrame, quantile_cols: Sequence[str], distinct_cols: Sequence[str]) -> SummarySketch:
+    return SummarySketch(quantile_cols, distinct_cols).update(chunk)
+
+
+def sketch_chunks(chunks: Iterable[pd.DataFrame], quantile_cols: Sequence[str], distinct_cols: Sequence[str],
+                  max_workers: int = 4) -> SummarySketch:
+    """
+    Sketch each chunk on a thread pool (numpy releases the GIL for the heavy parts)
+    and merge the partial sketches. At most `max_workers` chunks are in flight.
+    """
+    result = SummarySketch(quantile_cols, distinct_cols)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending: List = []
+        for chunk in chunks:
+            pending.append(pool.submit(_sketch_chunk, chunk, quantile_cols, distinct_cols))
+            if len(pending) >= max_workers:
+                result = result.merge(pending.pop(0).result())
+        for fut in pending:
+            result = result.merge(fut.result())
+    return result
+
+
+def sketch_frame(df: pd.DataFrame, quantile_cols: Sequence[str], distinct_cols: Sequence[str],
+                 chunksize: int = 100_000, max_workers: int = 4) -> SummarySketch:
+    """Sketch an in-memory frame chunk by chunk (see sketch_chunks)."""
+    chunks = (df.iloc[i:i + chunksize] for i in range(0, len(df), chunksize))
+    return sketch_chunks(chunks, quantile_cols, distinct_cols, max_workers=max_workers)
+
+
+class SegmentTotals:
+    """Exact per-segment sums of `value_col`, accumulated chunk by chunk (mergeable)."""
+
+    def __init__(self, segment_col: str, value_col: str):
+        self.segment_col = segment_col
+        self.value_col = value_col
+        self.totals: Optional[pd.Series] = None
+
+    def update(self, df: pd.DataFrame) -> "SegmentTotals":
+        if self.segment_col in df.columns and self.value_col in df.columns:
+            part = df.groupby(self.segment_col)[self.value_col].sum()
+            self.totals = part if self.totals is None else self.totals.add(part, fill_value=0)
+        return self
+
+    def merge(self, other: "SegmentTotals") -> "SegmentTotals":
+        out = SegmentTotals(self.segment_col, self.value_col)
+        parts = [t for t in (self.totals, other.totals) if t is not None]
+        out.totals = parts[0].add(parts[1], fill_value=0) if len(parts) == 2 else (parts[0] if parts else None)
+        return out
+
+    def above(self, pctile: float) -> Dict[str, Any]:
+        """
+        Segments whose total is above the `pctile` quantile of the totals. The totals are
+        exact and there is one per segment, so the exact quantile is used (no sketch).
+        """
+        if self.totals is None or self.totals.empty:
+            return {"threshold": None, "segments": {}}
+        threshold = float(self.totals.quantile(pctile))
+        flagged = self.totals[self.totals > threshold].sort_values(ascending=False)
+        return {"threshold": threshold, "segments": {str(k): float(v) for k, v in flagged.items()}}
+
+
+def high_value_segments(df: pd.DataFrame, segment_col: str, value_col: str, pctile: float,
+                        chunksize: int = 100_000) -> Dict[str, Any]:
+    """Flag segments whose total `value_col` is above the `pctile` quantile of segment totals."""
+    totals = SegmentTotals(segment_col, value_col)
+    for i in range(0, len(df), chunksize):
+        totals.update(df.iloc[i:i + chunksize])
+    return totals.above(pctile)